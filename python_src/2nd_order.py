@@ -1,6 +1,19 @@
 import pandas as pd 
 import numpy as np
-from Alhazen_Plotemy import branchdeducing_twofinite
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from Alhazen_Plotemy import branchdeducing_twofinite_vec
+from specular_lut import lookup_twofinite
+from spec_geometry import specular_unit, science_angles, visibility_mask, Scratch
+from ephemeris_store import load_columns, open_store
+from ephemeris_catalog import build_catalog, load_catalog, select_transmitters, receiver_satellites
+from spec_buffer import SpecularBuffer, BAND_CODES, UNKNOWN_BAND
+import spec_cache
+import telemetry
+from revisit import revisit_frame, RevisitAccumulator
+from quantile_sketch import RegionSketches
+from spec_neighbours import neighbour_pairs
+from window_coverage import CoverageBits, LAND_HORIZONS, land_coverage, load_land_cells
 import matplotlib.pyplot as plt
 from tqdm import tqdm
 
@@ -8,49 +21,25 @@ EARTH_RADIUS = 6371.0
 
 def get_spec(rec, trans):
     '''
-        Given reciever and transmitter location, return specular point.
-        Return empty array if no specular point is found.
-        Reciever and transmitter locations are in the order of 1.
+        Given reciever and transmitter locations, return specular points.
+        rec and trans are N x 3 ECEF arrays in units of EARTH_RADIUS (i.e. in the order of 1).
+        Returns an N x 3 array of specular points in km. Rows where no specular
+        point is found are NaN.
 
         Source: https://www.geometrictools.com/Documentation/SphereReflections.pdf
     '''
     global EARTH_RADIUS
 
-    # Break down the inputs
-    # data = data.tolist()
-    # rec = np.array(data[1:4]) / EARTH_RADIUS
-    # trans = np.array(data[4:7]) / EARTH_RADIUS
-
-    # Prework - dot products
-    a = np.sum(rec*rec, axis=1)
-    b = np.sum(rec*trans, axis=1)
-    c = np.sum(trans*trans, axis=1)
-
-    # Step 1
-    coeffs = [4*c*(a*c-b**2), -4*(a*c-b**2), a+2*b+c-4*a*c, 2*(a-b), a-1]
-    roots = np.roots(coeffs)
-    y = roots[roots > 0]
-
-    print(roots.shape)
-    print(rec.shape)
-    exit()
-    
-    if y.size == 0:
-        return np.array([])
-    
-    # Step 2
-    x = (-2*c*y**2 + y + 1) / (2*b*y + 1)
-
-    if x[x > 0].size == 0:
-        return np.array([])
-    i = np.argwhere(x > 0)[0][0]
-
-    spec = x[i]*rec + y[i]*trans
+    # The quartic is solved for every row at once (see spec_geometry)
+    spec = specular_unit(np.atleast_2d(rec), np.atleast_2d(trans))
 
     return spec*EARTH_RADIUS
 
-def load_data(file_name, columns=None):
-    data = np.loadtxt(file_name, skiprows=0, usecols=columns)
+def load_data(file_name, columns=None, rows=None):
+    # Reads through the binary store next to the report, which is created on first use.
+    # Same as np.loadtxt(file_name, usecols=columns) without re-parsing the text every time.
+    # rows=(start, stop) only reads that range of time steps
+    data = load_columns(file_name, columns, rows=rows)
 
     return data
 
@@ -72,15 +61,13 @@ def get_spec_rec(filename, rec_sma, trans_sma, rec_satNum, trans_satNum):
     rec_const = np.delete(time_rec, np.s_[0:1], axis=1)
     print('Code thinks that the reciver constellation has the following number of rows & columns: ', rec_const.shape)
 
-    # Specular points dataframe
-    spec_df = pd.DataFrame(columns=['Time', 'Lat', 'Lon'])
-
-    # Vectorize the function
-    vfunc = np.vectorize(branchdeducing_twofinite)
+    # Specular points are gathered in a growable buffer and turned into a dataframe once at the end
+    spec_buf = SpecularBuffer()
 
     # Iterate thru the transmitter constellations
     print('Beginning to get specular points')
     counter = 1 + rec_satNum*2              # stores where to start looking for transmitters
+    tx_offset = 0                           # ID of the first transmitter in the constellation
     for k in range(len(trans_satNum)):
         # Get the data for that transmitter constellation
         # Done individually to save on memory. We will see if we need this when we move to the ECN servers
@@ -106,8 +93,8 @@ def get_spec_rec(filename, rec_sma, trans_sma, rec_satNum, trans_satNum):
                 b = EARTH_RADIUS / (rec_sma)                        # b = R_spec / R_obs
 
                 # Get them goods
-                lat_sp = vfunc(obs=rec[:,0], c=c, b=b)
-                lon_sp = vfunc(obs=rec[:,1], c=c, b=b)
+                lat_sp = branchdeducing_twofinite_vec(rec[:,0], c, b)
+                lon_sp = branchdeducing_twofinite_vec(rec[:,1], c, b)
 
                 # Temp DF
                 temp_df = pd.DataFrame(columns=['Time', 'Lat', 'Lon', 'trans_lat', 'trans_lon'])
@@ -175,186 +162,390 @@ def get_spec_rec(filename, rec_sma, trans_sma, rec_satNum, trans_satNum):
                 # Inclination angle is always < 60 deg (theta 1)
                 temp_df = temp_df[temp_df['theta1'] <= 60.0]
 
-                # Remove extra columns
-                keep    = ['Time', 'Lat', 'Lon', 'theta2', 'theta3']
-                extra   = [elem for elem in temp_df.columns.to_list() if elem not in keep]
-                temp_df = temp_df.drop(columns=extra)
+                # Append the columns we keep (the band is not known here)
+                spec_buf.append(Time=temp_df['Time'].to_numpy(), Lat=temp_df['Lat'].to_numpy(),
+                                Lon=temp_df['Lon'].to_numpy(), theta2=temp_df['theta2'].to_numpy(),
+                                theta3=temp_df['theta3'].to_numpy(), TxID=tx_offset + i, RxID=j,
+                                Band=UNKNOWN_BAND)
 
-                # Transfer numpy array to list to get it to work well
-                temp_df['Lat'] = temp_df['Lat'].tolist()
-                temp_df['Lon'] = temp_df['Lon'].tolist()
-
-                # Append
-                spec_df = pd.concat([spec_df, temp_df])
+        tx_offset = tx_offset + numTrans
     
-    return spec_df
+    return spec_buf.to_dataframe()
+
+# Work arrays of the geometry kernel, one set per process
+_scratch = Scratch()
 
-def get_specular_points(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq, desired_freq):
+@lru_cache(maxsize=8)
+def _load_cached(file_name, columns, rows=None):
+    # Columns are read through the memory mapped store, and the last few are kept
+    # so a process running many pairs of the same constellation reads them once.
+    # The cache only lives for one run (see _run_tasks)
+    return load_data(file_name, columns=columns, rows=rows)
+
+def get_specular_pair(filename, rec_cols, trans_cols, rec_sma, trans_sma, tx_offset, rx_id, band,
+                      lut_error=None, lut_dir=None, rows=None, prefilter=True, rec_filename=None):
     '''
-        This does the same as get_spec_rec but faster.        
-        Gets the LL of specular points given the LL of transmitters and recievers
-        LL of transmitters and recievers is in the filename
+        Specular points of one receiver against one transmitter constellation.
+
+        Inputs:
+            filename (str): ephemeris file (read through its binary store)
+            rec_cols (tuple): lat, lon columns of the receiver
+            trans_cols (tuple): columns of the transmitter constellation (all lats, then all lons)
+            rec_sma, trans_sma (float): orbit radii (km)
+            tx_offset (int): TxID of the first transmitter in the constellation
+            rx_id (int): RxID of the receiver
+            band (int): code of the transmitter band (see spec_buffer.BAND_CODES)
+            lut_error, lut_dir: see get_specular_points
+            rows (tuple or None): (start, stop) time steps to process, all of them if None
+            prefilter (bool): skip the solver for pairs that cannot see a common point on the Earth
+            rec_filename (str): ephemeris holding the receiver columns, if not filename. Its
+                                time steps have to be those of filename
+
+        Returns a dict of column arrays (see spec_buffer.SPEC_COLUMNS) and a dict of counts:
+        candidate samples, how many the pre-filter culled, how many had no solution (nan)
+        and how many the theta1 cut removed. These also go to telemetry.
     '''
     global EARTH_RADIUS
 
-    # Get time
-    time = load_data(filename, columns=tuple(range(0,1)))
-
-    # Get reciever constellations.
-    # List of 2D numpy arrays. Each element of the list is a shell in the MoIST constellation
-    recivers = []
-    start = 1                       # stores where to start looking for satellties
-    for i in range(len(rec_satNum)):
-        recivers = recivers + [load_data(filename, columns=tuple(range(start, start+rec_satNum[i]*2)))]
-        start = start+rec_satNum[i]*2
+    with telemetry.stage('specular_pair', tx_offset=tx_offset, rx_id=rx_id, band=band) as record:
+        time = _load_cached(filename, (0,), rows)
+        receiver = _load_cached(rec_filename or filename, tuple(rec_cols), rows)
+        transmitters = np.radians(_load_cached(filename, tuple(trans_cols), rows).reshape((time.shape[0],2,-1)))
+        repeat = transmitters.shape[2]
+        rec_rad = np.radians(receiver)
+
+        # Candidates are flat (time, transmitter) indices. Pairs on opposite sides of
+        # the Earth have no specular point, so they never reach the solver
+        if prefilter:
+            visible = visibility_mask(rec_rad[:, 0, np.newaxis], rec_rad[:, 1, np.newaxis], rec_sma,
+                                      transmitters[:,0,:], transmitters[:,1,:], trans_sma, earth_radius=EARTH_RADIUS)
+            cand = np.flatnonzero(visible)
+        else:
+            cand = np.arange(time.shape[0] * repeat)
+        counts = {'candidates': time.shape[0] * repeat}
+        if prefilter:
+            counts['culled'] = counts['candidates'] - cand.shape[0]
+        trans_lat = transmitters[:,0,:].ravel()[cand]
+        trans_lon = transmitters[:,1,:].ravel()[cand]
+
+        # Perform transformation that sets trans = pi/2 & other calculations
+        t_idx = cand // repeat
+        obs_lat = rec_rad[t_idx, 0] + np.pi/2 - trans_lat
+        obs_lon = rec_rad[t_idx, 1] + np.pi/2 - trans_lon
+
+        # Other calcs
+        c = EARTH_RADIUS / (trans_sma)                      # c = R_spec / R_src
+        b = EARTH_RADIUS / (rec_sma)                        # b = R_spec / R_obs
     
-    # Specular points dataframe
-    spec_df = pd.DataFrame(columns=['Time', 'Lat', 'Lon', 'theta2', 'theta3'])
-
-    # Vectorize the function
-    vfunc = np.vectorize(branchdeducing_twofinite)
-
-    # Iterate thru the transmitter constellations
-    print('Beginning to get specular points')
-    for i in tqdm(range(len(trans_satNum))):
-        # Check if transmitters are in desired frequency. If not, just skip it
-        if trans_freq[i] not in desired_freq:
-            continue
-
-        # Get transmitters into 3D numpy array. [:,:,i] where i refers to each satellite in transmitter constellation
-        transmitters = load_data(filename, columns=tuple(range(start, start+trans_satNum[i]*2)))
-        start = start + trans_satNum[i]*2
-        transmitters = np.radians(transmitters.reshape((time.shape[0],2,-1)))
-        # print('Code thinks that the current transmitter constellation has the following shape: ', transmitters.shape)
-
-        # Iterate thru the recievers shells
-        for j in range(len(recivers)):
-            receiver_shell = recivers[j]
-            # Iterate thru receivers in shell
-            for k in range(rec_satNum[j]):
-                reciver = np.radians(receiver_shell[:, k*2:k*2+2])
-
-                # Perform transformation that sets trans = pi/2 & other calculations
-                reciver = reciver + np.pi/2
-                reciver = np.subtract(reciver[...,np.newaxis], transmitters)
-
-                # Other calcs
-                c = EARTH_RADIUS / (trans_sma[i])                   # c = R_spec / R_src
-                b = EARTH_RADIUS / (rec_sma[j])                     # b = R_spec / R_obs
-                
-                # Get them goods
-                lat_sp = vfunc(obs=reciver[:,0,:], c=c, b=b).astype(np.float)
-                lon_sp = vfunc(obs=reciver[:,1,:], c=c, b=b).astype(np.float)
-                repeat = lat_sp.shape[1]
-
-                # Put it in a dataframe because that is easier to handle from now on
-                # There may be an issue here just fyi
-                # If you print the DF before you dropna, you will see some NaN for trans & rec. That doesn't make sense
-                temp_df = pd.DataFrame(columns=['Time', 'Lat', 'Lon', 'trans_lat', 'trans_lon', 'rec_lat', 'rec_lon'])
-                temp_df['Time'] = np.repeat(time/86400, repeat)         # in days
-                temp_df['Lat'] = lat_sp.reshape((-1,1))
-                temp_df['Lon'] = lon_sp.reshape((-1,1))
-                temp_df['trans_lat'] = transmitters[:,0,:].ravel()
-                temp_df['trans_lon'] = transmitters[:,1,:].ravel()
-                temp_df['rec_lat'] = np.repeat(np.radians(receiver_shell[:, k*2:k*2+1]), repeat)
-                temp_df['rec_lon'] = np.repeat(np.radians(receiver_shell[:, k*2+1:k*2+2]), repeat)
-                temp_df = temp_df.dropna()                              # if no specular point, previous function returns none. Remove these entries
-                
-                # Now rotate back 
-                # (this is done here to avoid doing rotation on None object which can be returned from specular point)
-                temp_df['Lat'] = temp_df['Lat'] - np.pi/2 + temp_df['trans_lat']
-                temp_df['Lon'] = temp_df['Lon'] - np.pi/2 + temp_df['trans_lon']
-
-                # Enforce the type
-                temp_df = temp_df.astype('float64')
+        # Get them goods (NaN where there is no specular point)
+        if lut_error is None:
+            lat_sp = branchdeducing_twofinite_vec(obs_lat, c, b)
+            lon_sp = branchdeducing_twofinite_vec(obs_lon, c, b)
+        else:
+            lat_sp = lookup_twofinite(obs_lat, c, b, lut_error, lut_dir)
+            lon_sp = lookup_twofinite(obs_lon, c, b, lut_error, lut_dir)
+
+        # Keep only the samples with a specular point
+        found = np.flatnonzero(~np.isnan(lat_sp) & ~np.isnan(lon_sp))
+        cand = cand[found]
+        t_idx = t_idx[found]
+
+        # Now rotate back
+        trans_lat = trans_lat[found]
+        trans_lon = trans_lon[found]
+        spec_lat = lat_sp[found] - np.pi/2 + trans_lat
+        spec_lon = lon_sp[found] - np.pi/2 + trans_lon
+
+        # Apply science requirements
+        # Inclination angle is always < 60 deg (theta 1), and that cut is made
+        # inside the kernel before theta2 and theta3 are computed
+        keep, theta2, theta3 = science_angles(spec_lat, spec_lon,
+                                              rec_rad[t_idx, 0], rec_rad[t_idx, 1], rec_sma,
+                                              trans_lat, trans_lon, trans_sma,
+                                              earth_radius=EARTH_RADIUS, max_theta1=60.0, scratch=_scratch)
+        counts['nan'] = lat_sp.shape[0] - found.shape[0]
+        counts['theta1_cut'] = found.shape[0] - keep.shape[0]
+        record.set(samples_in=counts['candidates'], samples_out=keep.shape[0], **counts)
+
+        # Transform to degrees while we're at it
+        return {'Time': time[t_idx[keep]]/86400, 'Lat': np.degrees(spec_lat[keep]), 'Lon': np.degrees(spec_lon[keep]),
+                'theta2': theta2, 'theta3': theta3,
+                'TxID': (cand[keep] % repeat + tx_offset).astype(np.int32),
+                'RxID': np.full(keep.shape[0], rx_id, dtype=np.int32),
+                'Band': np.full(keep.shape[0], band, dtype=np.int8)}, counts
+
+def get_specular_pair_cached(pair_dir, filename, rec_cols, trans_cols, rec_sma, trans_sma, tx_offset, rx_id, band,
+                             lut_error=None, lut_dir=None, rows=None, prefilter=True, rec_filename=None):
+    '''
+        get_specular_pair through the per pair store of spec_cache. Every receiver /
+        transmitter satellite pair already in pair_dir is read from there, and only the
+        transmitters without a stored result are run through the solver (and stored).
+        Rows come out in the same order as from get_specular_pair.
+    '''
+    num_trans = len(trans_cols) // 2
+    keys = [spec_cache.pair_key(filename, rec_cols, rec_sma, trans_cols[k], trans_cols[num_trans+k], trans_sma, lut_error, rows,
+                                rec_filename)
+            for k in range(num_trans)]
+    stored = [spec_cache.load_pair(pair_dir, key) for key in keys]
+    missing = [k for k in range(num_trans) if stored[k] is None]
+
+    counts = {'candidates': 0}
+    if len(missing) > 0:
+        # Only the missing transmitters, still all lats then all lons
+        missing_cols = tuple(trans_cols[k] for k in missing) + tuple(trans_cols[num_trans+k] for k in missing)
+        result, counts = get_specular_pair(filename, rec_cols, missing_cols, rec_sma, trans_sma, 0, rx_id, band,
+                                           lut_error, lut_dir, rows, prefilter, rec_filename)
+        for i, k in enumerate(missing):
+            mask = result['TxID'] == i
+            stored[k] = {name: result[name][mask] for name in spec_cache.PAIR_COLUMNS}
+            spec_cache.save_pair(pair_dir, keys[k], stored[k])
+    counts['pairs_computed'] = len(missing)
+    counts['pairs_reused'] = num_trans - len(missing)
+
+    # Merge back into (time, transmitter) order
+    columns = {name: np.concatenate([pair[name] for pair in stored]) for name in spec_cache.PAIR_COLUMNS}
+    tx_id = np.concatenate([np.full(len(pair['Time']), tx_offset + k, dtype=np.int32) for k, pair in enumerate(stored)])
+    order = np.lexsort((tx_id, columns['Time']))
+    columns = {name: values[order] for name, values in columns.items()}
+    columns['TxID'] = tx_id[order]
+    columns['RxID'] = np.full(order.shape[0], rx_id, dtype=np.int32)
+    columns['Band'] = np.full(order.shape[0], band, dtype=np.int8)
+
+    return columns, counts
+
+def _specular_pair_task(args):
+    # Unpacks a task for the process pool. The last argument is the pair store, if any
+    pair_dir = args[-1]
+    if pair_dir is None:
+        return get_specular_pair(*args[:-1])
+    return get_specular_pair_cached(pair_dir, *args[:-1])
+
+def get_catalog(filename, rec_sma=None, trans_sma=None, rec_satNum=None, trans_satNum=None, trans_freq=None):
+    '''
+        Column catalog of the ephemeris (see ephemeris_catalog). Built from the shell
+        lists if they are given, otherwise read from the catalog next to the file.
+    '''
+    if rec_sma is None:
+        return load_catalog(filename)
+    return build_catalog(rec_sma, rec_satNum, trans_sma, trans_satNum, trans_freq)
+
+def _specular_tasks(catalog, filename, desired_freq, lut_error=None, lut_dir=None, prefilter=True, pair_dir=None):
+    # Arguments of get_specular_pair for every receiver satellite and transmitter constellation
+    # in the desired bands, followed by the pair store. Columns come from the catalog,
+    # so constellations in other bands are never read. Receiver shells can live in
+    # their own files (see ephemeris_catalog.with_receivers)
+    tasks = []
+    for trans in select_transmitters(catalog, desired_freq):
+        trans_cols = tuple(range(*trans['columns']))
+        for shell, sat in receiver_satellites(catalog):
+            tasks = tasks + [(filename, (sat['lat'], sat['lon']), trans_cols, shell['sma'], trans['sma'],
+                              trans['first_id'], sat['id'], BAND_CODES[trans['band']],
+                              lut_error, lut_dir, None, prefilter, shell.get('file'), pair_dir)]
+
+    return tasks
+
+def _run_tasks(tasks, pool=None, ordered=True, progress=True, counts=None):
+    # Runs the tasks in-process or on the pool and gathers the results in a buffer.
+    # The candidate counts of the tasks are added up in counts, if given.
+    # Columns cached by in-process tasks are released once the run is over, so they do not
+    # stay alive through the later stages (workers release theirs with the pool)
+    spec_buf = SpecularBuffer()
+    if pool is None:
+        results = map(_specular_pair_task, tasks)
+    elif ordered:
+        results = pool.map(_specular_pair_task, tasks, chunksize=1)
+    else:
+        results = (future.result() for future in as_completed([pool.submit(_specular_pair_task, task) for task in tasks]))
+
+    try:
+        for result, task_counts in tqdm(results, total=len(tasks), disable=not progress):
+            spec_buf.append(**result)
+            if counts is not None:
+                for key, value in task_counts.items():
+                    counts[key] = counts.get(key, 0) + value
+    finally:
+        _load_cached.cache_clear()
+
+    return spec_buf
+
+def _print_culled(counts):
+    # Reports the work saved by the visibility pre-filter, if it ran
+    if counts.get('candidates', 0) > 0 and 'culled' not in counts:
+        print('Visibility pre-filter disabled, all ' + str(counts['candidates']) + ' candidate samples went to the solver')
+    elif counts.get('candidates', 0) > 0:
+        print('Visibility pre-filter culled ' + str(counts['culled']) + ' of ' + str(counts['candidates']) +
+              ' candidate samples (' + str(round(100.0 * counts['culled'] / counts['candidates'], 1)) + '%)')
+    # and by the pair store
+    if 'pairs_reused' in counts:
+        print('Reused ' + str(counts['pairs_reused']) + ' stored receiver/transmitter pairs, computed ' +
+              str(counts['pairs_computed']))
+
+def get_specular_points(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq, desired_freq,
+                        lut_error=None, lut_dir=None, workers=1, ordered=True, prefilter=True, cache_dir=None,
+                        catalog=None):
+    '''
+        This does the same as get_spec_rec but faster.        
+        Gets the LL of specular points given the LL of transmitters and recievers
+        LL of transmitters and recievers is in the filename
 
-                # Apply science requirements
-                # Get ECEF for rec, trans, spec
-                #trans. r vector components
-                temp_df['trans_x'] = trans_sma[i] * np.cos(temp_df['trans_lon']) * np.cos(temp_df['trans_lat'])
-                temp_df['trans_y'] = trans_sma[i] * np.sin(temp_df['trans_lon']) * np.cos(temp_df['trans_lat'])
-                temp_df['trans_z'] = trans_sma[i] * np.sin(temp_df['trans_lat'])
-               
-                #receiv. r vector components
-                temp_df['rec_x'] = rec_sma[j] * np.cos(temp_df['rec_lon']) * np.cos(temp_df['rec_lat'])
-                temp_df['rec_y'] = rec_sma[j] * np.sin(temp_df['rec_lon']) * np.cos(temp_df['rec_lat'])
-                temp_df['rec_z'] = rec_sma[j] * np.sin(temp_df['rec_lat'])
+        If lut_error is given (radians), the Alhazen solver is replaced by per-shell
+        lookup tables with that error bound (see specular_lut). lut_dir optionally
+        keeps the tables on disk between runs.
 
-                # specular point, r vector components
-                temp_df['spec_x'] = EARTH_RADIUS * np.cos(temp_df['Lon']) * np.cos(temp_df['Lat'])
-                temp_df['spec_y'] = EARTH_RADIUS * np.sin(temp_df['Lon']) * np.cos(temp_df['Lat'])
-                temp_df['spec_z'] = EARTH_RADIUS * np.sin(temp_df['Lat'])
-            
-                #find r_sr, r_rt
-                #r_sr
-                temp_df['r_srx'] = temp_df['rec_x'] - temp_df['spec_x']
-                temp_df['r_sry'] = temp_df['rec_y'] - temp_df['spec_y']
-                temp_df['r_srz'] = temp_df['rec_z'] - temp_df['spec_z']
+        With workers > 1 the receiver/transmitter pairs are spread over a process pool.
+        Workers read the ephemeris through the memory mapped binary store, so nothing
+        but the column numbers is sent to them, and only the specular results come back.
+        With ordered=True (default) the rows come out in the same order as with one
+        worker; with ordered=False they are appended as pairs finish.
 
-                #r_rt
-                temp_df['r_rtx'] = temp_df['trans_x'] - temp_df['rec_x']
-                temp_df['r_rty'] = temp_df['trans_y'] - temp_df['rec_y']
-                temp_df['r_rtz'] = temp_df['trans_z'] - temp_df['rec_z']
+        With prefilter=True (default) receiver/transmitter samples whose horizons do not
+        overlap are culled before the solver (see spec_geometry.visibility_mask). These
+        never have a specular point, so the output is the same, and the number culled is printed.
 
-                #find thetas (for all names to the left of '=', coefficient 'r' left out, ex: r_rt made to be rt)
-                #theta1 (assumption of r_s constant?)
-                temp_df['dot_s_sr'] = temp_df['r_srx']*temp_df['spec_x'] + temp_df['r_sry']*temp_df['spec_y'] + temp_df['r_srz']*temp_df['spec_z'] 
-                temp_df['mag_sr'] = np.sqrt(np.square(temp_df['trans_x']) + np.square(temp_df['trans_y']) + np.square(temp_df['trans_z']))
-                temp_df['theta1'] = np.abs(np.arccos(temp_df['dot_s_sr']/(temp_df['mag_sr']*EARTH_RADIUS))) * 180.0 / np.pi
+        If rec_sma is None the shells are taken from the catalog written next to the
+        ephemeris by preprocess.py (see get_catalog), and the other shell lists are ignored.
+        A catalog can also be given directly, e.g. one with receivers in other files.
 
-                #theta2
-                temp_df['dot_r_sr'] = temp_df['r_srx']*temp_df['rec_x'] + temp_df['r_sry']*temp_df['rec_y'] + temp_df['r_srz']*temp_df['rec_z'] 
-                temp_df['mag_r'] = np.sqrt(np.square(temp_df['rec_x']) + np.square(temp_df['rec_y']) + np.square(temp_df['rec_z']))
-                temp_df['theta2'] = np.abs(np.arccos(temp_df['dot_r_sr']/(temp_df['mag_r']*temp_df['mag_sr']))) * 180.0 / np.pi
+        If cache_dir is given, results are kept there (see spec_cache), keyed by the
+        ephemeris content, the shells, the bands and the solver version. A run with the
+        same inputs then only reads the cached result. Every receiver/transmitter satellite
+        pair is stored as well, so when a constellation changes only its new pairs are computed.
+    '''
+    # Make sure the binary store exists before any worker tries to read it
+    open_store(filename)
+    if catalog is None:
+        catalog = get_catalog(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq)
 
-                #theta3
-                temp_df['dot_rt_r'] = temp_df['r_rtx']*temp_df['rec_x'] + temp_df['r_rty']*temp_df['rec_y'] + temp_df['r_rtz']*temp_df['rec_z'] 
-                temp_df['mag_rt'] = np.sqrt(np.square(temp_df['r_rtx']) + np.square(temp_df['r_rty']) + np.square(temp_df['r_rtz']))
-                temp_df['theta3'] = np.abs(np.arccos(temp_df['dot_rt_r']/(temp_df['mag_r']*temp_df['mag_rt']))) * 180.0 / np.pi
-                
-                # Inclination angle is always < 60 deg (theta 1)
-                # print(temp_df)
-                temp_df = temp_df[temp_df['theta1'] <= 60.0]
-                # print(temp_df)
+    if cache_dir is not None:
+        key = spec_cache.cache_key(filename, catalog, desired_freq, lut_error)
+        spec_buf = spec_cache.load_result(cache_dir, key)
+        if spec_buf is not None:
+            print('Specular points read from the cache (' + key[:12] + ')')
+            return spec_buf.to_dataframe()
 
-                # Remove extra columns
-                keep    = ['Time', 'Lat', 'Lon', 'theta2', 'theta3']
-                extra   = [elem for elem in temp_df.columns.to_list() if elem not in keep]
-                temp_df = temp_df.drop(columns=extra)
+    tasks = _specular_tasks(catalog, filename, desired_freq, lut_error, lut_dir, prefilter, cache_dir)
 
-                # Transfer numpy array to list to get it to work well
-                # Transform to degrees while we're at it
-                temp_df['Lat'] = (temp_df['Lat']*180.0/np.pi).tolist()
-                temp_df['Lon'] = (temp_df['Lon']*180.0/np.pi).tolist()
+    print('Beginning to get specular points')
+    counts = {}
+    with telemetry.stage('specular_points', bands=list(desired_freq), tasks=len(tasks), workers=workers) as record:
+        if workers <= 1:
+            spec_buf = _run_tasks(tasks, counts=counts)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                spec_buf = _run_tasks(tasks, pool, ordered, counts=counts)
+        record.set(samples_in=counts.get('candidates', 0), samples_out=len(spec_buf), **counts)
+    _print_culled(counts)
+
+    if cache_dir is not None:
+        spec_cache.save_result(cache_dir, key, spec_cache.partition_result(spec_buf.arrays(), catalog, desired_freq), filename)
+
+    return spec_buf.to_dataframe()
+
+def iter_specular_points(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq, desired_freq,
+                         window=1.0, lut_error=None, lut_dir=None, workers=1, prefilter=True, cache_dir=None):
+    '''
+        Streaming version of get_specular_points. Walks the ephemeris in windows of
+        {window} days and yields one DataFrame of specular points per window, in time order.
 
-                # Append
-                spec_df = pd.concat([spec_df, temp_df])
-            
-    return spec_df
+        Only the rows of the current window are read from the memory mapped store, so
+        memory does not grow with the length of the simulation. Specular points only
+        depend on the current time step, so nothing has to be carried across windows
+        other than where the next one starts.
 
-def get_revisit_info(specular_df):
+        Concatenating the windows gives the same rows as get_specular_points, grouped by window.
+        With cache_dir the receiver/transmitter pairs of every window are stored and reused
+        (see get_specular_pair_cached).
+    '''
+    # Checked here and not in the generator, so a bad window fails at the call
+    if not window > 0:
+        raise ValueError('Window has to be positive, got ' + str(window) + ' days')
+
+    store = open_store(filename)
+    catalog = get_catalog(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq)
+    tasks = _specular_tasks(catalog, filename, desired_freq, lut_error, lut_dir, prefilter, cache_dir)
+    return _iter_windows(store[:, 0], tasks, window, workers)
+
+def _iter_windows(time, tasks, window, workers):
+    # Runs the tasks over the rows of every window of the (memory mapped) time column
+    counts = {}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        start = 0
+        edge = time[0]
+        while start < time.shape[0]:
+            # Windows are aligned to the start of the simulation
+            edge = edge + window*86400
+            stop = int(np.searchsorted(time, edge, side='left'))
+            if stop == start:
+                continue
+            rows = (start, stop)
+            spec_buf = _run_tasks([task[:10] + (rows,) + task[11:] for task in tasks], pool, progress=False, counts=counts)
+            yield spec_buf.to_dataframe()
+            start = stop
+        _print_culled(counts)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def _print_invalid(invalid):
+    # Samples off the Earth point at an upstream problem, so they are reported
+    if invalid > 0:
+        print('Dropped ' + str(invalid) + ' specular points with invalid latitude/longitude')
+
+def _sample_columns(specular_df, mask=None):
+    # Time, Lat and Lon of the rows selected by a boolean mask (e.g. science_mask), without
+    # copying the rest of the frame
+    columns = [specular_df[name].to_numpy() for name in ['Time', 'Lat', 'Lon']]
+    return columns if mask is None else [column[mask] for column in columns]
+
+def get_revisit_info(specular_df, mask=None):
+    '''
+        Maximum revisit per 9 km EASE-2 cell (see revisit.revisit_frame): one row per cell
+        with approx_LatSp, approx_LonSp, revisit (days, NaN below 1 hour) and samples.
+        mask (boolean array, e.g. from science_mask) only uses the selected rows.
+    '''
     print('Beginning revisit calculations')
-    # Round lat and long and then use groupby to throw them all in similar buckets
-    specular_df['approx_LatSp'] = round(specular_df['Lat'],1)
-    specular_df['approx_LonSp'] = round(specular_df['Lon'],1)
-
-    # Calculate time difference
-    specular_df.sort_values(by=['approx_LatSp', 'approx_LonSp', 'Time'], inplace=True)
-    specular_df['revisit'] = specular_df['Time'].diff()
+    time, lat, lon = _sample_columns(specular_df, mask)
+    with telemetry.stage('revisit', samples_in=len(time)) as record:
+        max_rev_area_df = revisit_frame(time, lat, lon)
+        record.set(samples_out=len(max_rev_area_df), invalid=max_rev_area_df.attrs['invalid_samples'])
+    _print_invalid(max_rev_area_df.attrs['invalid_samples'])
 
-    # Correct for borders
-    specular_df['revisit'].mask(specular_df.approx_LatSp != specular_df.approx_LatSp.shift(1), other=np.nan, inplace=True)
-    specular_df['revisit'].mask(specular_df.approx_LonSp != specular_df.approx_LonSp.shift(1), other=np.nan, inplace=True)
+    return max_rev_area_df
 
-    # Get max revisit and store in new DF
-    indeces = specular_df.groupby(['approx_LatSp', 'approx_LonSp'])['revisit'].transform(max) == specular_df['revisit']
+def get_coverage_info(specular_df, window=1.0, mask=None, cells=None):
+    '''
+        Which cells are seen in every window of {window} days (see window_coverage.CoverageBits).
+        coverage() gives the fraction of cells seen per window, rolling_coverage(n) the
+        same over n windows and unseen_cells(days) the cells left unseen for more than that.
+        cells (e.g. land cell IDs) are the cells to report on, never seen ones included;
+        without them only cells seen at least once are. mask selects rows like in
+        get_revisit_info.
+    '''
+    print('Beginning coverage calculations')
+    time, lat, lon = _sample_columns(specular_df, mask)
+    with telemetry.stage('coverage', samples_in=len(time)) as record:
+        coverage_bits = CoverageBits(time, lat, lon, window, cells=cells)
+        record.set(samples_out=coverage_bits.num_cells, windows=coverage_bits.num_windows,
+                   invalid=coverage_bits.invalid_samples)
+    _print_invalid(coverage_bits.invalid_samples)
 
-    max_rev_area_df = specular_df[indeces]
+    return coverage_bits
 
-    # Any revisit that is less than 1 hour is removed. Typically this occurs because of a lack of samples (due to low sim time)
-    max_rev_area_df['revisit'].mask(max_rev_area_df['revisit'] < 0.04, other=np.nan, inplace=True)
+def get_land_coverage(specular_df, land_cells_file, horizons=LAND_HORIZONS, mask=None):
+    '''
+        Fraction of the EASE-2 land cells seen within each horizon (days), as {horizon: fraction}.
+        land_cells_file is written by gen_landmask.build_land_cells. mask selects rows like in
+        get_revisit_info.
+    '''
+    land_bits, resolution = load_land_cells(land_cells_file)
+    time, lat, lon = _sample_columns(specular_df, mask)
+    with telemetry.stage('land_coverage', samples_in=len(time), resolution=resolution):
+        coverage = land_coverage(time, lat, lon, land_bits, resolution, horizons)
 
-    return max_rev_area_df
+    for horizon, fraction in coverage.items():
+        print('Land coverage after ' + str(horizon) + ' days: ' + str(100*fraction) + ' %')
+    return coverage
 
 def plot_revisit_stats(revisit_info):
     print('Beginning plotting')
@@ -381,27 +572,27 @@ def lla_to_cart(latitude, longitude):
     cart.append(R * np.sin(latitude))
     return cart
 
-def get_swe_100m(specular_df):
-    global EARTH_RADIUS
+def get_swe_100m(specular_df, radius=0.1, max_dt=None):
+    '''
+        Pairs of specular points within radius (km) of each other, found with a KD-tree
+        (see spec_neighbours.neighbour_pairs). max_dt (days) only keeps pairs that close in time.
 
+        Returns a DataFrame with one row per pair: the rows i < j of specular_df, their
+        distance (km) and time between them (days), sorted by that time.
+    '''
     print('Beginning SWE 100m revisit calculations')
-    # Round lat and long to 1 deg
-    specular_df['approx_LatSp'] = round(specular_df['Lat'])
-    specular_df['approx_LonSp'] = round(specular_df['Lon'])
-
-    # Calculate time difference
-    # specular_df.sort_values(by=['approx_LatSp', 'approx_LonSp', 'Time'], inplace=True)
-    specular_df = specular_df.groupby(['approx_LatSp', 'approx_LonSp'])
+    time = specular_df['Time'].to_numpy()
+    lat = specular_df['Lat'].to_numpy()
+    lon = specular_df['Lon'].to_numpy()
 
-    for name, group in specular_df:
-        # print(group)
-        test = group.apply(lambda row: get_distance_lla(row['Lat'], row['Lon'], group['Lat'], group['Lon']), axis=1)
-        test = test.to_numpy().reshape((1,-1))
-        
-        km_1 = test[test < 1.0]
+    with telemetry.stage('swe_neighbours', samples_in=len(specular_df)) as record:
+        i, j, distance = neighbour_pairs(lat, lon, radius, time, max_dt, EARTH_RADIUS)
+        record.set(samples_out=len(i))
 
-        if len(km_1) > 0:
-            print('For the following group: ' + str(name) + ' the following points exist: ' + str(km_1))
+    pairs_df = pd.DataFrame({'i': i, 'j': j, 'distance': distance, 'revisit': np.abs(time[j] - time[i])})
+    pairs_df = pairs_df.sort_values('revisit', ignore_index=True)
+    print(str(len(pairs_df)) + ' pairs of specular points within ' + str(radius) + ' km')
+    return pairs_df
 
 def get_distance_lla(row_lat, row_long, group_lat, group_long):
     def radians(degrees):
@@ -410,10 +601,10 @@ def get_distance_lla(row_lat, row_long, group_lat, group_long):
     global EARTH_RADIUS
     # The math module contains a function named
     # radians which converts from degrees to radians.
-    lon1 = radians(row_lat)
-    lon2 = radians(row_long)
-    lat1 = radians(group_lat)
-    lat2 = radians(group_long)
+    lat1 = radians(row_lat)
+    lon1 = radians(row_long)
+    lat2 = radians(group_lat)
+    lon2 = radians(group_long)
       
     # Haversine formula
     dlon = lon2 - lon1
@@ -425,60 +616,130 @@ def get_distance_lla(row_lat, row_long, group_lat, group_long):
     # calculate the result
     return(c * EARTH_RADIUS)
 
-def apply_science_angles(specular_df, science_req='SSM'):
-    if science_req == 'SSM' or science_req == 'FTS' or science_req == 'SWE_L':
-        # this one is L-band
-        specular_df = specular_df[specular_df['theta2'] < 21.0]
-        specular_df = specular_df[specular_df['theta3'] < 62.5]
-    elif science_req == 'RZSM' or science_req == 'SWE_P':
-        # this one is p/VHF-band
-        specular_df = specular_df[specular_df['theta2'] < 60.0]
-        specular_df = specular_df[specular_df['theta3'] < 60.0]
-    else:
+# Latitude bands (deg, bounds included) the revisit percentiles are reported over
+SOIL_REGIONS = {'Global': (-90.0, 50.0), 'Boreal': (50.0, 70.0)}
+LAT_60_REGIONS = {'Lat<=60': (-90.0, 60.0)}
+
+# Bands, angle limits (deg) and regions of every science requirement
+SCIENCE_REQS = {'SSM':   {'bands': ['l'],        'max_theta2': 21.0, 'max_theta3': 62.5, 'regions': SOIL_REGIONS},
+                'FTS':   {'bands': ['l'],        'max_theta2': 21.0, 'max_theta3': 62.5, 'regions': LAT_60_REGIONS},
+                'SWE_L': {'bands': ['l'],        'max_theta2': 21.0, 'max_theta3': 62.5, 'regions': {}},
+                'RZSM':  {'bands': ['p', 'vhf'], 'max_theta2': 60.0, 'max_theta3': 60.0, 'regions': SOIL_REGIONS},
+                'SWE_P': {'bands': ['p'],        'max_theta2': 60.0, 'max_theta3': 60.0, 'regions': LAT_60_REGIONS}}
+
+def science_bands(science_reqs):
+    '''
+        Union of the bands needed by the science requirements, so their
+        specular points can be computed in one run
+    '''
+    bands = []
+    for science_req in science_reqs:
+        if science_req not in SCIENCE_REQS:
+            exit('Not a known science requirement type')
+        bands = bands + [band for band in SCIENCE_REQS[science_req]['bands'] if band not in bands]
+    return bands
+
+def science_mask(specular_df, science_req='SSM'):
+    '''
+        Boolean mask of the rows that meet a science requirement: band and angles.
+        Frames without a Band column (or rows of unknown band) are only cut on the angles.
+    '''
+    if science_req not in SCIENCE_REQS:
         exit('Not a known science requirement type')
-    
-    specular_df = specular_df.drop(columns=['theta2', 'theta3'])
-    return specular_df
+    req = SCIENCE_REQS[science_req]
 
-def get_revisit_stats(specular_df, science_req):
-    # Apply angle requirements
-    specular_df = apply_science_angles(specular_df, science_req)
-    # Get revisit
-    revisit_info = get_revisit_info(specular_df)
+    mask = (specular_df['theta2'].to_numpy() < req['max_theta2']) & (specular_df['theta3'].to_numpy() < req['max_theta3'])
+    if 'Band' in specular_df:
+        band = specular_df['Band'].to_numpy()
+        mask &= np.isin(band, [BAND_CODES[b] for b in req['bands']]) | (band == UNKNOWN_BAND)
+    return mask
 
-    # Get revisit stats based on science requirements
-    if science_req == 'SSM' or science_req == 'RZSM':
-        # Global
-        global_rev = revisit_info[revisit_info['approx_LatSp'] <= 50.0]
+def revisit_sketches(revisit_info, science_req):
+    '''
+        Quantile sketches of the maximum revisit over the regions of a science requirement
+        (see quantile_sketch.RegionSketches). Sketches of different cells or designs merge.
+    '''
+    if science_req not in SCIENCE_REQS:
+        exit('Not a known science requirement type')
 
-        print('99.0 Percentile of Maximum Revisit for '+science_req+' Global: ' + str(global_rev['revisit'].quantile(0.90)))
-        print('99.9 Percentile of Maximum Revisit for '+science_req+' Global: ' + str(global_rev['revisit'].quantile(0.99)))
+    sketches = RegionSketches(SCIENCE_REQS[science_req]['regions'])
+    sketches.add(revisit_info['approx_LatSp'].to_numpy(), revisit_info['revisit'].to_numpy())
+    return sketches
 
-        # Boreal forest
-        boreal = revisit_info[revisit_info['approx_LatSp'] <= 70.0]
-        boreal = revisit_info[revisit_info['approx_LatSp'] >= 50.0]
+def revisit_percentiles(revisit_info, science_req):
+    '''
+        Percentiles (0.90, 0.99) of the maximum revisit over the regions of a science
+        requirement, as {region: (p90, p99)}. Empty for requirements without regions yet.
+        Percentiles come from sketches and are within 0.1 % of the exact ones.
+    '''
+    return revisit_sketches(revisit_info, science_req).quantiles((0.90, 0.99))
 
-        print('99.0 Percentile of Maximum Revisit for '+science_req+' Boreal: ' + str(global_rev['revisit'].quantile(0.90)))
-        print('99.9 Percentile of Maximum Revisit for '+science_req+' Boreal: ' + str(global_rev['revisit'].quantile(0.99)))
+def print_revisit_stats(revisit_info, science_req):
+    percentiles = revisit_percentiles(revisit_info, science_req)
 
+    # Show results
+    if science_req == 'SSM' or science_req == 'RZSM':
+        for region in ['Global', 'Boreal']:
+            print('99.0 Percentile of Maximum Revisit for '+science_req+' '+region+': ' + str(percentiles[region][0]))
+            print('99.9 Percentile of Maximum Revisit for '+science_req+' '+region+': ' + str(percentiles[region][1]))
     elif science_req == 'FTS':
-        # Apply latitudes
-        revisit_info = revisit_info[revisit_info['approx_LatSp'] <= 60.0]
-        
-        # Show results
-        print('99.0 Percentile of Maximum Revisit for FTS: ' + str(revisit_info['revisit'].quantile(0.90)))
-        print('99.9 Percentile of Maximum Revisit for FTS: ' + str(revisit_info['revisit'].quantile(0.99)))
+        print('99.0 Percentile of Maximum Revisit for FTS: ' + str(percentiles['Lat<=60'][0]))
+        print('99.9 Percentile of Maximum Revisit for FTS: ' + str(percentiles['Lat<=60'][1]))
     elif science_req == 'SWE_L':
         print('TODO: SWE_L')
     elif science_req == 'SWE_P':
-        # Apply latitudes
-        revisit_info = revisit_info[revisit_info['approx_LatSp'] <= 60.0]
-        
-        # Show results
-        print('99.0 Percentile of Maximum Revisit for SWE P-Band: ' + str(revisit_info['revisit'].quantile(0.90)))
-        print('99.9 Percentile of Maximum Revisit for SWE P-Band: ' + str(revisit_info['revisit'].quantile(0.99)))
+        print('99.0 Percentile of Maximum Revisit for SWE P-Band: ' + str(percentiles['Lat<=60'][0]))
+        print('99.9 Percentile of Maximum Revisit for SWE P-Band: ' + str(percentiles['Lat<=60'][1]))
+
+    return percentiles
+
+def get_revisit_stats(specular_df, science_req, verbose=True):
+    # science_req can be one requirement or a list of them, which are all
+    # evaluated from the same specular points (see SCIENCE_REQS).
+    # Returns {science_req: {region: (p90, p99)}} (see revisit_percentiles)
+    science_reqs = [science_req] if isinstance(science_req, str) else list(science_req)
+
+    # Apply angle requirements
+    # specular_df can also be a stream of time ordered chunks (see iter_specular_points),
+    # which go into a revisit accumulator per requirement as they arrive, so memory
+    # depends on the grid and not on the length of the simulation
+    if isinstance(specular_df, pd.DataFrame):
+        revisit_infos = {req: get_revisit_info(specular_df, science_mask(specular_df, req)) for req in science_reqs}
     else:
-        exit('Not a known science requirement type')
+        accumulators = {req: RevisitAccumulator() for req in science_reqs}
+        print('Beginning revisit calculations')
+        with telemetry.stage('revisit_stream') as record:
+            for chunk in specular_df:
+                record.add(samples_in=len(chunk))
+                for req in science_reqs:
+                    accumulators[req].update(*_sample_columns(chunk, science_mask(chunk, req)))
+            revisit_infos = {req: accumulators[req].to_frame() for req in science_reqs}
+            invalid = max([accumulator.invalid_samples for accumulator in accumulators.values()], default=0)
+            record.set(invalid=invalid)
+        _print_invalid(invalid)
+
+    stats = {}
+    for req in science_reqs:
+        # Get revisit
+        revisit_info = revisit_infos[req]
+        if verbose:
+            stats[req] = print_revisit_stats(revisit_info, req)
+        else:
+            stats[req] = revisit_percentiles(revisit_info, req)
+
+    return stats
+
+def get_science_stats(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq,
+                      science_reqs=tuple(SCIENCE_REQS), **kwargs):
+    '''
+        Evaluates several science requirements with a single specular run over the union of
+        their bands. Keyword arguments go to get_specular_points. Returns the specular points.
+    '''
+    specular_df = get_specular_points(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq,
+                                      science_bands(science_reqs), **kwargs)
+    get_revisit_stats(specular_df, science_reqs)
+
+    return specular_df
 
 if __name__ == '__main__':
     # Preliminary information
@@ -553,33 +814,14 @@ if __name__ == '__main__':
     # # Frequency of each transmitter constellation
     # trans_freq = ['p','p']
 
-    # SSM
-    desired_freq = ['l']        
-    science = 'SSM'
-    specular_df = get_specular_points(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq, desired_freq)
-    get_revisit_stats(specular_df, science)
-
-    # FTS
-    desired_freq = ['l']        
-    science = 'FTS'
-    # specular_df = get_specular_points(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq, desired_freq)
-    get_revisit_stats(specular_df, science)
-
-    # RZSM
-    desired_freq = ['p', 'vhf']        
-    science = 'RZSM'
-    specular_df = get_specular_points(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq, desired_freq)
-    get_revisit_stats(specular_df, science)
-
-    # SWE P band
-    desired_freq = ['p']        
-    science = 'SWE_P'
-    specular_df = get_specular_points(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq, desired_freq)
-    get_revisit_stats(specular_df, science)
-
-    # SWE L band
-    desired_freq = ['l']        
-    science = 'SWE_L'
-    # specular_df = get_specular_points(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq, desired_freq)
-    # get_revisit_stats(specular_df, science)
-    
+    # Number of processes used to get the specular points
+    workers = 1
+
+    # Directory that keeps specular results between runs (None to always recompute)
+    cache_dir = None
+
+    # All science requirements from one run over the L, P and VHF bands
+    # (SWE_L still only prints a TODO)
+    science_reqs = ['SSM', 'FTS', 'RZSM', 'SWE_P', 'SWE_L']
+    specular_df = get_science_stats(filename, rec_sma, trans_sma, rec_satNum, trans_satNum, trans_freq,
+                                    science_reqs, workers=workers, cache_dir=cache_dir)
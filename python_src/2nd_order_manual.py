@@ -1,6 +1,7 @@
 import numpy as np 
 import pandas as pd
 from Alhazen_Plotemy import branchdeducing_twofinite
+from spec_geometry import specular_unit
 from tqdm import tqdm
 
 # This is not a manual for how to do 2nd order
@@ -77,29 +78,26 @@ def get_specular_points_2(time, receiver, transmitter):
     r_sma = EARTH_RADIUS + 450
     t_sma = EARTH_RADIUS + 35786
 
-    specular_df = pd.DataFrame(columns=['Time', 'spec_x', 'spec_y', 'spec_z', 'trans_x', 'trans_y', 'trans_z', 'rec_x', 'rec_y', 'rec_z'])
+    # Transmitter ECEF 
+    trans_x = t_sma * np.cos(transmitter[:,1]) * np.cos(transmitter[:,0]) / EARTH_RADIUS
+    trans_y = t_sma * np.sin(transmitter[:,1]) * np.cos(transmitter[:,0]) / EARTH_RADIUS
+    trans_z = t_sma * np.sin(transmitter[:,0]) / EARTH_RADIUS
+    trans = np.stack([trans_x, trans_y, trans_z], axis=1)
 
-    for i in tqdm(range(time.shape[0])):
-        # Transmitter ECEF 
-        trans_x = t_sma * np.cos(transmitter[i,1]) * np.cos(transmitter[i,0]) / EARTH_RADIUS
-        trans_y = t_sma * np.sin(transmitter[i,1]) * np.cos(transmitter[i,0]) / EARTH_RADIUS
-        trans_z = t_sma * np.sin(transmitter[i,0]) / EARTH_RADIUS
-        trans = np.array([trans_x, trans_y, trans_z])
-
-        # Receiver ECEF
-        rec_x = r_sma * np.cos(receiver[i,1]) * np.cos(receiver[i,0]) / EARTH_RADIUS
-        rec_y = r_sma * np.sin(receiver[i,1]) * np.cos(receiver[i,0]) / EARTH_RADIUS
-        rec_z = r_sma * np.sin(receiver[i,0]) / EARTH_RADIUS
-        rec = np.array([rec_x, rec_y, rec_z])
-        
-        spec_point = get_spec(rec, trans)
-
-        if spec_point is not None:
-            dic = {'Time': time[i], 'spec_x': spec_point[0], 'spec_y': spec_point[1],\
-                   'spec_z': spec_point[2], 'trans_x': trans[0]*EARTH_RADIUS,\
-                   'trans_y': trans[1]*EARTH_RADIUS, 'trans_z': trans[2]*EARTH_RADIUS,\
-                   'rec_x': rec[0]*EARTH_RADIUS, 'rec_y': rec[1]*EARTH_RADIUS, 'rec_z': rec[2]*EARTH_RADIUS}
-            specular_df = specular_df.append(dic, ignore_index=True)
+    # Receiver ECEF
+    rec_x = r_sma * np.cos(receiver[:,1]) * np.cos(receiver[:,0]) / EARTH_RADIUS
+    rec_y = r_sma * np.sin(receiver[:,1]) * np.cos(receiver[:,0]) / EARTH_RADIUS
+    rec_z = r_sma * np.sin(receiver[:,0]) / EARTH_RADIUS
+    rec = np.stack([rec_x, rec_y, rec_z], axis=1)
+
+    # All the samples at once instead of one np.roots per row
+    spec_point = specular_unit(rec, trans) * EARTH_RADIUS
+    found = ~np.isnan(spec_point[:,0])
+
+    specular_df = pd.DataFrame({'Time': time[found],
+                                'spec_x': spec_point[found,0], 'spec_y': spec_point[found,1], 'spec_z': spec_point[found,2],
+                                'trans_x': trans[found,0]*EARTH_RADIUS, 'trans_y': trans[found,1]*EARTH_RADIUS, 'trans_z': trans[found,2]*EARTH_RADIUS,
+                                'rec_x': rec[found,0]*EARTH_RADIUS, 'rec_y': rec[found,1]*EARTH_RADIUS, 'rec_z': rec[found,2]*EARTH_RADIUS})
     
     print(specular_df)
 
@@ -150,6 +150,112 @@ def branchdeducing_twofinite(obs, c, b):
 	elif (l2 < obs and obs < np.pi/2) or deriv > 0:
 		return  acos(((b * c_obs) * 0.25 + E5 * 0.5 - sqrt(b2 * c_obs2 / 2.0 - E0 / 3.0 - E4 + E6)*0.5).real)
 
+def _twofinite_terms(obs, c, b):
+# Array version of the E0 - E6 coefficients shared by the both-finite
+# routines. The roots are taken in complex128 so that they follow the
+# same principal branch as cmath does for scalars.
+
+	s_obs = np.sin(obs)
+	c_obs = np.cos(obs)
+	c_obs2 = c_obs * c_obs
+	c2 = c**2
+	b2 = b**2
+	bcs = b - c * s_obs
+
+	# E0 - E2 are real for a real observer angle, so only promote to
+	# complex once the roots are taken. Cubes are written out as products
+	# since an array power of 3 goes through the much slower pow().
+	E0 = c2 - 4 + b2 + 2 * b * c * s_obs
+	E0_2 = E0 * E0
+	E1 = 24 * b * c_obs2 * bcs - 48 * (-1 + c2) * c_obs2 + E0_2 
+	E2 = -432 * b2 * (-1 + c2) * c_obs2 * c_obs2 + 432 * c_obs2 * bcs * bcs + 72 * b * c_obs2 * bcs * E0 + 288 * (-1 + c2) * c_obs2 * E0 + 2 * E0_2 * E0 
+	# The discriminant is real, so its square root is either purely real
+	# or purely imaginary
+	disc = -4 * E1 * E1 * E1 + E2 * E2
+	root = np.sqrt(np.abs(disc))
+	E3 = np.empty(disc.shape, dtype=np.complex128)
+	E3.real = np.where(disc >= 0, E2 + root, E2)
+	E3.imag = np.where(disc >= 0, 0.0, root)
+	# Principal cube root in polar form, which is much cheaper than a
+	# complex power
+	r3 = np.cbrt(np.abs(E3))
+	a3 = np.arctan2(E3.imag, E3.real) / 3.0
+	E3.real = r3 * np.cos(a3)
+	E3.imag = r3 * np.sin(a3)
+	E4 = E1 / (6 * 2**(2.0 / 3.0) * E3) + E3 / (12 * 2**(1.0 / 3.0)) 
+	E5 = np.sqrt((b2 * c_obs2) / 4.0 - E0 / 6.0 + E4)
+	E6 = (b**3 * c_obs2 * c_obs - 4 * c_obs * bcs - b * c_obs * E0) / (4 * E5)
+
+	return c_obs, E0, E4, E5, E6
+
+def _branchdeducing_twofinite_block(obs, c, b):
+# Branch deduction for one block of samples. obs is 1D and c, b are
+# either scalars or 1D arrays of the same length.
+
+	b2 = b**2
+	c2 = c**2
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		root = np.sqrt(1 - b2 + c2 + 0j)
+		l1 = -np.arctan2((c + b * root).real, (b2 - c2).real)
+		l2 = -np.arctan2((c - b * root).real, (b2 - c2).real)
+
+		c_obs, E0, E4, E5, E6 = _twofinite_terms(obs, c, b)
+		E7 = b2 * c_obs * c_obs / 2.0 - E0 / 3.0 - E4 + E6
+
+		# The derivative of E7 only decides the branch between l1 and l2
+		# and outside of the observer range, so the lagging point of the
+		# finite difference is only evaluated there. f_E7 at obs is E7.
+		first = (-np.pi / 2 <= obs) & (obs < l1)
+		upper = (l2 < obs) & (obs < np.pi/2)
+		need = ~first & ~upper
+		deriv = np.full(obs.shape, np.nan)
+		if need.any():
+			# Shell constants stay scalar, only per-sample c and b are masked
+			cc = c if c.ndim == 0 else c[need]
+			bb = b if b.ndim == 0 else b[need]
+			c_lag, E0_lag, E4_lag, _, E6_lag = _twofinite_terms(obs[need] - tolerance, cc, bb)
+			E7_lag = bb**2 * c_lag * c_lag / 2.0 - E0_lag / 3.0 - E4_lag + E6_lag
+			deriv[need] = E7[need].real - E7_lag.real
+
+		second = need & (l1 <= obs) & (obs <= l2) & (deriv <= 0)
+		third = ~first & ~second & (upper | (deriv > 0))
+
+		# Only one arccos per sample: the first two branches add the
+		# square root term and the third subtracts it
+		sign = np.where(third, -0.5, 0.5)
+		p = np.arccos(((b * c_obs) * 0.25 + E5 * 0.5 + sign * np.sqrt(E7)).real)
+
+	spec = np.where(first, -p, p)
+	spec[~(first | second | third)] = np.nan
+
+	return spec
+
+def branchdeducing_twofinite_vec(obs, c, b, block=8192):
+# Array version of branchdeducing_twofinite. obs is an ndarray of
+# observer angles and c, b are scalars or arrays that broadcast against
+# it. The branch is picked with masks in the same order as the scalar
+# routine and NaN is returned wherever no solution exists. Samples are
+# processed in blocks so the temporaries stay in cache.
+
+	obs = np.asarray(obs, dtype=np.float64)
+	c = np.asarray(c, dtype=np.float64)
+	b = np.asarray(b, dtype=np.float64)
+	shape = np.broadcast(obs, c, b).shape
+	obs = np.broadcast_to(obs, shape).ravel()
+	if c.ndim > 0:
+		c = np.broadcast_to(c, shape).ravel()
+	if b.ndim > 0:
+		b = np.broadcast_to(b, shape).ravel()
+
+	spec = np.empty(obs.shape)
+	for i in range(0, obs.size, block):
+		part = slice(i, i + block)
+		spec[part] = _branchdeducing_twofinite_block(obs[part],
+			c if c.ndim == 0 else c[part], b if b.ndim == 0 else b[part])
+
+	return spec.reshape(shape)
+
 def numerical(obs, c, b, src=np.pi*0.5, rt=2575.0):
 # Numerically determines the specular point for an arbitrary 
 # configuration of source and observer for a sphere of 
@@ -180,6 +286,74 @@ def numerical(obs, c, b, src=np.pi*0.5, rt=2575.0):
 	return spec
 
 
+def _angle_to(radius, angle, rt, spec):
+# Direction from the point at {spec} on the sphere to a body at
+# ({radius}, {angle}), along with its derivative with respect to {spec}
+
+	X = radius * np.cos(angle) - rt * np.cos(spec)
+	Y = radius * np.sin(angle) - rt * np.sin(spec)
+	d = -rt * (X * np.cos(spec) + Y * np.sin(spec)) / (X**2 + Y**2)
+	return np.arctan2(Y, X), d
+
+def _ie_residual(obs, c, b, src, rt, spec):
+# Incidence - emission at {spec}, wrapped onto (-pi, pi], and its derivative
+
+	t1, d1 = _angle_to(b, obs, rt, spec)
+	t2, d2 = _angle_to(c, src, rt, spec)
+	return np.angle(np.exp(1j * (t1 + t2 - 2 * spec))), d1 + d2 - 2
+
+def numerical_batch(obs, c, b, src=np.pi*0.5, rt=2575.0, tolerance=1e-12, max_iter=50):
+# Batched version of numerical. obs, c, b and src are arrays (or scalars)
+# that broadcast against each other. Newton iterations are run on the
+# incidence - emission residual, safeguarded by bisection whenever the
+# specular point is bracketed between the sub-observer and sub-source
+# points. Every element keeps iterating until it converges and the loop
+# stops as soon as all elements have. Returns the specular angles, the
+# number of iterations each element took and the converged flags.
+
+	obs, c, b, src = np.broadcast_arrays(*[np.asarray(v, dtype=np.float64) for v in (obs, c, b, src)])
+	shape = obs.shape
+	obs, c, b, src = [v.ravel() for v in (obs, c, b, src)]
+	c = rt / c
+	b = rt / b
+
+	# Bracket between the sub-observer and sub-source points, taking the
+	# short way around the sphere
+	obs_w = src + np.angle(np.exp(1j * (obs - src)))
+	f_obs, _ = _ie_residual(obs, c, b, src, rt, obs_w)
+	f_src, _ = _ie_residual(obs, c, b, src, rt, src)
+	bracketed = f_obs * f_src < 0
+	pos = np.where(f_obs > 0, obs_w, src)
+	neg = np.where(f_obs > 0, src, obs_w)
+
+	spec = 0.5 * (obs_w + src)
+	n_iter = np.zeros(spec.shape, dtype=np.int64)
+	converged = np.zeros(spec.shape, dtype=bool)
+
+	idx = np.arange(spec.size)
+	for n in range(max_iter):
+		s = spec[idx]
+		ie_diff, deriv = _ie_residual(obs[idx], c[idx], b[idx], src[idx], rt, s)
+		done = np.abs(ie_diff) <= tolerance
+		converged[idx] = done
+		idx, s, ie_diff, deriv = idx[~done], s[~done], ie_diff[~done], deriv[~done]
+		if idx.size == 0:
+			break
+
+		# Shrink the bracket, then take the Newton step unless it leaves
+		# the bracket, in which case bisect
+		p = np.where(ie_diff > 0, s, pos[idx])
+		q = np.where(ie_diff > 0, neg[idx], s)
+		pos[idx], neg[idx] = p, q
+		with np.errstate(divide='ignore', invalid='ignore'):
+			step = s - ie_diff / deriv
+		outside = ~((step - p) * (step - q) < 0)
+		step = np.where(bracketed[idx] & outside, 0.5 * (p + q), step)
+		spec[idx] = step
+		n_iter[idx] += 1
+
+	return spec.reshape(shape), n_iter.reshape(shape), converged.reshape(shape)
+
 if __name__ == '__main__':
 	obs = np.pi*0.25
 	c = 0.85
@@ -188,4 +362,5 @@ if __name__ == '__main__':
 	onefinite(obs, c),
 	twofinite(obs, c, b),
 	branchdeducing_onefinite(obs, c),
-	branchdeducing_twofinite(obs, c, b))
\ No newline at end of file
+	branchdeducing_twofinite(obs, c, b),
+	numerical_batch(obs, c, b))
\ No newline at end of file
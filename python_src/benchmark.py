@@ -0,0 +1,311 @@
+import argparse
+import importlib
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from os import makedirs
+from os.path import join, dirname, abspath
+
+from ephemeris_store import save_store, load_columns, convert_report, store_name
+from ephemeris_catalog import build_catalog, save_catalog
+import telemetry
+
+## Self-contained benchmarks of the pipeline stages on synthetic data.
+## A synthetic ephemeris of circular orbits is written in the layout of preprocess.py
+## (plus a coarse transmitter report for the interpolation and synthetic Seho output
+## files), then every stage is timed in its own process.
+##
+##   python benchmark.py --size small --out bench.json
+##
+## The JSON has the commit, the configuration and per stage: seconds, samples,
+## samples_per_s, baseline_rss_mb (RSS after the setup of the stage), peak_rss_mb (highest
+## RSS while it ran) and rss_growth_mb (peak over baseline). The peak is the VmHWM of
+## /proc/self/status, reset through /proc/self/clear_refs right before the timed runs, since
+## ru_maxrss is a lifetime high-water mark that a spawned process inherits from its parent.
+## The RSS fields are None where /proc is not available.
+
+MU_EARTH = 398600.4418                   # km^3/s^2
+OMEGA_EARTH = 7.2921159e-5               # rad/s
+
+# Constellation sizes and time span of the presets
+SIZES = {'small':  {'days': 0.25, 'dt': 15.0, 'rec_satNum': [6, 6],   'trans_satNum': [24, 66, 4]},
+         'medium': {'days': 1.0,  'dt': 15.0, 'rec_satNum': [6, 6],   'trans_satNum': [24, 66, 4]},
+         'large':  {'days': 3.0,  'dt': 15.0, 'rec_satNum': [12, 12], 'trans_satNum': [31, 66, 5, 120]}}
+
+# Orbit of the shells the presets draw from: (SMA in km, inclination in deg, band)
+REC_SHELLS = [(6721.0, 97.0), (6921.0, 97.0)]
+TRANS_SHELLS = [(26560.0, 55.0, 'l'), (7154.0, 86.4, 'l'), (42164.0, 0.0, 'p'), (6899.0, 51.6, 'vhf')]
+
+def circular_orbit(t, sma, inclination, raan, phase):
+    '''
+        Sub-satellite lat, lon (deg) of a circular orbit at times t (s) over a rotating Earth
+    '''
+    u = phase + np.sqrt(MU_EARTH / sma**3) * t
+    inc = np.radians(inclination)
+    lat = np.arcsin(np.sin(inc) * np.sin(u))
+    lon = np.arctan2(np.cos(inc) * np.sin(u), np.cos(u)) + raan - OMEGA_EARTH * t
+    return np.degrees(lat), np.degrees(np.mod(lon + np.pi, 2*np.pi) - np.pi)
+
+def shell_positions(t, sma, inclination, num_sats):
+    '''
+        lat, lon (time x satellite, deg) of a Walker-like shell: satellites spread over
+        about sqrt(num_sats) planes
+    '''
+    planes = int(np.ceil(np.sqrt(num_sats)))
+    k = np.arange(num_sats)
+    raan = 2*np.pi * (k % planes) / planes
+    phase = 2*np.pi * (k // planes) / np.ceil(num_sats / planes) + np.pi * (k % planes) / num_sats
+    return circular_orbit(t[:, np.newaxis], sma, inclination, raan, phase)
+
+def synthetic_ephemeris(days=1.0, dt=15.0, rec_satNum=(6, 6), trans_satNum=(24, 66, 4)):
+    '''
+        Synthetic ephemeris in the layout written by preprocess.py: time (s), then lat, lon
+        per receiver satellite, then per transmitter constellation all lats and all lons.
+        Shells and constellations take their orbits from REC_SHELLS and TRANS_SHELLS in turn.
+
+        Returns the data array and its catalog.
+    '''
+    t = np.arange(0.0, days*86400, dt)
+    columns = [t[:, np.newaxis]]
+
+    rec_sma = []
+    for j, n in enumerate(rec_satNum):
+        sma, inclination = REC_SHELLS[j % len(REC_SHELLS)]
+        lat, lon = shell_positions(t, sma, inclination, n)
+        columns = columns + [np.stack((lat, lon), axis=2).reshape(t.shape[0], -1)]
+        rec_sma = rec_sma + [sma]
+
+    trans_sma = []
+    trans_freq = []
+    for i, n in enumerate(trans_satNum):
+        sma, inclination, band = TRANS_SHELLS[i % len(TRANS_SHELLS)]
+        lat, lon = shell_positions(t, sma, inclination, n)
+        columns = columns + [lat, lon]
+        trans_sma = trans_sma + [sma]
+        trans_freq = trans_freq + [band]
+
+    catalog = build_catalog(rec_sma, list(rec_satNum), trans_sma, list(trans_satNum), trans_freq)
+    return np.concatenate(columns, axis=1), catalog
+
+def synthetic_seho(specular, files=8, seed=0):
+    '''
+        Rows of synthetic Seho output (see process_seho_out.get_files_pd) built from
+        specular points, split into a number of files. Returns a list of arrays.
+    '''
+    rng = np.random.default_rng(seed)
+    n = len(specular['Time'])
+    rows = np.zeros((n, 20))
+    rows[:, 0] = 2459500.5 + specular['Time']            # JulianDay
+    rows[:, 4] = specular['TxID']
+    rows[:, 8] = specular['Lat']
+    rows[:, 9] = specular['Lon']
+    rows[:, 18] = rng.random(n) < 0.3                    # LandMask
+    return np.array_split(rows, files)
+
+def write_inputs(workdir, size):
+    '''
+        Writes every input of the benchmarks to workdir. Returns the configuration.
+    '''
+    config = dict(SIZES[size]) if isinstance(size, str) else dict(size)
+    data, catalog = synthetic_ephemeris(config['days'], config['dt'], config['rec_satNum'], config['trans_satNum'])
+
+    # Text report and its binary store and catalog, as preprocess.py leaves them
+    ephemeris = join(workdir, 'ephemeris.txt')
+    np.savetxt(ephemeris, data)
+    save_store(data, ephemeris)
+    save_catalog(catalog, ephemeris)
+
+    # Coarse transmitter report (time in days) for the interpolation stage
+    step = max(1, int(round(300.0 / config['dt'])))
+    coarse = data[::step].copy()
+    coarse[:, 0] = coarse[:, 0] / 86400
+    np.save(join(workdir, 'coarse.npy'), coarse)
+
+    # Specular points, input of the revisit stage and of the Seho files
+    second_order = importlib.import_module('2nd_order')
+    specular_df = second_order.get_specular_points(ephemeris, None, None, None, None, None, ['l', 'p', 'vhf'])
+    np.savez(join(workdir, 'specular.npz'), **{name: specular_df[name].to_numpy() for name in specular_df.columns})
+
+    makedirs(join(workdir, 'seho'), exist_ok=True)
+    for i, rows in enumerate(synthetic_seho({name: specular_df[name].to_numpy() for name in specular_df.columns})):
+        np.savetxt(join(workdir, 'seho', 'seho_' + str(i) + '.txt'), rows, fmt='%.8f', delimiter=' ')
+
+    config['rows'] = data.shape[0]
+    config['columns'] = data.shape[1]
+    config['specular_points'] = len(specular_df)
+    return config
+
+## Stages. Each one does its setup, which is not timed, and returns the timed
+## callable and the number of samples it processes.
+
+def _stage_loading(workdir):
+    ephemeris = join(workdir, 'ephemeris.txt')
+    def run():
+        convert_report(ephemeris)
+        load_columns(ephemeris)
+    data = np.load(store_name(ephemeris), mmap_mode='r')
+    return run, data.shape[0] * (data.shape[1] - 1) // 2
+
+def _stage_interpolation(workdir):
+    preprocess = importlib.import_module('preprocess')
+    coarse = np.load(join(workdir, 'coarse.npy'))
+    days = coarse[-1, 0]
+    dt = 15.0
+    def run():
+        preprocess.interpolation(coarse, dt=dt, days=days)
+    return run, int(days*24*3600 / dt) * (coarse.shape[1] - 1) // 2
+
+def _geometry(workdir):
+    # Observer angles and science angle inputs of every receiver/transmitter sample
+    from ephemeris_catalog import load_catalog, receiver_satellites
+    ephemeris = join(workdir, 'ephemeris.txt')
+    catalog = load_catalog(ephemeris)
+    data = np.radians(load_columns(ephemeris))
+    rec = [(data[:, sat['lat']], data[:, sat['lon']]) for _, sat in receiver_satellites(catalog)][0]
+    trans = catalog['transmitters'][0]
+    lat = data[:, trans['columns'][0]:trans['columns'][0] + trans['num_sats']]
+    lon = data[:, trans['columns'][0] + trans['num_sats']:trans['columns'][1]]
+    return rec, (lat, lon), catalog['receivers'][0]['sma'], trans['sma']
+
+def _stage_alhazen(workdir):
+    from Alhazen_Plotemy import branchdeducing_twofinite_vec
+    rec, trans, rec_sma, trans_sma = _geometry(workdir)
+    obs = (rec[0][:, np.newaxis] + np.pi/2 - trans[0]).ravel()
+    def run():
+        branchdeducing_twofinite_vec(obs, 6371.0 / trans_sma, 6371.0 / rec_sma)
+    return run, obs.shape[0]
+
+def _stage_science_angles(workdir):
+    from spec_geometry import science_angles
+    specular = np.load(join(workdir, 'specular.npz'))
+    rec, trans, rec_sma, trans_sma = _geometry(workdir)
+    # The specular points are reused as stand-ins, only the amount of work matters here
+    n = specular['Lat'].shape[0]
+    i = np.arange(n) % rec[0].shape[0]
+    spec_lat, spec_lon = np.radians(specular['Lat']), np.radians(specular['Lon'])
+    def run():
+        science_angles(spec_lat, spec_lon, rec[0][i], rec[1][i], rec_sma,
+                       trans[0][i, 0], trans[1][i, 0], trans_sma, max_theta1=90.0)
+    return run, n
+
+def _stage_specular(workdir):
+    second_order = importlib.import_module('2nd_order')
+    ephemeris = join(workdir, 'ephemeris.txt')
+    from ephemeris_catalog import load_catalog
+    catalog = load_catalog(ephemeris)
+    rows = np.load(store_name(ephemeris), mmap_mode='r').shape[0]
+    pairs = sum(shell['num_sats'] for shell in catalog['receivers']) * sum(t['num_sats'] for t in catalog['transmitters'])
+    def run():
+        second_order.get_specular_points(ephemeris, None, None, None, None, None, ['l', 'p', 'vhf'])
+    return run, rows * pairs
+
+def _stage_revisit(workdir):
+    second_order = importlib.import_module('2nd_order')
+    with np.load(join(workdir, 'specular.npz')) as data:
+        specular_df = pd.DataFrame({name: data[name] for name in data.files})
+    def run():
+        second_order.get_revisit_info(specular_df.copy())
+    return run, len(specular_df)
+
+def _stage_seho_ingestion(workdir):
+    process_seho_out = importlib.import_module('process_seho_out')
+    file_names = process_seho_out.get_all_files_dir(join(workdir, 'seho'))
+    samples = sum(1 for name in file_names for _ in open(name))
+    def run():
+        process_seho_out.get_files_pd(file_names)
+    return run, samples
+
+def _stage_map_rendering(workdir):
+    process_seho_out = importlib.import_module('process_seho_out')
+    specular_df = process_seho_out.get_files_pd(process_seho_out.get_all_files_dir(join(workdir, 'seho')))
+    revisit_pyramid = process_seho_out.get_revisit_pyramid(specular_df, [])
+    def run():
+        process_seho_out.plot_revisit_map_2(revisit_pyramid, map_name=join(workdir, 'map'))
+    return run, len(revisit_pyramid.levels[1.0]['cell'])
+
+STAGES = {'loading': _stage_loading,
+          'interpolation': _stage_interpolation,
+          'alhazen': _stage_alhazen,
+          'science_angles': _stage_science_angles,
+          'specular': _stage_specular,
+          'revisit': _stage_revisit,
+          'seho_ingestion': _stage_seho_ingestion,
+          'map_rendering': _stage_map_rendering}
+
+def _run_stage(name, workdir, repeat):
+    # Runs in a fresh process. Stages whose optional dependencies are missing are skipped
+    try:
+        run, samples = STAGES[name](workdir)
+    except ImportError as e:
+        return {'skipped': str(e)}
+
+    # Only the timed runs count towards the peak, not the imports and the setup
+    baseline = telemetry.rss_mb()[0]
+    telemetry.reset_peak_rss()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        seconds = seconds + [time.perf_counter() - start]
+    best = min(seconds)
+    peak = telemetry.rss_mb()[1] if baseline is not None else None
+
+    return {'seconds': best, 'samples': int(samples), 'samples_per_s': samples / best if best > 0 else None,
+            'baseline_rss_mb': baseline, 'peak_rss_mb': peak,
+            'rss_growth_mb': peak - baseline if peak is not None and baseline is not None else None}
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=dirname(abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(size='small', stages=None, repeat=3, workdir=None):
+    '''
+        Generates the synthetic inputs and times the stages.
+
+        Inputs:
+            size (str or dict): preset in SIZES, or a dict with days, dt, rec_satNum, trans_satNum
+            stages (list): names of the stages to run (see STAGES), all of them if None
+            repeat (int): every stage runs this many times, the fastest run is reported
+            workdir (str): where the inputs are written, a temporary directory if None
+
+        Returns the results as a dict, ready to be written as JSON.
+    '''
+    stages = list(STAGES) if stages is None else stages
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = workdir or tmp
+        config = write_inputs(workdir, size)
+
+        results = {}
+        # One process per stage, started fresh so the memory of earlier stages is not reused
+        context = get_context('spawn')
+        for name in stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[name] = pool.submit(_run_stage, name, workdir, repeat).result()
+
+    return {'commit': _commit(), 'python': platform.python_version(), 'numpy': np.__version__,
+            'size': size if isinstance(size, str) else 'custom', 'config': config, 'repeat': repeat,
+            'stages': results}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the pipeline stages on synthetic data')
+    parser.add_argument('--size', default='small', choices=list(SIZES), help='size of the synthetic data')
+    parser.add_argument('--stages', nargs='*', default=None, choices=list(STAGES), help='stages to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the fastest is reported')
+    parser.add_argument('--out', default=None, help='write the JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.size, args.stages, args.repeat)
+    if args.out is None:
+        print(json.dumps(results, indent=1))
+    else:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=1)
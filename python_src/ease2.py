@@ -0,0 +1,137 @@
+import numpy as np
+
+## EASE-2 Global grid (EPSG:6933): cylindrical equal-area projection of the WGS84
+## ellipsoid with true scale at +-30 deg, the grid of the SMAP land mask
+## (EZ2Lat_M01_002_vec.float32 / EZ2Lon_M01_002_vec.float32 are its row latitudes and
+## column longitudes at 1 km). Samples are binned analytically, so no vectors have to be
+## read: lat/lon -> projected x, y (m) -> row, column.
+
+# WGS84
+SEMI_MAJOR = 6378137.0
+ECCENTRICITY = 0.0818191908426
+STANDARD_PARALLEL = 30.0
+
+# Upper left corner of the grid (m)
+X0 = -17367530.44516138
+Y0 = 7314540.83086512
+
+# Cell size (m), columns and rows of the global grids
+RESOLUTIONS = {'M01': (1000.895023349556, 34704, 14616),
+               'M09': (9008.055210146, 3856, 1624),
+               'M36': (36032.220840584, 964, 406)}
+
+# Cell ID of samples that are not on the Earth (|lat| > 90 deg, NaN or infinite coordinates)
+INVALID_CELL = -1
+
+def valid_positions(lat, lon):
+    '''
+        True for samples with a latitude in [-90, 90] deg and finite coordinates
+    '''
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return (np.abs(lat) <= 90.0) & np.isfinite(lon)
+
+_E2 = ECCENTRICITY**2
+_SIN1 = np.sin(np.radians(STANDARD_PARALLEL))
+_K0 = np.cos(np.radians(STANDARD_PARALLEL)) / np.sqrt(1 - _E2*_SIN1**2)
+
+def _authalic_q(sin_lat):
+    # q of the equal-area projection of the ellipsoid (Snyder, eq. 3-12)
+    e_sin = ECCENTRICITY * sin_lat
+    return (1 - _E2) * (sin_lat / (1 - e_sin**2) - np.log((1 - e_sin) / (1 + e_sin)) / (2*ECCENTRICITY))
+
+_QP = _authalic_q(1.0)
+
+def project(lat, lon):
+    '''
+        EASE-2 Global x, y (m) of lat, lon (deg). Longitudes are wrapped to [-180, 180).
+    '''
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -90.0, 90.0)
+    lon = np.mod(np.asarray(lon, dtype=np.float64) + 180.0, 360.0) - 180.0
+    x = SEMI_MAJOR * _K0 * np.radians(lon)
+    y = SEMI_MAJOR * _authalic_q(np.sin(np.radians(lat))) / (2*_K0)
+    return x, y
+
+def unproject(x, y):
+    '''
+        Lat, lon (deg) of EASE-2 Global x, y (m)
+    '''
+    beta = np.arcsin(np.clip(2*_K0*np.asarray(y, dtype=np.float64) / (SEMI_MAJOR*_QP), -1.0, 1.0))
+    # Authalic to geodetic latitude (Snyder, eq. 3-18)
+    lat = (beta + (_E2/3 + 31*_E2**2/180 + 517*_E2**3/5040) * np.sin(2*beta)
+                + (23*_E2**2/360 + 251*_E2**3/3780) * np.sin(4*beta)
+                + (761*_E2**3/45360) * np.sin(6*beta))
+    lon = np.asarray(x, dtype=np.float64) / (SEMI_MAJOR*_K0)
+    return np.degrees(lat), np.degrees(lon)
+
+class Ease2Grid:
+    '''
+        EASE-2 Global grid at one of the RESOLUTIONS ('M01', 'M09', 'M36'). Cells have
+        equal area; rows run north to south and columns west to east, like the EZ2 vectors.
+
+        Has the interface of revisit.LatLonGrid (index, cell_id, centre, num_cells), so the
+        revisit calculations can bin onto it.
+
+        Inputs:
+            resolution (str): 'M01' (1 km), 'M09' (9 km) or 'M36' (36 km)
+    '''
+    def __init__(self, resolution='M09'):
+        if resolution not in RESOLUTIONS:
+            raise ValueError('Unknown EASE-2 resolution ' + str(resolution) + ', expected one of ' + ', '.join(RESOLUTIONS))
+        self.resolution = resolution
+        self.cell_size, self.num_cols, self.num_rows = RESOLUTIONS[resolution]
+
+    def __eq__(self, other):
+        return isinstance(other, Ease2Grid) and other.resolution == self.resolution
+
+    def __hash__(self):
+        return hash(('ease2', self.resolution))
+
+    def __repr__(self):
+        return 'Ease2Grid(' + repr(self.resolution) + ')'
+
+    @property
+    def num_cells(self):
+        return self.num_rows * self.num_cols
+
+    def index(self, lat, lon):
+        '''
+            Row and column (int64) of the cells of samples (deg), INVALID_CELL for both
+            where the position is not valid (see valid_positions)
+        '''
+        valid = valid_positions(lat, lon)
+        x, y = project(np.where(valid, lat, 0.0), np.where(valid, lon, 0.0))
+        col = np.floor((x - X0) / self.cell_size).astype(np.int64)
+        row = np.floor((Y0 - y) / self.cell_size).astype(np.int64)
+        # The poles and the antimeridian fall on the outer edges
+        row = np.where(valid, np.clip(row, 0, self.num_rows - 1), INVALID_CELL)
+        col = np.where(valid, np.clip(col, 0, self.num_cols - 1), INVALID_CELL)
+        return row, col
+
+    def cell_id(self, lat, lon):
+        '''
+            Flat cell index (int64) per sample, row * num_cols + col. INVALID_CELL for
+            positions that are not valid.
+        '''
+        row, col = self.index(lat, lon)
+        return np.where(row >= 0, row * self.num_cols + col, INVALID_CELL)
+
+    def centre(self, cell_id):
+        '''
+            Lat, lon (deg) of the centre of cells
+        '''
+        row, col = np.divmod(np.asarray(cell_id, dtype=np.int64), self.num_cols)
+        return unproject(X0 + (col + 0.5)*self.cell_size, Y0 - (row + 0.5)*self.cell_size)
+
+    def row_lats(self):
+        '''
+            Latitude (deg) of the centre of every row, as in EZ2Lat_*.float32
+        '''
+        return unproject(0.0, Y0 - (np.arange(self.num_rows) + 0.5)*self.cell_size)[0]
+
+    def col_lons(self):
+        '''
+            Longitude (deg) of the centre of every column, as in EZ2Lon_*.float32
+        '''
+        return unproject(X0 + (np.arange(self.num_cols) + 0.5)*self.cell_size, 0.0)[1]
@@ -0,0 +1,121 @@
+import json
+from os import replace
+from os.path import exists
+
+## Column catalog of an ephemeris file, kept next to it as JSON.
+## Maps every receiver shell and transmitter constellation (and each of their
+## satellites) to its columns, SMA and band, so runs can pick the columns they
+## need instead of walking the file with a running offset.
+##
+## Layout of the ephemeris (see preprocess.py):
+##   column 0                       time (s)
+##   receivers, per satellite       lat, lon
+##   transmitters, per constellation all lats, then all lons
+
+CATALOG_VERSION = 1
+
+def catalog_name(file_name):
+    '''
+        Name of the catalog that goes with an ephemeris file
+    '''
+    return file_name + '.catalog.json'
+
+def build_catalog(rec_sma, rec_satNum, trans_sma, trans_satNum, trans_freq, trans_names=None):
+    '''
+        Catalog of an ephemeris laid out like preprocess.py writes it.
+
+        Inputs:
+            rec_sma (list): SMA of every receiver shell (km)
+            rec_satNum (list): number of satellites in every receiver shell
+            trans_sma (list): SMA of every transmitter constellation (km), in column order
+            trans_satNum (list): number of satellites in every transmitter constellation
+            trans_freq (list): band of every transmitter constellation
+            trans_names (list): optional names of the transmitter constellations
+    '''
+    column = 1
+    receivers = []
+    rx_id = 0
+    for j in range(len(rec_satNum)):
+        satellites = []
+        for k in range(rec_satNum[j]):
+            satellites = satellites + [{'id': rx_id, 'lat': column + 2*k, 'lon': column + 2*k + 1}]
+            rx_id = rx_id + 1
+        receivers = receivers + [{'shell': j, 'sma': float(rec_sma[j]), 'num_sats': int(rec_satNum[j]),
+                                  'layout': 'lat_lon_pairs', 'columns': [column, column + 2*rec_satNum[j]],
+                                  'satellites': satellites}]
+        column = column + 2*rec_satNum[j]
+
+    # Every constellation gets its columns, whether a run uses it or not
+    transmitters = []
+    tx_id = 0
+    for i in range(len(trans_satNum)):
+        n = int(trans_satNum[i])
+        satellites = [{'id': tx_id + k, 'lat': column + k, 'lon': column + n + k} for k in range(n)]
+        transmitters = transmitters + [{'constellation': i,
+                                        'name': trans_names[i] if trans_names is not None else None,
+                                        'sma': float(trans_sma[i]), 'band': trans_freq[i], 'num_sats': n,
+                                        'layout': 'lats_then_lons', 'columns': [column, column + 2*n],
+                                        'first_id': tx_id, 'satellites': satellites}]
+        column = column + 2*n
+        tx_id = tx_id + n
+
+    return {'version': CATALOG_VERSION, 'time_column': 0, 'num_columns': column,
+            'receivers': receivers, 'transmitters': transmitters}
+
+def save_catalog(catalog, file_name):
+    '''
+        Writes the catalog of the ephemeris file_name
+    '''
+    with open(catalog_name(file_name) + '.tmp', 'w') as f:
+        json.dump(catalog, f, indent=1)
+    replace(catalog_name(file_name) + '.tmp', catalog_name(file_name))
+
+def load_catalog(file_name):
+    '''
+        Reads the catalog of the ephemeris file_name
+    '''
+    if not exists(catalog_name(file_name)):
+        raise FileNotFoundError('No catalog for ' + file_name + ', write one with save_catalog (preprocess.py does)')
+    with open(catalog_name(file_name), 'r') as f:
+        catalog = json.load(f)
+    if catalog.get('version') != CATALOG_VERSION:
+        raise ValueError('Catalog of ' + file_name + ' has version ' + str(catalog.get('version')) +
+                         ', expected ' + str(CATALOG_VERSION))
+    return catalog
+
+def select_transmitters(catalog, bands):
+    '''
+        Transmitter constellations of the catalog in any of the given bands
+    '''
+    return [entry for entry in catalog['transmitters'] if entry['band'] in bands]
+
+def receiver_satellites(catalog):
+    '''
+        (shell entry, satellite entry) for every receiver satellite, in RxID order
+    '''
+    return [(shell, sat) for shell in catalog['receivers'] for sat in shell['satellites']]
+
+def with_receivers(catalog, shells):
+    '''
+        Copy of a catalog with its receivers replaced, for instance by the shells of a candidate
+        design. The transmitter columns stay those of the catalog's own file.
+
+        Inputs:
+            catalog (dict): catalog of the transmitter ephemeris
+            shells (list): dicts with the receiver ephemeris ('file', laid out like preprocess.py
+                           writes receivers: time, then lat, lon per satellite), 'sma' and 'num_sats'.
+                           'first_sat' optionally skips satellites at the start of the file.
+    '''
+    receivers = []
+    rx_id = 0
+    for j, shell in enumerate(shells):
+        column = 1 + 2*shell.get('first_sat', 0)
+        satellites = []
+        for k in range(shell['num_sats']):
+            satellites = satellites + [{'id': rx_id, 'lat': column + 2*k, 'lon': column + 2*k + 1}]
+            rx_id = rx_id + 1
+        receivers = receivers + [{'shell': j, 'sma': float(shell['sma']), 'num_sats': int(shell['num_sats']),
+                                  'layout': 'lat_lon_pairs', 'columns': [column, column + 2*shell['num_sats']],
+                                  'file': shell['file'], 'satellites': satellites}]
+
+    return dict(catalog, receivers=receivers)
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from os import replace
+from os.path import exists, getmtime
+from numpy.lib.format import open_memmap
+from tqdm import tqdm
+
+## Binary columnar copy of the ephemeris report written by preprocess.py.
+## The text file is parsed once into a column-major .npy file next to it,
+## and loaders memory map that file to read only the columns they need.
+
+def store_name(file_name):
+    '''
+        Name of the binary store that goes with a text ephemeris file
+    '''
+    return file_name + '.npy'
+
+def is_current(file_name):
+    '''
+        True if the binary store exists and is not older than the text file
+    '''
+    store = store_name(file_name)
+    if not exists(store):
+        return False
+    return not exists(file_name) or getmtime(store) >= getmtime(file_name)
+
+def convert_report(file_name, skiprows=0, chunk_rows=200000):
+    '''
+        One-time conversion of a whitespace separated report into the binary store.
+        The text is read in chunks, so the whole file never has to be in memory.
+
+        Inputs:
+            file_name (str): path to the text ephemeris
+            skiprows (int): header rows to skip
+            chunk_rows (int): rows parsed per chunk
+    '''
+    # First pass only counts rows and columns
+    with open(file_name, 'r') as f:
+        for _ in range(skiprows):
+            f.readline()
+        first = f.readline()
+        num_rows = 1 + sum(1 for line in f if line.strip())
+    num_cols = len(first.split())
+
+    store = open_memmap(store_name(file_name) + '.tmp', mode='w+', dtype=np.float64,
+                        shape=(num_rows, num_cols), fortran_order=True)
+
+    # round_trip parses every number to the same double as np.loadtxt, the default
+    # parser of pandas can be one ulp off
+    row = 0
+    reader = pd.read_csv(file_name, sep=r'\s+', header=None, skiprows=skiprows,
+                         chunksize=chunk_rows, dtype=np.float64, float_precision='round_trip')
+    for chunk in tqdm(reader, total=-(-num_rows // chunk_rows)):
+        store[row:row+chunk.shape[0]] = chunk.to_numpy()
+        row = row + chunk.shape[0]
+    store.flush()
+    del store
+
+    # Only show the store once it is complete
+    replace(store_name(file_name) + '.tmp', store_name(file_name))
+
+def save_store(data, file_name):
+    '''
+        Writes an in-memory array straight to the binary store of file_name
+    '''
+    np.save(store_name(file_name), np.asfortranarray(data))
+
+def open_store(file_name, skiprows=0):
+    '''
+        Memory maps the binary store of file_name, converting the text file first if needed
+    '''
+    if not is_current(file_name):
+        print('Converting ' + file_name + ' to a binary store (done once per dataset)')
+        convert_report(file_name, skiprows=skiprows)
+
+    return np.load(store_name(file_name), mmap_mode='r')
+
+def load_columns(file_name, columns=None, skiprows=0, rows=None):
+    '''
+        Reads columns of the ephemeris through the memory mapped store.
+        Same shape conventions as np.loadtxt with usecols: a single column comes back 1D.
+
+        Inputs:
+            file_name (str): path to the text ephemeris
+            columns (int, sequence or None): columns to read, all of them if None
+            rows (tuple or None): (start, stop) rows to read, all of them if None
+    '''
+    store = open_store(file_name, skiprows)
+    if rows is not None:
+        store = store[rows[0]:rows[1]]
+    if columns is None:
+        return np.ascontiguousarray(store)
+
+    columns = np.atleast_1d(np.asarray(columns, dtype=np.int64))
+    if columns.size == 1:
+        return np.ascontiguousarray(store[:, columns[0]])
+    # A contiguous range is a plain slice, which reads exactly those columns
+    if np.all(np.diff(columns) == 1):
+        return np.ascontiguousarray(store[:, columns[0]:columns[-1]+1])
+
+    return np.ascontiguousarray(store[:, columns])
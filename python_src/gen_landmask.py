@@ -2,9 +2,26 @@ import numpy as np
 import pandas as pd
 from tqdm import tqdm
 import h5py
+from os.path import join
 
-def get_landmask(land_mask_dir):
+from ease2 import RESOLUTIONS
+from window_coverage import save_land_cells
+
+# Land cell bitsets written by build_land_cells
+LAND_CELLS_FILE = 'land_cells_{resolution}.npz'
+
+def read_land_mask(land_mask_dir):
+    '''
+    1 km EASE-2 land mask (rows north to south, columns west to east)
+    '''
     land_mask_path = land_mask_dir+'Land_Mask_1km_EASE2_grid_150101_v004.h5'
+    with h5py.File(land_mask_path, 'r') as f:
+        group_key = list(f.keys())[1]
+
+        # Get the data
+        return f[group_key]['mask'][()]
+
+def get_landmask(land_mask_dir):
     lat_path       = land_mask_dir+'EZ2Lat_M01_002_vec.float32'
     lon_path       = land_mask_dir+'EZ2Lon_M01_002_vec.float32'
     land_mask = []
@@ -12,11 +29,7 @@ def get_landmask(land_mask_dir):
     lon       = []
 
     print('Getting land mask and latitude and longitude values...')
-    with h5py.File(land_mask_path, 'r') as f:
-        group_key = list(f.keys())[1]
-
-        # Get the data
-        land_mask = np.asarray(list(f[group_key]['mask']))
+    land_mask = read_land_mask(land_mask_dir)
 
     lat = np.fromfile(lat_path, dtype=np.float32)
     lon = np.fromfile(lon_path, dtype=np.float32)
@@ -43,4 +56,35 @@ def get_land_latlon(land_mask_dir):
         # print(df.head())
     
     latlon_mask = pd.concat(list_df)
-    print(latlon_mask)
\ No newline at end of file
+    print(latlon_mask)
+
+def land_cell_bits(land_mask, resolution='M09', min_fraction=0.5):
+    '''
+    Bit-packed land cells of an EASE-2 grid (bit = cell ID, little bit order, see
+    window_coverage.cell_bits) from the 1 km mask. A coarser cell is land when at least
+    min_fraction of its 1 km cells are.
+    '''
+    _, num_cols, num_rows = RESOLUTIONS[resolution]
+    factor = land_mask.shape[1] // num_cols
+    if land_mask.shape != (num_rows*factor, num_cols*factor):
+        raise ValueError('Land mask of shape ' + str(land_mask.shape) + ' does not tile the EASE-2 ' + resolution + ' grid')
+
+    # Strips of rows, so only one strip of the 1 km mask is expanded at a time
+    land = np.zeros((num_rows, num_cols), dtype=bool)
+    strip = max(1, 1024 // factor)
+    for row in range(0, num_rows, strip):
+        block = land_mask[row*factor:(row + strip)*factor] > 0
+        counts = block.reshape(-1, factor, num_cols, factor).sum(axis=(1, 3))
+        land[row:row + strip] = counts >= min_fraction * factor**2
+
+    return np.packbits(land.reshape(-1), bitorder='little')
+
+def build_land_cells(land_mask_dir, resolution='M09', min_fraction=0.5, out_dir=None):
+    '''
+    Writes the land cell bitset of an EASE-2 grid to LAND_CELLS_FILE in out_dir
+    (land_mask_dir by default). Returns the file name.
+    '''
+    bits = land_cell_bits(read_land_mask(land_mask_dir), resolution, min_fraction)
+    file_name = join(land_mask_dir if out_dir is None else out_dir, LAND_CELLS_FILE.format(resolution=resolution))
+    save_land_cells(bits, resolution, file_name)
+    return file_name
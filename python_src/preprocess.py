@@ -1,9 +1,14 @@
 import numpy as np
 from scipy import interpolate
 from tqdm import tqdm
+from ephemeris_store import save_store
+from ephemeris_catalog import build_catalog, save_catalog
+import telemetry
 
 def load_data(file_name, rows=0):
-    data = np.loadtxt(file_name, skiprows=rows)
+    with telemetry.stage('load_report', file=file_name) as record:
+        data = np.loadtxt(file_name, skiprows=rows)
+        record.set(samples_out=data.shape[0], columns=data.shape[1])
 
     return data
 
@@ -11,16 +16,18 @@ def interpolation(transmitters, dt=1, days=15):
     # Generate time list (in days) of interval 1 second
     gran_time = np.linspace(0, days, int(days*24*3600 / dt))
 
-    time = transmitters[:,0]
-    transmitters = np.delete(transmitters,0,axis=1)
-    columns = transmitters.transpose()
-    interpolated = [gran_time]
+    with telemetry.stage('interpolation', samples_in=transmitters.shape[0], columns=transmitters.shape[1]) as record:
+        time = transmitters[:,0]
+        transmitters = np.delete(transmitters,0,axis=1)
+        columns = transmitters.transpose()
+        interpolated = [gran_time]
 
-    for col in tqdm(columns):
-        temp = interpolate.interp1d(time, col, kind='linear')
-        interpolated = interpolated + [temp(gran_time)]
+        for col in tqdm(columns):
+            temp = interpolate.interp1d(time, col, kind='linear')
+            interpolated = interpolated + [temp(gran_time)]
     
-    interpolated = np.array(interpolated).transpose()
+        interpolated = np.array(interpolated).transpose()
+        record.set(samples_out=interpolated.shape[0])
 
     return interpolated
 
@@ -58,7 +65,7 @@ def combine_rec_trans(receivers, transmitters):
 
 if __name__ == '__main__':
     shell_num = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15]
-    shell_type = ['GalileoE11', 'GalileoE18', 'GlonassCOSMOS2425', 'GPSPRN13', 'Iridium106', 'Iridium176',\
+    shell_name = ['GalileoE11', 'GalileoE18', 'GlonassCOSMOS2425', 'GPSPRN13', 'Iridium106', 'Iridium176',\
                 'MUOS1', 'ORBCOMMFM8', 'ORBCOMMFM4', 'ORBCOMMFM109', 'SWARM4', 'SWARM7', 'SWARM9', 'SWARM21', 'SWARM87']
     shell_type = ['l','l','l','l','l','l','p','vhf','vhf','vhf','vhf','vhf','vhf','vhf','vhf']
     shell_sma = [29600.11860223169, 27977.504096425982, 25507.980889761526, 26560.219967218538, 7154.894323517232,\
@@ -77,6 +84,10 @@ if __name__ == '__main__':
                 15, 15, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11,\
                 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11]
     
+    # Receiver shells, in the order of the receiver report
+    rec_sma = [6371.0+350, 6371.0+550]
+    rec_num_sats = [6, 6]
+
     # Get transmitters, reorganize them, and interpolate
     print('Transmitters')
     transmitters_file = '/home/polfr/Documents/dummy_data/10_18_2021_GMAT/ReportFile_transmitters.txt'
@@ -98,4 +109,9 @@ if __name__ == '__main__':
     # Combine and save files
     filename = '/home/polfr/Documents/dummy_data/10_18_2021_GMAT/15day_15s_2orbit_blueTeam.txt'
     combined = combine_rec_trans(receivers, transmitters)
-    np.savetxt(filename, combined)
\ No newline at end of file
+    with telemetry.stage('save_report', samples_in=combined.shape[0], columns=combined.shape[1]):
+        np.savetxt(filename, combined)
+    # Binary copy so 2nd_order.py never has to parse the text
+    save_store(combined, filename)
+    # Which columns belong to which satellite, so runs only read what they need
+    save_catalog(build_catalog(rec_sma, rec_num_sats, shell_sma, shell_num_sats, shell_type, shell_name), filename)
\ No newline at end of file
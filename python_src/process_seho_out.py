@@ -15,6 +15,10 @@ from tqdm import tqdm
 
 from typing import List
 
+import telemetry
+from revisit import revisit_frame, RevisitPyramid
+from window_coverage import LAND_HORIZONS, land_coverage, load_land_cells
+
 ## File which is used to process Seho's output
 
 
@@ -60,20 +64,23 @@ def get_files_pd(file_names: List[str]) -> pd.DataFrame:
                       'idk']
     list_dfs = []
 
-    for file_name in file_names:
-        try:
-            data = pd.read_csv(file_name, sep=" ", header=None)
-        except pd.errors.EmptyDataError:
-            continue
-        data.columns = column_names
-        data = data.drop(columns=unused_columns)
+    with telemetry.stage('seho_ingestion', files=len(file_names)) as record:
+        for file_name in file_names:
+            try:
+                data = pd.read_csv(file_name, sep=" ", header=None)
+            except pd.errors.EmptyDataError:
+                continue
+            data.columns = column_names
+            data = data.drop(columns=unused_columns)
 
-        list_dfs = list_dfs + [data]
+            list_dfs = list_dfs + [data]
 
-    df = pd.concat(list_dfs)
+        df = pd.concat(list_dfs)
+        record.set(samples_in=len(df))
 
-    # Remove water samples (land=1, water=0)
-    df = df[df.LandMask == 1]
+        # Remove water samples (land=1, water=0)
+        df = df[df.LandMask == 1]
+        record.set(samples_out=len(df))
 
     return df
 
@@ -151,6 +158,23 @@ def get_specular_heatmap(specular_df):
 
     hmap.save('test.html')
 
+def _transmitter_mask(all_specular_df, transmitters):
+    # Remove transmitters that we don't want to consider
+    # If transmitters is empty, we consider all transmitters
+    if transmitters:
+        print('Trimming off extra transmitters...')
+        tx_id = all_specular_df['TxID'].to_numpy()
+        keep = np.zeros(tx_id.shape[0], dtype=bool)
+        for trans_set in transmitters:
+            keep |= (tx_id >= trans_set[0]) & (tx_id <= trans_set[1])
+    else:
+        keep = np.ones(len(all_specular_df), dtype=bool)
+
+    # Possible that a transmitter constellation is never used...
+    if not keep.any():
+        exit('This set of transmitters is never used to generate a specular point. Please select another set.')
+    return keep
+
 def get_revisit_info(all_specular_df, transmitters):
     '''
         Returns array with the revisit info
@@ -159,47 +183,48 @@ def get_revisit_info(all_specular_df, transmitters):
             specular_df (Pandas DF): Dataframe which contains lat, lon specular points
             transmitters (List of tuples): Contains which transmitters we are interested. If empty, consider all transmitters
     '''
-    # Remove transmitters that we don't want to consider
-    specular_df = pd.DataFrame()
-    if transmitters:
-        print('Trimming off extra transmitters...')
-        for trans_set in transmitters:
-            # Lower bound
-            specular_df = specular_df.append(all_specular_df[all_specular_df['TxID'] >= trans_set[0]])
-            # Upper bound
-            specular_df = specular_df[specular_df['TxID'] <= trans_set[1]]
-    else:
-        # If transmitters is empty, we consider all transmitters
-        specular_df = all_specular_df
+    keep = _transmitter_mask(all_specular_df, transmitters)
+
+    # One row per 9 km EASE-2 cell with its maximum revisit
+    # Any revisit that is less than 1 hour is NaN. Typically this occurs because of a lack of samples (due to low sim time)
+    with telemetry.stage('seho_revisit', samples_in=int(keep.sum())) as record:
+        max_rev_area_df = revisit_frame(all_specular_df['JulianDay'].to_numpy()[keep],
+                                        all_specular_df['LatSp'].to_numpy()[keep],
+                                        all_specular_df['LonSp'].to_numpy()[keep])
+        record.set(samples_out=len(max_rev_area_df), invalid=max_rev_area_df.attrs['invalid_samples'])
+    if max_rev_area_df.attrs['invalid_samples'] > 0:
+        print('Dropped ' + str(max_rev_area_df.attrs['invalid_samples']) + ' specular points with invalid latitude/longitude')
 
-    # Possible that a transmitter constellation is never used...
-    if specular_df.empty:
-        exit('This set of transmitters is never used to generate a specular point. Please select another set.')
-    
-    # Round lat and long and then use groupby to throw them all in similar buckets
-    specular_df['approx_LatSp'] = round(specular_df['LatSp'],1)
-    specular_df['approx_LonSp'] = round(specular_df['LonSp'],1)
+    return max_rev_area_df
 
-    # Calculate time difference
-    specular_df.sort_values(by=['approx_LatSp', 'approx_LonSp', 'JulianDay'], inplace=True)
-    specular_df['revisit'] = specular_df['JulianDay'].diff()
+def get_revisit_pyramid(all_specular_df, transmitters):
+    '''
+        Revisit at 0.1, 0.5, 1 and 5 deg (see revisit.RevisitPyramid), for maps at any of them
 
-    # Correct for borders
-    specular_df['revisit'].mask(specular_df.approx_LatSp != specular_df.approx_LatSp.shift(1), other=np.nan, inplace=True)
-    specular_df['revisit'].mask(specular_df.approx_LonSp != specular_df.approx_LonSp.shift(1), other=np.nan, inplace=True)
+        Inputs: same as get_revisit_info
+    '''
+    keep = _transmitter_mask(all_specular_df, transmitters)
 
-    # Get max revisit and store in new DF
-    indeces = specular_df.groupby(['approx_LatSp', 'approx_LonSp'])['revisit'].transform(max) == specular_df['revisit']
+    with telemetry.stage('seho_revisit_pyramid', samples_in=int(keep.sum())) as record:
+        revisit_pyramid = RevisitPyramid(all_specular_df['JulianDay'].to_numpy()[keep], all_specular_df['LatSp'].to_numpy()[keep],
+                                         all_specular_df['LonSp'].to_numpy()[keep])
+        record.set(invalid=revisit_pyramid.invalid_samples)
+    return revisit_pyramid
 
-    max_rev_area_df = specular_df[indeces]
+def get_land_coverage(all_specular_df, transmitters, land_cells_file, horizons=LAND_HORIZONS):
+    '''
+        Fraction of the EASE-2 land cells seen within each horizon (days), as {horizon: fraction}
 
-    # Get rid of extra columns
-    # Any revisit that is less than 1 hour is removed. Typically this occurs because of a lack of samples (due to low sim time)
-    extra_cols = ['JulianDay', 'LatSp', 'LonSp', 'AltSp', 'LandMask']
-    max_rev_area_df['revisit'].mask(max_rev_area_df['revisit'] < 0.04, other=np.nan, inplace=True)
-    max_rev_area_df.drop(extra_cols, inplace=True, axis=1)
+        Inputs:
+            all_specular_df, transmitters: same as get_revisit_info
+            land_cells_file (str): land cell bitset written by gen_landmask.build_land_cells
+    '''
+    keep = _transmitter_mask(all_specular_df, transmitters)
+    land_bits, resolution = load_land_cells(land_cells_file)
 
-    return max_rev_area_df
+    with telemetry.stage('seho_land_coverage', samples_in=int(keep.sum()), resolution=resolution):
+        return land_coverage(all_specular_df['JulianDay'].to_numpy()[keep], all_specular_df['LatSp'].to_numpy()[keep],
+                             all_specular_df['LonSp'].to_numpy()[keep], land_bits, resolution, horizons)
 
 def plot_revisit_heatmap(max_rev_area_df):
     # Remove NaNs
@@ -227,16 +252,15 @@ def plot_revisit_heatmap(max_rev_area_df):
 
     hmap.save('test_revisit_10day.html')
 
-def plot_revisit_map_2(max_rev_area_df, map_name='test'):
-    # First reduce the resolution of the polymap to avoid murdering my computer
-    # Round lat and long and then use groupby to throw them all in similar buckets
-    max_rev_area_df['approx_LatSp'] = round(max_rev_area_df['approx_LatSp'])
-    max_rev_area_df['approx_LonSp'] = round(max_rev_area_df['approx_LonSp'])
-
-    # Get max revisit and store in new DF
-    indeces = max_rev_area_df.groupby(['approx_LatSp', 'approx_LonSp'])['revisit'].transform(max) == max_rev_area_df['revisit']
+def plot_revisit_map_2(revisit_pyramid, map_name='test', resolution=1.0):
+    with telemetry.stage('map_rendering', samples_in=len(revisit_pyramid.levels[float(resolution)]['cell']), map_name=map_name):
+        _plot_revisit_map_2(revisit_pyramid, map_name, resolution)
 
-    max_rev_area_df = max_rev_area_df[indeces]
+def _plot_revisit_map_2(revisit_pyramid, map_name='test', resolution=1.0):
+    # The polymap is drawn at a coarse level of the pyramid (1 deg by default) to avoid murdering
+    # my computer. Each cell shows the worst maximum revisit of its 0.1 deg cells
+    max_rev_area_df = revisit_pyramid.frame(resolution)
+    half = resolution / 2
 
     # Now generate the map
     map = folium.Map(location=[42.5, -80], zoom_start=7, )
@@ -244,10 +268,10 @@ def plot_revisit_map_2(max_rev_area_df, map_name='test'):
     # Remove NaNs
     max_rev_area_df = max_rev_area_df[max_rev_area_df['revisit'].notnull()]
     # Generate Polygons
-    max_rev_area_df['geometry'] = max_rev_area_df.apply(lambda row: Polygon([(row.approx_LonSp-0.5, row.approx_LatSp-0.5), 
-                                                                             (row.approx_LonSp+0.5, row.approx_LatSp-0.5),
-                                                                             (row.approx_LonSp+0.5, row.approx_LatSp+0.5),
-                                                                             (row.approx_LonSp-0.5, row.approx_LatSp+0.5)]), axis=1)
+    max_rev_area_df['geometry'] = max_rev_area_df.apply(lambda row: Polygon([(row.approx_LonSp-half, row.approx_LatSp-half), 
+                                                                             (row.approx_LonSp+half, row.approx_LatSp-half),
+                                                                             (row.approx_LonSp+half, row.approx_LatSp+half),
+                                                                             (row.approx_LonSp-half, row.approx_LatSp+half)]), axis=1)
     max_amt = max(max_rev_area_df.revisit.values)
     print('Max revisit value: ', max_amt)
     # colormap_dept = branca.colormap.StepColormap(
@@ -308,7 +332,7 @@ if __name__ == "__main__":
 
     transmitters = [(49,78)]
     max_rev_area_df = get_revisit_info(specular_df, transmitters)
-    plot_revisit_map_2(max_rev_area_df, map_name='polymap_hw05_GPS_10day')
-    plot_revisit_stats(max_rev_area_df, plot_title='Frequency Distribution of Maximum Revisit Time\n GPS - 10 days - 0.1$^\circ$x0.1$^\circ$')
+    plot_revisit_map_2(get_revisit_pyramid(specular_df, transmitters), map_name='polymap_hw05_GPS_10day')
+    plot_revisit_stats(max_rev_area_df, plot_title='Frequency Distribution of Maximum Revisit Time\n GPS - 10 days - EASE-2 9 km')
 
     # get_land_latlon('/home/polfr/Documents/dummy_data/data/')
\ No newline at end of file
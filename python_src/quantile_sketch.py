@@ -0,0 +1,131 @@
+import numpy as np
+
+## Mergeable quantile sketches for revisit statistics.
+## A LogHistogram counts values in fixed logarithmic bins, so every value in a bin is
+## within relative_error of the bin's representative value and any percentile can be
+## answered from the counts alone. Histograms with the same bins merge by adding counts.
+## RegionSketches keeps one histogram per latitude band and fills all of them from the
+## per cell revisit in one call.
+##
+## Sketches hold one value per cell (its maximum revisit), so they merge across workers
+## that cover different cells or designs. Time chunks of the same cells are merged
+## before that, with revisit.merge_accumulators.
+
+class LogHistogram:
+    '''
+        Counts of positive values in logarithmic bins of relative width 2*relative_error
+        between min_value and max_value. Values outside the range go to the first and last
+        bin, NaNs are left out (like Series.quantile).
+
+        Inputs:
+            relative_error (float): bound on the relative error of the quantiles in range
+            min_value, max_value (float): range of the bins (days for revisit)
+    '''
+    def __init__(self, relative_error=0.001, min_value=1e-3, max_value=1e3):
+        self.relative_error = float(relative_error)
+        self.min_value = float(min_value)
+        self.max_value = float(max_value)
+        self._log_gamma = np.log((1 + self.relative_error) / (1 - self.relative_error))
+        self._offset = int(np.floor(np.log(self.min_value) / self._log_gamma))
+        self.counts = np.zeros(int(np.ceil(np.log(self.max_value) / self._log_gamma)) - self._offset + 1, dtype=np.int64)
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def _compatible(self, other):
+        return (self.relative_error == other.relative_error and self.min_value == other.min_value and
+                self.max_value == other.max_value)
+
+    def bins(self, values):
+        '''
+            Bin of each value (NaN values are dropped)
+        '''
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        values = np.clip(values, self.min_value, self.max_value)
+        return np.clip(np.ceil(np.log(values) / self._log_gamma).astype(np.int64) - self._offset, 0, self.counts.shape[0] - 1)
+
+    def add(self, values):
+        '''
+            Adds values to the counts
+        '''
+        self.counts += np.bincount(self.bins(values), minlength=self.counts.shape[0])
+
+    def merge(self, other):
+        '''
+            Adds the counts of a histogram with the same bins
+        '''
+        if not self._compatible(other):
+            raise ValueError('Histograms with different bins cannot be merged')
+        self.counts += other.counts
+        return self
+
+    def _value(self, bin_index):
+        # Representative of a bin: within relative_error of every value in it
+        gamma = np.exp(self._log_gamma)
+        return 2 * gamma**(bin_index + self._offset) / (gamma + 1)
+
+    def quantile(self, q):
+        '''
+            Quantile q (0 ... 1, or an array of them) with linear interpolation between
+            ranks, like Series.quantile. NaN when empty.
+        '''
+        q = np.asarray(q, dtype=np.float64)
+        n = self.count
+        if n == 0:
+            return np.full(q.shape, np.nan)[()]
+
+        rank = q * (n - 1)
+        lo = np.floor(rank)
+        cumulative = np.cumsum(self.counts)
+        v_lo = self._value(np.searchsorted(cumulative, lo, side='right'))
+        v_hi = self._value(np.searchsorted(cumulative, np.minimum(lo + 1, n - 1), side='right'))
+        return (v_lo + (rank - lo) * (v_hi - v_lo))[()]
+
+class RegionSketches:
+    '''
+        One LogHistogram per latitude band.
+
+        Inputs:
+            regions (dict): {name: (min_lat, max_lat)} in deg, bounds included
+            relative_error, min_value, max_value: see LogHistogram
+    '''
+    def __init__(self, regions, relative_error=0.001, min_value=1e-3, max_value=1e3):
+        self.regions = dict(regions)
+        self.sketches = {name: LogHistogram(relative_error, min_value, max_value) for name in self.regions}
+
+    def add(self, lat, values):
+        '''
+            Adds the values of cells at latitudes lat (deg) to the bands they fall in
+        '''
+        lat = np.asarray(lat, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        lat = lat[keep]
+
+        # Values are binned once, each band counts its own cells
+        if len(self.sketches) == 0:
+            return
+        sketch = next(iter(self.sketches.values()))
+        bins = sketch.bins(values[keep])
+        for name, (min_lat, max_lat) in self.regions.items():
+            in_band = (lat >= min_lat) & (lat <= max_lat)
+            self.sketches[name].counts += np.bincount(bins[in_band], minlength=sketch.counts.shape[0])
+
+    def merge(self, other):
+        '''
+            Adds the counts of sketches over the same bands
+        '''
+        if self.regions != other.regions:
+            raise ValueError('Sketches over different regions cannot be merged')
+        for name in self.sketches:
+            self.sketches[name].merge(other.sketches[name])
+        return self
+
+    def quantiles(self, qs=(0.90, 0.99)):
+        '''
+            {region: tuple of quantiles}
+        '''
+        return {name: tuple(float(value) for value in np.atleast_1d(sketch.quantile(qs)))
+                for name, sketch in self.sketches.items()}
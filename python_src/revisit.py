@@ -0,0 +1,384 @@
+import numpy as np
+import pandas as pd
+
+from ease2 import Ease2Grid, INVALID_CELL, valid_positions
+
+## Revisit per grid cell on integer cell IDs.
+## Samples are mapped to integer cells, sorted once on (cell, time), and the gaps
+## between consecutive samples of a cell are reduced per cell with reduceat. The
+## result has one entry per cell instead of a filtered copy of the samples.
+## RevisitAccumulator keeps the same per cell state across time ordered chunks.
+## Samples that are not on the Earth (|lat| > 90 deg, NaN) get INVALID_CELL and are
+## dropped and counted (invalid_samples), not piled into the polar cells.
+
+# Revisits shorter than this (days) come from too few samples in short runs and are NaN
+MIN_REVISIT = 0.04
+
+# Cells the revisit is computed on when no grid is given: equal-area 9 km EASE-2 cells
+# (see ease2.py), so cells do not shrink toward the poles
+DEFAULT_GRID = 'M09'
+
+def default_grid():
+    '''
+        Grid used when none is given
+    '''
+    return Ease2Grid(DEFAULT_GRID)
+
+class LatLonGrid:
+    '''
+        Regular lat/lon grid with cells_per_degree cells per degree, centred on multiples
+        of the resolution. A sample goes to the cell its coordinates round to, the same
+        buckets as round(lat, 1) with 10 cells per degree. Longitudes are wrapped, so
+        190 deg and -170 deg are the same cell.
+
+        Inputs:
+            cells_per_degree (int): 10 for 0.1 deg cells, 1 for 1 deg cells
+    '''
+    def __init__(self, cells_per_degree=10):
+        self.cells_per_degree = int(cells_per_degree)
+        self.num_lat = 180 * self.cells_per_degree + 1         # -90 ... 90 deg
+        self.num_lon = 360 * self.cells_per_degree             # -180 ... 180 deg (exclusive)
+
+    def __eq__(self, other):
+        return isinstance(other, LatLonGrid) and other.cells_per_degree == self.cells_per_degree
+
+    def __hash__(self):
+        return hash(('latlon', self.cells_per_degree))
+
+    @property
+    def resolution(self):
+        return 1.0 / self.cells_per_degree
+
+    @property
+    def num_cells(self):
+        return self.num_lat * self.num_lon
+
+    def index(self, lat, lon):
+        '''
+            Row (from -90 deg) and column (from -180 deg) of the cells of samples (deg),
+            INVALID_CELL for both where the position is not valid
+        '''
+        valid = valid_positions(lat, lon)
+        row = np.rint(np.where(valid, lat, 0.0) * self.cells_per_degree).astype(np.int64) + 90 * self.cells_per_degree
+        col = np.rint(np.where(valid, lon, 0.0) * self.cells_per_degree).astype(np.int64) + 180 * self.cells_per_degree
+        return np.where(valid, row, INVALID_CELL), np.where(valid, np.mod(col, self.num_lon), INVALID_CELL)
+
+    def cell_id(self, lat, lon):
+        '''
+            Flat cell index (int64) per sample. IDs sort by latitude, then longitude.
+            INVALID_CELL for positions that are not valid.
+        '''
+        row, col = self.index(lat, lon)
+        return np.where(row >= 0, row * self.num_lon + col, INVALID_CELL)
+
+    def centre(self, cell_id):
+        '''
+            Lat, lon (deg) of the centre of cells
+        '''
+        row, col = np.divmod(np.asarray(cell_id, dtype=np.int64), self.num_lon)
+        # Dividing (not multiplying by the resolution) gives the same floats as round()
+        return (row - 90 * self.cells_per_degree) / self.cells_per_degree, (col - 180 * self.cells_per_degree) / self.cells_per_degree
+
+def _reduce_cells(time, cell):
+    # Per cell number of samples, first and last time and largest gap (-inf if seen once),
+    # from one sort on (cell, time)
+    order = np.lexsort((time, cell))
+    cell = cell[order]
+    time = time[order]
+
+    # First and last sample of every cell
+    starts = np.flatnonzero(np.concatenate(([True], cell[1:] != cell[:-1])))
+    ends = np.append(starts[1:], cell.shape[0]) - 1
+
+    # Gap to the previous sample, which does not exist at the start of a cell
+    gaps = np.empty_like(time)
+    gaps[0] = -np.inf
+    np.subtract(time[1:], time[:-1], out=gaps[1:])
+    gaps[starts] = -np.inf
+
+    return cell[starts], ends - starts + 1, time[starts], time[ends], np.maximum.reduceat(gaps, starts)
+
+def revisit_cells(time, lat, lon, grid=None):
+    '''
+        Maximum revisit of every cell that has been seen.
+
+        Inputs:
+            time (ndarray): sample times (days)
+            lat, lon (ndarray): sample positions (deg)
+            grid (LatLonGrid or Ease2Grid): default_grid() if None
+
+        Returns a dict of per cell arrays, sorted by cell ID:
+            cell (cell IDs), samples (number of samples), max_revisit (largest gap, days;
+            -inf for cells seen only once)
+        and invalid_samples, the number of samples dropped for invalid positions.
+    '''
+    grid = default_grid() if grid is None else grid
+    cell = grid.cell_id(lat, lon)
+    valid = cell != INVALID_CELL
+    time = np.asarray(time, dtype=np.float64)[valid]
+    cell = cell[valid]
+    invalid = int(valid.shape[0] - cell.shape[0])
+    if cell.shape[0] == 0:
+        return {'cell': cell, 'samples': np.zeros(0, dtype=np.int64), 'max_revisit': np.zeros(0), 'invalid_samples': invalid}
+
+    cell, samples, _, _, max_revisit = _reduce_cells(time, cell)
+    return {'cell': cell, 'samples': samples, 'max_revisit': max_revisit, 'invalid_samples': invalid}
+
+def _frame(grid, cell, samples, max_revisit, min_revisit, **extra):
+    # Compact per cell DataFrame of the cells seen at least twice
+    seen_twice = samples > 1
+    lat_c, lon_c = grid.centre(cell[seen_twice])
+    revisit = max_revisit[seen_twice]
+    revisit = np.where(revisit < min_revisit, np.nan, revisit)
+
+    columns = {'approx_LatSp': lat_c, 'approx_LonSp': lon_c, 'revisit': revisit, 'samples': samples[seen_twice]}
+    columns.update({name: values[seen_twice] for name, values in extra.items()})
+    return pd.DataFrame(columns)
+
+def revisit_frame(time, lat, lon, grid=None, min_revisit=MIN_REVISIT):
+    '''
+        Per cell maximum revisit as a compact DataFrame with columns approx_LatSp,
+        approx_LonSp (cell centre), revisit (days) and samples.
+
+        Cells seen only once are left out. Revisits below min_revisit are NaN. The number of
+        samples dropped for invalid positions is in frame.attrs['invalid_samples'].
+    '''
+    grid = default_grid() if grid is None else grid
+    cells = revisit_cells(time, lat, lon, grid)
+    frame = _frame(grid, cells['cell'], cells['samples'], cells['max_revisit'], min_revisit)
+    frame.attrs['invalid_samples'] = cells['invalid_samples']
+    return frame
+
+def _sorted_unique(values):
+    # np.unique, through a plain sort (faster than np.unique on large int64 arrays)
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if values.shape[0] > 0 else values
+
+def _empty_state():
+    # Per cell state of RevisitAccumulator, in cell ID order
+    return {'cell': np.zeros(0, dtype=np.int64), 'samples': np.zeros(0, dtype=np.int64),
+            'first_seen': np.zeros(0), 'last_seen': np.zeros(0), 'max_gap': np.zeros(0),
+            'gap_count': np.zeros(0, dtype=np.int64), 'gap_sum': np.zeros(0)}
+
+def _combine(early, late):
+    # State of the cells of two states, the first one covering earlier times. Cells in both
+    # are bridged by the gap between the last sample of early and the first one of late
+    cell = _sorted_unique(np.concatenate((early['cell'], late['cell'])))
+    i_early = np.searchsorted(cell, early['cell'])
+    i_late = np.searchsorted(cell, late['cell'])
+
+    in_early = np.zeros(cell.shape[0], dtype=bool)
+    in_early[i_early] = True
+    both = in_early[i_late]
+
+    last_early = np.full(cell.shape[0], np.nan)
+    last_early[i_early] = early['last_seen']
+    bridge = late['first_seen'][both] - last_early[i_late[both]]
+
+    state = {'cell': cell, 'samples': np.zeros(cell.shape[0], dtype=np.int64),
+             'first_seen': np.full(cell.shape[0], np.nan), 'last_seen': np.full(cell.shape[0], np.nan),
+             'max_gap': np.full(cell.shape[0], -np.inf), 'gap_count': np.zeros(cell.shape[0], dtype=np.int64),
+             'gap_sum': np.zeros(cell.shape[0])}
+    for name in ['samples', 'gap_count', 'gap_sum']:
+        state[name][i_early] += early[name]
+        state[name][i_late] += late[name]
+    state['gap_count'][i_late[both]] += 1
+    state['gap_sum'][i_late[both]] += bridge
+
+    state['first_seen'][i_late] = late['first_seen']
+    state['first_seen'][i_early] = early['first_seen']
+    state['last_seen'][i_early] = early['last_seen']
+    state['last_seen'][i_late] = late['last_seen']
+
+    state['max_gap'][i_early] = early['max_gap']
+    state['max_gap'][i_late] = np.maximum(state['max_gap'][i_late], late['max_gap'])
+    state['max_gap'][i_late[both]] = np.maximum(state['max_gap'][i_late[both]], bridge)
+    return state
+
+class RevisitAccumulator:
+    '''
+        Revisit statistics that are updated chunk by chunk. Per cell it keeps the number of
+        samples, first and last time seen, the largest gap and the number and sum of the gaps
+        (for the mean revisit). Only cells that have been seen are stored, so memory grows
+        with the cells seen and not with the grid or the length of the simulation.
+
+        Chunks have to arrive in time order: a chunk may not contain samples older than
+        the ones already added. Accumulators of disjoint time ranges (e.g. from parallel
+        workers) are combined with merge_accumulators, which takes them in any order.
+        merge itself only adds the time range right before or after this one.
+
+        Inputs:
+            grid (LatLonGrid or Ease2Grid): default_grid() if None
+    '''
+    def __init__(self, grid=None):
+        self.grid = default_grid() if grid is None else grid
+        self.state = _empty_state()
+        self.invalid_samples = 0
+        self.t_min = np.inf
+        self.t_max = -np.inf
+
+    @property
+    def num_cells(self):
+        return self.state['cell'].shape[0]
+
+    def update(self, time, lat, lon):
+        '''
+            Adds a chunk of samples: times (days) and positions (deg)
+        '''
+        time = np.asarray(time, dtype=np.float64)
+        if time.shape[0] == 0:
+            return
+        if time.min() < self.t_max:
+            raise ValueError('Chunks have to be added in time order, got a sample at ' + str(time.min()) +
+                             ' after ' + str(self.t_max))
+
+        cell = self.grid.cell_id(lat, lon)
+        valid = cell != INVALID_CELL
+        self.invalid_samples = self.invalid_samples + int(valid.shape[0] - valid.sum())
+        if not valid.any():
+            return
+
+        cell, samples, first, last, max_gap = _reduce_cells(time[valid], cell[valid])
+        chunk = {'cell': cell, 'samples': samples, 'first_seen': first, 'last_seen': last,
+                 'max_gap': max_gap, 'gap_count': samples - 1, 'gap_sum': last - first}
+        self.state = _combine(self.state, chunk)
+        self.t_min = min(self.t_min, time.min())
+        self.t_max = max(self.t_max, time.max())
+
+    def merge(self, other):
+        '''
+            Adds the statistics of an accumulator over a time range that does not overlap this
+            one. Nothing may fall between the two ranges: the gap from the end of the earlier
+            range to the start of the later one is counted as a gap of every cell seen in both.
+            Use merge_accumulators for parts that finish in any order.
+        '''
+        if self.grid != other.grid:
+            raise ValueError('Accumulators are on different grids')
+        if other.t_min >= self.t_max:
+            self.state = _combine(self.state, other.state)
+        elif other.t_max <= self.t_min:
+            self.state = _combine(other.state, self.state)
+        else:
+            raise ValueError('Accumulators cover overlapping time ranges')
+
+        self.invalid_samples = self.invalid_samples + other.invalid_samples
+        self.t_min = min(self.t_min, other.t_min)
+        self.t_max = max(self.t_max, other.t_max)
+        return self
+
+    def to_frame(self, min_revisit=MIN_REVISIT):
+        '''
+            Same columns as revisit_frame, plus mean_revisit, first_seen and last_seen
+        '''
+        state = self.state
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_revisit = state['gap_sum'] / state['gap_count']
+        return _frame(self.grid, state['cell'], state['samples'], state['max_gap'], min_revisit,
+                      mean_revisit=mean_revisit, first_seen=state['first_seen'], last_seen=state['last_seen'])
+
+def merge_accumulators(accumulators):
+    '''
+        One accumulator from accumulators over disjoint time ranges, e.g. the chunks of
+        parallel workers in the order they finish. They are merged in time order, so the
+        result is the same as one accumulator updated with all the samples in turn.
+    '''
+    accumulators = sorted(accumulators, key=lambda accumulator: accumulator.t_min)
+    if len(accumulators) == 0:
+        return RevisitAccumulator()
+    merged = RevisitAccumulator(accumulators[0].grid)
+    for accumulator in accumulators:
+        merged.merge(accumulator)
+    return merged
+
+# Levels of the revisit pyramid (deg). Every level is a whole number of cells of the one before
+PYRAMID_RESOLUTIONS = (0.1, 0.5, 1.0, 5.0)
+
+class RevisitPyramid:
+    '''
+        Per cell revisit aggregates on nested lat/lon grids, for maps and statistics at
+        several resolutions. Cells of a level span [k*res, (k+1)*res) from -90 and -180 deg,
+        so each coarse cell is exactly a block of finer cells.
+
+        The finest level is computed from the samples in one pass, coarser levels are
+        reduced from the level below: the maximum of the finer maximum revisits (the worst
+        sub-cell, what the maps show), the sums of the samples, gap counts and gap sums (so
+        mean_revisit is the mean gap over the sub-cells).
+
+        Inputs:
+            time (ndarray): sample times (days)
+            lat, lon (ndarray): sample positions (deg)
+            resolutions (tuple): levels (deg), finest first
+    '''
+    def __init__(self, time, lat, lon, resolutions=PYRAMID_RESOLUTIONS):
+        base = resolutions[0]
+        self.factors = [int(round(res / base)) for res in resolutions]
+        if any(np.abs(np.array(self.factors) * base - np.array(resolutions)) > 1e-9) or \
+           any(b % a != 0 for a, b in zip(self.factors[:-1], self.factors[1:])):
+            raise ValueError('Pyramid resolutions have to be whole multiples of each other: ' + str(resolutions))
+        if abs(360.0 / base - round(360.0 / base)) > 1e-9:
+            raise ValueError('The finest pyramid resolution has to divide 360 deg: ' + str(base))
+        self.resolutions = tuple(float(res) for res in resolutions)
+        self.num_rows = [int(np.ceil(180.0 / res - 1e-9)) for res in self.resolutions]
+        self.num_cols = [int(np.ceil(360.0 / res - 1e-9)) for res in self.resolutions]
+
+        # Finest level from the samples on the Earth
+        valid = valid_positions(lat, lon)
+        self.invalid_samples = int(valid.shape[0] - valid.sum())
+        time = np.asarray(time, dtype=np.float64)[valid]
+        row = np.floor((np.asarray(lat, dtype=np.float64)[valid] + 90.0) / base).astype(np.int64)
+        col = np.floor((np.asarray(lon, dtype=np.float64)[valid] + 180.0) / base).astype(np.int64)
+        # Only exactly 90 deg is clipped, into the last row
+        cell = np.clip(row, 0, self.num_rows[0] - 1) * self.num_cols[0] + np.mod(col, self.num_cols[0])
+        if cell.shape[0] == 0:
+            levels = [{'cell': cell, 'samples': np.zeros(0, dtype=np.int64), 'max_revisit': np.zeros(0),
+                       'gap_count': np.zeros(0, dtype=np.int64), 'gap_sum': np.zeros(0)}]
+        else:
+            cell, samples, first, last, max_revisit = _reduce_cells(time, cell)
+            levels = [{'cell': cell, 'samples': samples, 'max_revisit': max_revisit,
+                       'gap_count': samples - 1, 'gap_sum': last - first}]
+
+        # Coarser levels from the level below
+        for level in range(1, len(self.resolutions)):
+            levels = levels + [self._reduce(levels[-1], level)]
+        self.levels = dict(zip(self.resolutions, levels))
+
+    def _reduce(self, fine, level):
+        ratio = self.factors[level] // self.factors[level - 1]
+        row, col = np.divmod(fine['cell'], self.num_cols[level - 1])
+        cell = (row // ratio) * self.num_cols[level] + col // ratio
+        if cell.shape[0] == 0:
+            return dict(fine, cell=cell)
+
+        order = np.argsort(cell, kind='stable')
+        cell = cell[order]
+        starts = np.flatnonzero(np.concatenate(([True], cell[1:] != cell[:-1])))
+        return {'cell': cell[starts],
+                'samples': np.add.reduceat(fine['samples'][order], starts),
+                'max_revisit': np.maximum.reduceat(fine['max_revisit'][order], starts),
+                'gap_count': np.add.reduceat(fine['gap_count'][order], starts),
+                'gap_sum': np.add.reduceat(fine['gap_sum'][order], starts)}
+
+    def centre(self, resolution, cell_id):
+        '''
+            Lat, lon (deg) of the centre of cells of a level
+        '''
+        level = self.resolutions.index(float(resolution))
+        row, col = np.divmod(np.asarray(cell_id, dtype=np.int64), self.num_cols[level])
+        return -90.0 + (row + 0.5) * self.resolutions[level], -180.0 + (col + 0.5) * self.resolutions[level]
+
+    def frame(self, resolution, min_revisit=MIN_REVISIT):
+        '''
+            One level as a DataFrame with the columns of revisit_frame (approx_LatSp and
+            approx_LonSp are cell centres) plus mean_revisit
+        '''
+        if float(resolution) not in self.levels:
+            raise ValueError('No pyramid level at ' + str(resolution) + ' deg, levels are ' + str(self.resolutions))
+        data = self.levels[float(resolution)]
+        seen_twice = data['samples'] > 1
+        lat_c, lon_c = self.centre(resolution, data['cell'][seen_twice])
+        revisit = data['max_revisit'][seen_twice]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_revisit = data['gap_sum'][seen_twice] / data['gap_count'][seen_twice]
+        return pd.DataFrame({'approx_LatSp': lat_c, 'approx_LonSp': lon_c,
+                             'revisit': np.where(revisit < min_revisit, np.nan, revisit),
+                             'samples': data['samples'][seen_twice], 'mean_revisit': mean_revisit})
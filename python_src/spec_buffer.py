@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+## Growable columnar buffer for specular point results.
+## Replaces repeated pd.concat inside the specular loops, which copies
+## everything gathered so far on every iteration.
+
+# Columns produced by get_specular_points and their types
+SPEC_COLUMNS = {'Time':   np.float64,       # days
+                'Lat':    np.float64,       # deg
+                'Lon':    np.float64,       # deg
+                'theta2': np.float64,       # deg
+                'theta3': np.float64,       # deg
+                'TxID':   np.int32,         # transmitter index over all constellations
+                'RxID':   np.int32,         # receiver index over all shells
+                'Band':   np.int8}          # band of the transmitter, see BAND_CODES
+
+# Codes of the transmitter bands in the Band column
+BAND_CODES = {'l': 0, 'p': 1, 'vhf': 2}
+UNKNOWN_BAND = -1
+
+class SpecularBuffer:
+    '''
+        Typed column arrays that grow by doubling.
+
+        Inputs:
+            columns (dict): column name -> numpy dtype
+            capacity (int): initial number of rows
+    '''
+    def __init__(self, columns=SPEC_COLUMNS, capacity=1 << 16):
+        self.dtypes = dict(columns)
+        self.size = 0
+        self.data = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.dtypes.items()}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return next(iter(self.data.values())).shape[0]
+
+    def _reserve(self, rows):
+        if rows <= self.capacity:
+            return
+        capacity = max(self.capacity, 1)
+        while capacity < rows:
+            capacity = capacity * 2
+        for name in self.data:
+            grown = np.empty(capacity, dtype=self.dtypes[name])
+            grown[:self.size] = self.data[name][:self.size]
+            self.data[name] = grown
+
+    def append(self, **columns):
+        '''
+            Appends one block of rows. Every column must be given; scalars are broadcast.
+        '''
+        if set(columns) != set(self.data):
+            raise ValueError('Expected columns ' + str(list(self.data)) + ', got ' + str(list(columns)))
+        sizes = [np.size(values) for values in columns.values() if np.ndim(values) > 0]
+        n = max(sizes) if sizes else 1
+        self._reserve(self.size + n)
+        for name, values in columns.items():
+            self.data[name][self.size:self.size+n] = values
+        self.size = self.size + n
+
+    def extend(self, other):
+        '''
+            Appends everything held by another buffer
+        '''
+        self.append(**other.arrays())
+
+    def arrays(self):
+        '''
+            Views of the filled part of every column (no copy). These can be
+            handed to downstream stages directly.
+        '''
+        return {name: values[:self.size] for name, values in self.data.items()}
+
+    def to_dataframe(self):
+        '''
+            Builds the DataFrame once, at the end
+        '''
+        return pd.DataFrame({name: values.copy() for name, values in self.arrays().items()})
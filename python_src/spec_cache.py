@@ -0,0 +1,229 @@
+import numpy as np
+import hashlib
+import json
+import shutil
+from os import getpid, listdir, makedirs, replace, stat
+from os.path import join, exists, isdir, abspath
+
+from spec_buffer import SpecularBuffer, SPEC_COLUMNS
+from ephemeris_store import store_name
+
+## On-disk cache of get_specular_points results.
+## Entries are keyed by the content of the ephemeris, the shells, the band
+## selection and the solver version, so any change to those gives a new key.
+## Each entry is a directory with one .npz partition per transmitter
+## constellation and a manifest written last, which marks the entry complete.
+## Rows are stored in the order of an ordered run (see partition_result), so an entry
+## written by a run with ordered=False can be served to any caller.
+
+# Bump whenever a change to the solver or the geometry changes the specular points
+SOLVER_VERSION = 2
+
+# Bump whenever the layout of cached results changes (not the pairs, see PAIR_COLUMNS)
+RESULT_VERSION = 2
+
+MANIFEST = 'manifest.json'
+
+def file_digest(file_name, block=1 << 24):
+    '''
+        SHA-1 of the content of a file. The digest is kept in a side file together
+        with the size and modification time it belongs to, so big ephemerides are
+        only hashed again when they change.
+    '''
+    info = stat(file_name)
+    side = file_name + '.sha1'
+    if exists(side):
+        with open(side, 'r') as f:
+            size, mtime, digest = f.read().split()
+        if int(size) == info.st_size and int(mtime) == info.st_mtime_ns:
+            return digest
+
+    sha = hashlib.sha1()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    try:
+        with open(side, 'w') as f:
+            f.write(str(info.st_size) + ' ' + str(info.st_mtime_ns) + ' ' + digest)
+    except OSError:
+        pass                        # read-only data directory, hash again next time
+    return digest
+
+def ephemeris_digest(filename):
+    '''
+        Digest of an ephemeris: the text report, or its binary store if only that is kept
+    '''
+    return file_digest(filename if exists(filename) else store_name(filename))
+
+def cache_key(filename, catalog, desired_freq, lut_error=None):
+    '''
+        Key of a specular run: ephemeris content, receiver shells, transmitter
+        constellations in the selected bands, the bands, solver version and LUT error
+    '''
+    selected = [entry for entry in catalog['transmitters'] if entry['band'] in desired_freq]
+    params = {'ephemeris': ephemeris_digest(filename),
+              'receivers': [(shell['sma'], shell['num_sats'], shell['columns'],
+                             ephemeris_digest(shell['file']) if shell.get('file') else None)
+                            for shell in catalog['receivers']],
+              'transmitters': [(entry['sma'], entry['num_sats'], entry['band'], entry['columns'], entry['first_id'])
+                               for entry in selected],
+              'bands': sorted(desired_freq),
+              'solver': SOLVER_VERSION,
+              'result': RESULT_VERSION,
+              'lut_error': lut_error}
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+def _read_manifest(entry):
+    try:
+        with open(join(entry, MANIFEST), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_result(cache_dir, key):
+    '''
+        Cached result as a SpecularBuffer, or None if there is no complete entry for key
+    '''
+    entry = join(cache_dir, key)
+    manifest = _read_manifest(entry)
+    if manifest is None:
+        return None
+
+    spec_buf = SpecularBuffer(capacity=max(manifest['rows'], 1))
+    for part in manifest['partitions']:
+        with np.load(join(entry, part)) as data:
+            spec_buf.append(**{name: data[name] for name in SPEC_COLUMNS})
+    return spec_buf
+
+def partition_result(columns, catalog, desired_freq):
+    '''
+        Splits a result into one partition per transmitter constellation in the selected bands.
+        Rows of a partition are put in the order of an ordered run: by receiver, then time,
+        then transmitter, whatever order the pairs finished in.
+    '''
+    tx_id = columns['TxID']
+    partitions = []
+    for entry in catalog['transmitters']:
+        if entry['band'] not in desired_freq:
+            continue
+        rows = np.flatnonzero((tx_id >= entry['first_id']) & (tx_id < entry['first_id'] + entry['num_sats']))
+        rows = rows[np.lexsort((tx_id[rows], columns['Time'][rows], columns['RxID'][rows]))]
+        partitions = partitions + [{name: values[rows] for name, values in columns.items()}]
+    return partitions
+
+def save_result(cache_dir, key, partitions, filename):
+    '''
+        Writes a result to the cache.
+
+        Inputs:
+            cache_dir (str): cache directory
+            key (str): see cache_key
+            partitions (list): dicts of column arrays, one per transmitter constellation
+            filename (str): ephemeris the result was computed from
+    '''
+    entry = join(cache_dir, key)
+    tmp = entry + '.' + str(getpid()) + '.tmp'
+    if exists(tmp):
+        shutil.rmtree(tmp)
+    makedirs(tmp)
+
+    names = []
+    rows = 0
+    for i, columns in enumerate(partitions):
+        names = names + ['part_' + str(i).zfill(4) + '.npz']
+        np.savez(join(tmp, names[-1]), **columns)
+        rows = rows + len(columns['Time'])
+
+    with open(join(tmp, MANIFEST), 'w') as f:
+        json.dump({'ephemeris': abspath(filename), 'digest': ephemeris_digest(filename), 'solver': SOLVER_VERSION,
+                   'result': RESULT_VERSION, 'rows': rows, 'partitions': names}, f, indent=1)
+    if exists(entry):
+        shutil.rmtree(entry)
+    replace(tmp, entry)
+
+    prune(cache_dir, filename)
+
+def prune(cache_dir, filename=None):
+    '''
+        Removes stale entries: those of an older solver version or result layout and, if filename is
+        given, those computed from an earlier version of that ephemeris. Entries
+        without a manifest, left behind by interrupted runs, are removed as well.
+        Entries still being written (.tmp) and the pair store are left alone.
+    '''
+    digest = ephemeris_digest(filename) if filename is not None else None
+    for name in listdir(cache_dir):
+        entry = join(cache_dir, name)
+        if not isdir(entry) or name.endswith('.tmp') or name == 'pairs':
+            continue
+        manifest = _read_manifest(entry)
+        stale = manifest is None or manifest['solver'] != SOLVER_VERSION or manifest.get('result') != RESULT_VERSION
+        if manifest is not None and digest is not None:
+            stale = stale or (manifest['ephemeris'] == abspath(filename) and manifest['digest'] != digest)
+        if stale:
+            shutil.rmtree(entry)
+
+## Per pair storage. Results of one receiver satellite against one transmitter
+## satellite are kept under pairs/, keyed by the content of the columns they were
+## computed from rather than by their position in the file, so a run with one more
+## (or one less) satellite finds the pairs it shares with earlier runs.
+
+# Columns stored per pair, the IDs and band are given by the run that loads them
+PAIR_COLUMNS = ('Time', 'Lat', 'Lon', 'theta2', 'theta3')
+
+_column_digests = {}
+
+def column_digest(filename, column, rows=None):
+    '''
+        SHA-1 of one column of the ephemeris store (optionally only rows = (start, stop)).
+        Digests are remembered for as long as the store is unchanged.
+    '''
+    store = store_name(filename)
+    key = (abspath(store), stat(store).st_mtime_ns, int(column), rows)
+    if key not in _column_digests:
+        data = np.load(store, mmap_mode='r')
+        if rows is not None:
+            data = data[rows[0]:rows[1]]
+        _column_digests[key] = hashlib.sha1(np.ascontiguousarray(data[:, column]).tobytes()).hexdigest()
+    return _column_digests[key]
+
+def pair_key(filename, rec_cols, rec_sma, trans_lat_col, trans_lon_col, trans_sma, lut_error=None, rows=None,
+             rec_filename=None):
+    '''
+        Key of one receiver satellite / transmitter satellite pair: the time, receiver and
+        transmitter columns it is computed from, the orbit radii, LUT error and solver version.
+        The receiver columns are read from rec_filename if it is given.
+    '''
+    rec_filename = rec_filename or filename
+    params = {'time': column_digest(filename, 0, rows),
+              'rec': [column_digest(rec_filename, rec_cols[0], rows), column_digest(rec_filename, rec_cols[1], rows), rec_sma],
+              'trans': [column_digest(filename, trans_lat_col, rows), column_digest(filename, trans_lon_col, rows), trans_sma],
+              'solver': SOLVER_VERSION,
+              'lut_error': lut_error}
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+def _pair_file(cache_dir, key):
+    return join(cache_dir, 'pairs', key[:2], key + '.npz')
+
+def load_pair(cache_dir, key):
+    '''
+        Stored columns of a pair (see PAIR_COLUMNS), or None if it has not been computed yet
+    '''
+    try:
+        with np.load(_pair_file(cache_dir, key)) as data:
+            return {name: data[name] for name in PAIR_COLUMNS}
+    except (OSError, KeyError, ValueError):
+        return None
+
+def save_pair(cache_dir, key, columns):
+    '''
+        Stores the columns of a pair
+    '''
+    file_name = _pair_file(cache_dir, key)
+    makedirs(join(cache_dir, 'pairs', key[:2]), exist_ok=True)
+    # np.savez adds .npz to names without it, so the temporary name keeps the extension.
+    # It is unique per process, as parallel runs can store the same pair
+    tmp = file_name[:-4] + '.' + str(getpid()) + '.tmp.npz'
+    np.savez(tmp, **{name: columns[name] for name in PAIR_COLUMNS})
+    replace(tmp, file_name)
@@ -0,0 +1,208 @@
+import numpy as np
+
+## Array geometry kernels for the specular point computation
+
+def solve_quartic(coeffs):
+    '''
+        Roots of many quartics at once.
+
+        Inputs:
+            coeffs (ndarray): N x 5 coefficients, highest power first (same order as np.roots)
+
+        Returns an N x 4 complex array with the roots of each quartic. These are the
+        eigenvalues of the companion matrices, so it is the batched equivalent of
+        calling np.roots on every row. Rows with a zero leading coefficient are NaN.
+    '''
+    coeffs = np.asarray(coeffs, dtype=np.float64)
+    n = coeffs.shape[0]
+    roots = np.full((n, 4), np.nan, dtype=np.complex128)
+
+    lead = coeffs[:, 0]
+    ok = np.isfinite(coeffs).all(axis=1) & (lead != 0)
+    if not ok.any():
+        return roots
+
+    # Companion matrix of the monic polynomial
+    monic = coeffs[ok, 1:] / lead[ok, np.newaxis]
+    companion = np.zeros((monic.shape[0], 4, 4))
+    companion[:, 0, :] = -monic
+    companion[:, 1, 0] = 1.0
+    companion[:, 2, 1] = 1.0
+    companion[:, 3, 2] = 1.0
+    roots[ok] = np.linalg.eigvals(companion)
+
+    return roots
+
+def specular_unit(rec, trans, imag_tol=1e-9):
+    '''
+        Specular point on the unit sphere for N receiver/transmitter pairs.
+
+        Inputs:
+            rec (ndarray): N x 3 receiver positions in units of the sphere radius
+            trans (ndarray): N x 3 transmitter positions in units of the sphere radius
+            imag_tol (float): largest imaginary part a root can have and still count as real
+
+        Returns N x 3 unit vectors. Rows without a specular point, including pairs that
+        cannot see each other over the sphere, are NaN.
+
+        Source: https://www.geometrictools.com/Documentation/SphereReflections.pdf
+    '''
+    rec = np.asarray(rec, dtype=np.float64)
+    trans = np.asarray(trans, dtype=np.float64)
+
+    # Prework - dot products
+    a = np.einsum('ij,ij->i', rec, rec)
+    b = np.einsum('ij,ij->i', rec, trans)
+    c = np.einsum('ij,ij->i', trans, trans)
+
+    # Step 1: real, positive roots of the quartic in y
+    d = a*c - b**2
+    coeffs = np.stack([4*c*d, -4*d, a + 2*b + c - 4*a*c, 2*(a - b), a - 1], axis=1)
+    roots = solve_quartic(coeffs)
+    real = np.abs(roots.imag) <= imag_tol * np.maximum(1.0, np.abs(roots.real))
+    y = np.where(real, roots.real, np.nan)
+
+    # Polish the real roots with a couple of Newton steps on the quartic
+    k = coeffs[:, :, np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(2):
+            p = (((k[:, 0]*y + k[:, 1])*y + k[:, 2])*y + k[:, 3])*y + k[:, 4]
+            dp = ((4*k[:, 0]*y + 3*k[:, 1])*y + 2*k[:, 2])*y + k[:, 3]
+            y = np.where(dp != 0, y - p/dp, y)
+
+    # Step 2: matching x for every root, keep the first root with x > 0 and y > 0 whose
+    # point sees both the receiver and the transmitter above its tangent plane. Pairs that
+    # are occluded by the sphere have no such root.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (-2*c[:, np.newaxis]*y**2 + y + 1) / (2*b[:, np.newaxis]*y + 1)
+        candidates = x[:, :, np.newaxis]*rec[:, np.newaxis] + y[:, :, np.newaxis]*trans[:, np.newaxis]
+        spec_2 = np.einsum('ijk,ijk->ij', candidates, candidates)
+        above_rec = np.einsum('ik,ijk->ij', rec, candidates) > spec_2
+        above_trans = np.einsum('ik,ijk->ij', trans, candidates) > spec_2
+    valid = (y > 0) & (x > 0) & above_rec & above_trans
+    found = valid.any(axis=1)
+    i = np.argmax(valid, axis=1)
+    rows = np.arange(rec.shape[0])
+
+    spec = candidates[rows, i]
+    spec[~found] = np.nan
+
+    return spec
+
+class Scratch:
+    '''
+        Work arrays that are reused between calls and only grow when a
+        bigger block comes along
+    '''
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, name, n):
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape[0] < n:
+            buf = np.empty(max(n, 1024))
+            self.buffers[name] = buf
+        return buf[:n]
+
+def _ecef(lat, lon, radius, out):
+    # Fills out (3 x n) with the ECEF position of lat/lon (rad) at radius
+    np.cos(lat, out=out[2])
+    np.cos(lon, out=out[0])
+    np.sin(lon, out=out[1])
+    out[0] *= out[2]
+    out[1] *= out[2]
+    np.sin(lat, out=out[2])
+    out *= radius
+    return out
+
+def science_angles(spec_lat, spec_lon, rec_lat, rec_lon, rec_sma, trans_lat, trans_lon, trans_sma,
+                   earth_radius=6371.0, max_theta1=60.0, scratch=None):
+    '''
+        Science angles for a batch of specular points, in one pass over flat arrays.
+
+        Inputs:
+            spec_lat, spec_lon (ndarray): specular point (rad)
+            rec_lat, rec_lon (ndarray): receiver (rad)
+            rec_sma (float or ndarray): receiver orbit radius (km)
+            trans_lat, trans_lon (ndarray): transmitter (rad)
+            trans_sma (float or ndarray): transmitter orbit radius (km)
+            max_theta1 (float): largest incidence angle kept (deg)
+            scratch (Scratch): optional work arrays to reuse between calls
+
+        theta1 is the angle between the surface normal at the specular point and r_sr,
+        theta2 the angle between r_sr and the receiver position, and theta3 the angle
+        between r_rt and the receiver position (all in deg).
+
+        The theta1 cut is applied first, so the transmitter geometry and theta2/theta3
+        are only computed for the samples that survive it.
+
+        Returns (keep, theta2, theta3): indices of the surviving samples and their angles.
+    '''
+    if scratch is None:
+        scratch = Scratch()
+    n = np.shape(spec_lat)[0]
+
+    # Receiver and specular point positions
+    rec = _ecef(rec_lat, rec_lon, rec_sma, scratch.get('rec', 3*n).reshape(3, n))
+    spec = _ecef(spec_lat, spec_lon, earth_radius, scratch.get('spec', 3*n).reshape(3, n))
+
+    # r_sr = rec - spec, written over spec once spec . r_sr is known
+    r_sr = scratch.get('r_sr', 3*n).reshape(3, n)
+    np.subtract(rec, spec, out=r_sr)
+    dot = scratch.get('dot', n)
+    np.einsum('ij,ij->j', spec, r_sr, out=dot)
+    mag_sr = scratch.get('mag_sr', n)
+    np.einsum('ij,ij->j', r_sr, r_sr, out=mag_sr)
+    np.sqrt(mag_sr, out=mag_sr)
+
+    # theta1, the incidence angle, decides which samples are kept at all
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos_theta1 = dot / (mag_sr * earth_radius)
+    keep = np.flatnonzero(cos_theta1 >= np.cos(np.radians(max_theta1)))
+
+    rec = rec[:, keep]
+    r_sr = r_sr[:, keep]
+    mag_sr = mag_sr[keep]
+    mag_r = np.sqrt(np.einsum('ij,ij->j', rec, rec))
+
+    # Transmitter only for the survivors
+    m = keep.shape[0]
+    trans = _ecef(np.take(trans_lat, keep), np.take(trans_lon, keep),
+                  trans_sma if np.ndim(trans_sma) == 0 else np.take(trans_sma, keep),
+                  scratch.get('trans', 3*m).reshape(3, m))
+    r_rt = np.subtract(trans, rec, out=trans)
+    mag_rt = np.sqrt(np.einsum('ij,ij->j', r_rt, r_rt))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        theta2 = np.degrees(np.arccos(np.einsum('ij,ij->j', r_sr, rec) / (mag_r * mag_sr)))
+        theta3 = np.degrees(np.arccos(np.einsum('ij,ij->j', r_rt, rec) / (mag_r * mag_rt)))
+
+    return keep, theta2, theta3
+
+def max_central_angle(sma, earth_radius=6371.0, max_incidence=90.0):
+    '''
+        Largest Earth central angle (rad) between a satellite at radius sma and a
+        point on the surface that sees it at an incidence angle of at most
+        max_incidence (deg). 90 deg is the geometric horizon.
+    '''
+    theta = np.radians(max_incidence)
+    return theta - np.arcsin(earth_radius * np.sin(theta) / sma)
+
+def visibility_mask(rec_lat, rec_lon, rec_sma, trans_lat, trans_lon, trans_sma,
+                    earth_radius=6371.0, max_incidence=90.0):
+    '''
+        Cheap pre-filter for receiver/transmitter pairs (all angles in rad, arrays broadcast).
+
+        A specular point has to be seen by both satellites, so the central angle between
+        the two sub-satellite points can be at most the sum of the two visibility cones.
+        With max_incidence = 90 deg the cones reach the horizon, i.e. this is the line of
+        sight against the Earth sphere; a smaller value narrows them to the incidence
+        angles that are kept downstream.
+
+        Returns True where a specular point is possible.
+    '''
+    reach = max_central_angle(rec_sma, earth_radius, max_incidence) + max_central_angle(trans_sma, earth_radius, max_incidence)
+
+    # Haversine central angle between the sub-satellite points
+    h = np.sin((trans_lat - rec_lat) / 2)**2 + np.cos(rec_lat) * np.cos(trans_lat) * np.sin((trans_lon - rec_lon) / 2)**2
+    return h <= np.sin(np.minimum(reach, np.pi) / 2)**2
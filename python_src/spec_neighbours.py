@@ -0,0 +1,92 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+## Neighbour search between specular points.
+## Points are placed on the unit sphere (ECEF direction vectors) in a KD-tree, where a
+## distance along the surface is a fixed chord length, so all pairs closer than a radius
+## come out of one tree query in O(n log n) instead of a haversine against every other point.
+## With a time window the points are cut into blocks of that width and only neighbouring
+## blocks are searched, so samples of the same track days apart are never paired.
+
+EARTH_RADIUS = 6371.0
+
+def unit_vectors(lat, lon):
+    '''
+        N x 3 unit ECEF vectors of lat, lon (deg) on a spherical Earth
+    '''
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)), axis=-1)
+
+def chord(distance, earth_radius=EARTH_RADIUS):
+    '''
+        Chord on the unit sphere of a great circle distance (km)
+    '''
+    return 2 * np.sin(np.minimum(distance / (2*earth_radius), np.pi / 2))
+
+def arc(chord_length, earth_radius=EARTH_RADIUS):
+    '''
+        Great circle distance (km) of a chord on the unit sphere
+    '''
+    return 2 * earth_radius * np.arcsin(np.minimum(chord_length / 2, 1.0))
+
+def _pairs(xyz, radius):
+    # (i, j, chord) of all pairs within radius, i < j
+    tree = cKDTree(xyz)
+    pairs = tree.query_pairs(radius, output_type='ndarray')
+    if pairs.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return pairs[:, 0], pairs[:, 1], np.linalg.norm(xyz[pairs[:, 0]] - xyz[pairs[:, 1]], axis=1)
+
+def _cross_pairs(xyz_a, xyz_b, radius):
+    # (i in a, j in b, chord) of all pairs within radius
+    distances = cKDTree(xyz_a).sparse_distance_matrix(cKDTree(xyz_b), radius, output_type='ndarray')
+    return distances['i'].astype(np.int64), distances['j'].astype(np.int64), distances['v']
+
+def neighbour_pairs(lat, lon, radius, time=None, max_dt=None, earth_radius=EARTH_RADIUS):
+    '''
+        All pairs of points closer than radius along the surface.
+
+        Inputs:
+            lat, lon (ndarray): positions (deg)
+            radius (float): great circle distance (km), e.g. 0.1 or 1.0
+            time (ndarray): sample times, needed with max_dt
+            max_dt (float): only pairs at most this far apart in time (units of time)
+            earth_radius (float): km
+
+        Returns (i, j, distance): indices into the inputs with i < j and their distance (km)
+    '''
+    xyz = unit_vectors(lat, lon)
+    radius = chord(radius, earth_radius)
+
+    if max_dt is None:
+        i, j, length = _pairs(xyz, radius)
+    else:
+        if time is None:
+            raise ValueError('A time window needs the sample times')
+        time = np.asarray(time, dtype=np.float64)
+        order = np.argsort(time, kind='stable')
+        block = np.floor((time[order] - time[order[0]]) / max_dt).astype(np.int64) if order.shape[0] > 0 else order
+        blocks, starts = np.unique(block, return_index=True)
+        ends = np.append(starts[1:], order.shape[0])
+
+        parts = []
+        for k in range(blocks.shape[0]):
+            # Pairs within the block, and with the next block if it is adjacent in time
+            rows = order[starts[k]:ends[k]]
+            a, b, length = _pairs(xyz[rows], radius)
+            parts = parts + [(rows[a], rows[b], length)]
+            if k + 1 < blocks.shape[0] and blocks[k + 1] == blocks[k] + 1:
+                next_rows = order[starts[k + 1]:ends[k + 1]]
+                a, b, length = _cross_pairs(xyz[rows], xyz[next_rows], radius)
+                parts = parts + [(rows[a], next_rows[b], length)]
+
+        i = np.concatenate([part[0] for part in parts]) if parts else np.zeros(0, dtype=np.int64)
+        j = np.concatenate([part[1] for part in parts]) if parts else np.zeros(0, dtype=np.int64)
+        length = np.concatenate([part[2] for part in parts]) if parts else np.zeros(0)
+
+        keep = np.abs(time[i] - time[j]) <= max_dt
+        i, j, length = np.minimum(i[keep], j[keep]), np.maximum(i[keep], j[keep]), length[keep]
+
+    return i, j, arc(length, earth_radius)
@@ -0,0 +1,163 @@
+import numpy as np
+import hashlib
+from collections import OrderedDict
+from os import makedirs
+from os.path import join, exists
+
+from Alhazen_Plotemy import branchdeducing_twofinite_vec
+
+## Precomputed lookup tables for the Alhazen both-finite solution.
+## Within one transmitter shell and one receiver shell c and b are constant,
+## so the specular angle only depends on the observer angle.
+
+# The physical observer range is [-pi/2, pi/2], but get_specular_points
+# feeds rotated lat/lon differences, which span [-3pi/2, 5pi/2]. Tabulating
+# all of it keeps those samples off the exact solver.
+OBS_MIN = -1.5 * np.pi
+OBS_MAX = 2.5 * np.pi
+
+# Number of tables kept in memory before the least recently used is dropped
+MAX_TABLES = 64
+
+_tables = OrderedDict()
+
+class SpecularTable:
+    '''
+        Piecewise linear table of branchdeducing_twofinite over [OBS_MIN, OBS_MAX]
+        for one (c, b) pair.
+
+        Inputs:
+            c (float): R_spec / R_src
+            b (float): R_spec / R_obs
+            max_error (float): angular error bound of the interpolation (rad)
+            knots (ndarray): observer angles the solution was sampled at
+            values (ndarray): solution at the knots (NaN if there is none)
+            exact (ndarray): intervals that could not meet max_error, for
+                             instance across a branch switch. Lookups that
+                             fall in them run the solver instead.
+    '''
+    def __init__(self, c, b, max_error, knots, values, exact):
+        self.c = float(c)
+        self.b = float(b)
+        self.max_error = float(max_error)
+        self.knots = knots
+        self.values = values
+        self.exact = exact
+
+    @classmethod
+    def build(cls, c, b, max_error=1e-6, initial=4097, min_width=1e-8):
+        '''
+            Samples the solver adaptively. Every interval is checked at its
+            midpoint against the linear interpolation of its ends and split
+            until the error is below max_error. Intervals narrower than
+            min_width that still fail are flagged for exact evaluation.
+        '''
+        knots = np.linspace(OBS_MIN, OBS_MAX, initial)
+        values = branchdeducing_twofinite_vec(knots, c, b)
+        exact = np.zeros(knots.size - 1, dtype=bool)
+
+        pending = np.arange(knots.size - 1)
+        while pending.size > 0:
+            left, right = knots[pending], knots[pending + 1]
+            mid = 0.5 * (left + right)
+            mid_values = branchdeducing_twofinite_vec(mid, c, b)
+
+            with np.errstate(invalid='ignore'):
+                err = np.abs(mid_values - 0.5 * (values[pending] + values[pending + 1]))
+            nan_l = np.isnan(values[pending])
+            nan_r = np.isnan(values[pending + 1])
+            nan_m = np.isnan(mid_values)
+            # An interval is good if it is all NaN or all valid and linear enough
+            good = (nan_l & nan_r & nan_m) | (~nan_l & ~nan_r & ~nan_m & (err <= max_error))
+
+            # Too narrow to split any further
+            narrow = ~good & (right - left <= min_width)
+            exact[pending[narrow]] = True
+
+            split = ~good & ~narrow
+            if not split.any():
+                break
+
+            # Insert the midpoints of the intervals that are split
+            where = pending[split] + 1
+            knots = np.insert(knots, where, mid[split])
+            values = np.insert(values, where, mid_values[split])
+            # A split interval becomes two intervals that both inherit its flag
+            exact = np.insert(exact, where, exact[pending[split]])
+
+            # Indices of the new halves once the insertions are accounted for
+            shift = np.cumsum(split) - split
+            first = pending[split] + shift[split]
+            pending = np.sort(np.concatenate((first, first + 1)))
+
+        return cls(c, b, max_error, knots, values, exact)
+
+    def __call__(self, obs):
+        '''
+            Interpolated specular angle for an array of observer angles.
+            Values outside the table or in flagged intervals are solved exactly.
+        '''
+        obs = np.asarray(obs, dtype=np.float64)
+        flat = obs.ravel()
+
+        i = np.clip(np.searchsorted(self.knots, flat, side='right') - 1, 0, self.knots.size - 2)
+        x0, x1 = self.knots[i], self.knots[i + 1]
+        v0, v1 = self.values[i], self.values[i + 1]
+        spec = v0 + (v1 - v0) * (flat - x0) / (x1 - x0)
+
+        solve = self.exact[i] | (flat < OBS_MIN) | (flat > OBS_MAX) | np.isnan(flat)
+        if solve.any():
+            spec[solve] = branchdeducing_twofinite_vec(flat[solve], self.c, self.b)
+
+        return spec.reshape(obs.shape)
+
+    def save(self, file_name):
+        np.savez(file_name, params=np.array([self.c, self.b, self.max_error]),
+                 knots=self.knots, values=self.values, exact=self.exact)
+
+    @classmethod
+    def load(cls, file_name):
+        with np.load(file_name) as data:
+            c, b, max_error = data['params']
+            return cls(c, b, max_error, data['knots'], data['values'], data['exact'])
+
+def table_file_name(c, b, max_error):
+    '''
+        File name of a table on disk, keyed by (c, b, max_error)
+    '''
+    key = hashlib.sha1(repr((float(c), float(b), float(max_error))).encode()).hexdigest()
+    return 'spec_table_' + key[:16] + '.npz'
+
+def get_table(c, b, max_error=1e-6, cache_dir=None):
+    '''
+        Returns the table for (c, b, max_error). Tables are kept in memory
+        with LRU eviction and, if cache_dir is given, saved to and loaded
+        from disk so they are only ever built once.
+    '''
+    key = (float(c), float(b), float(max_error))
+    if key in _tables:
+        _tables.move_to_end(key)
+        return _tables[key]
+
+    table = None
+    if cache_dir is not None:
+        file_name = join(cache_dir, table_file_name(*key))
+        if exists(file_name):
+            table = SpecularTable.load(file_name)
+    if table is None:
+        table = SpecularTable.build(c, b, max_error)
+        if cache_dir is not None:
+            makedirs(cache_dir, exist_ok=True)
+            table.save(file_name)
+
+    _tables[key] = table
+    while len(_tables) > MAX_TABLES:
+        _tables.popitem(last=False)
+
+    return table
+
+def lookup_twofinite(obs, c, b, max_error=1e-6, cache_dir=None):
+    '''
+        Drop-in replacement for branchdeducing_twofinite_vec with scalar c and b
+    '''
+    return get_table(c, b, max_error, cache_dir)(obs)
@@ -0,0 +1,143 @@
+import argparse
+import importlib
+import itertools
+import json
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from ephemeris_catalog import load_catalog, with_receivers, select_transmitters
+from ephemeris_store import open_store
+from spec_cache import column_digest
+from specular_lut import get_table
+
+second_order = importlib.import_module('2nd_order')
+
+## Trade study over receiver designs.
+## Every design is a set of receiver shells (an ephemeris per altitude, of which the
+## first num_sats satellites are used) and a set of science requirements. All designs
+## run against the same transmitter ephemeris and give one row of revisit percentiles
+## per science requirement and region.
+##
+## Grid file (JSON):
+##   {"shells": [{"file": "rec_350km.txt", "sma": 6721.0, "num_sats": [0, 6, 12]},
+##               {"file": "rec_550km.txt", "sma": 6921.0, "num_sats": [6, 12]}],
+##    "science": [["SSM", "FTS"], ["RZSM", "SWE_P"]]}
+## gives every combination of satellite counts (shells with 0 are left out) and science sets.
+## A list of designs can be given instead under "designs", each {"shells": [...], "science": [...]}.
+
+def design_name(design):
+    '''
+        Short name of a design, e.g. 6721x6+6921x12
+    '''
+    return '+'.join(str(int(round(shell['sma']))) + 'x' + str(shell['num_sats']) for shell in design['shells'])
+
+def expand_grid(grid):
+    '''
+        List of designs of a grid (see the top of this file)
+    '''
+    if 'designs' in grid:
+        return [dict(design, science=design.get('science', list(second_order.SCIENCE_REQS))) for design in grid['designs']]
+
+    science_sets = grid.get('science', [list(second_order.SCIENCE_REQS)])
+    counts = [shell['num_sats'] if isinstance(shell['num_sats'], list) else [shell['num_sats']] for shell in grid['shells']]
+
+    designs = []
+    for num_sats in itertools.product(*counts):
+        shells = [dict(shell, num_sats=n) for shell, n in zip(grid['shells'], num_sats) if n > 0]
+        if len(shells) == 0:
+            continue
+        for science in science_sets:
+            designs = designs + [{'shells': shells, 'science': list(science)}]
+    return designs
+
+def _prepare(designs, trans_file, catalog, lut_error=None, lut_dir=None):
+    # Work that only depends on the transmitters (and the shells, not the designs) is done
+    # once here instead of in every design: binary stores and lookup tables are built and
+    # every receiver ephemeris is checked against the transmitter time steps
+    time = column_digest(trans_file, 0)
+    files = sorted(set(shell['file'] for design in designs for shell in design['shells']))
+    for file_name in files:
+        open_store(file_name)
+        if column_digest(file_name, 0) != time:
+            raise ValueError('Receiver ephemeris ' + file_name + ' does not have the time steps of ' + trans_file)
+
+    if lut_error is not None:
+        bands = second_order.science_bands(set(req for design in designs for req in design['science']))
+        rec_sma = set(shell['sma'] for design in designs for shell in design['shells'])
+        for trans_sma in set(entry['sma'] for entry in select_transmitters(catalog, bands)):
+            for sma in rec_sma:
+                get_table(second_order.EARTH_RADIUS / trans_sma, second_order.EARTH_RADIUS / sma, lut_error, lut_dir)
+
+def run_design(design, trans_file, catalog, lut_error=None, lut_dir=None, cache_dir=None):
+    '''
+        Specular points and revisit percentiles of one design.
+        Returns a list of summary rows (dicts).
+    '''
+    design_catalog = with_receivers(catalog, design['shells'])
+    specular_df = second_order.get_specular_points(trans_file, None, None, None, None, None,
+                                                   second_order.science_bands(design['science']),
+                                                   lut_error=lut_error, lut_dir=lut_dir, cache_dir=cache_dir,
+                                                   catalog=design_catalog)
+    stats = second_order.get_revisit_stats(specular_df, design['science'], verbose=False)
+
+    rows = []
+    for science_req in design['science']:
+        for region, (p90, p99) in stats[science_req].items():
+            rows = rows + [{'design': design_name(design), 'num_sats': sum(shell['num_sats'] for shell in design['shells']),
+                            'science': science_req, 'region': region, 'specular_points': len(specular_df),
+                            'p90': p90, 'p99': p99}]
+    return rows
+
+def _run_design_task(args):
+    # Unpacks a design for the process pool
+    return run_design(*args)
+
+def sweep(designs, trans_file, workers=1, lut_error=None, lut_dir=None, cache_dir=None):
+    '''
+        Runs every design against the transmitters of trans_file.
+
+        Inputs:
+            designs (list or dict): designs, or a grid that is expanded with expand_grid
+            trans_file (str): ephemeris with the transmitter constellations and a catalog (see preprocess.py)
+            workers (int): designs run in parallel on this many processes
+            lut_error, lut_dir: see 2nd_order.get_specular_points
+            cache_dir (str): specular cache. Designs that share shells reuse each other's
+                             receiver/transmitter pairs through it, so it is worth setting.
+
+        Returns the summary as a DataFrame: one row per design, science requirement and region
+        with the 0.90 and 0.99 percentiles of the maximum revisit (days).
+    '''
+    if isinstance(designs, dict):
+        designs = expand_grid(designs)
+    open_store(trans_file)
+    catalog = load_catalog(trans_file)
+    _prepare(designs, trans_file, catalog, lut_error, lut_dir)
+
+    tasks = [(design, trans_file, catalog, lut_error, lut_dir, cache_dir) for design in designs]
+    if workers <= 1:
+        results = map(_run_design_task, tasks)
+        rows = [row for result in results for row in result]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = [row for result in pool.map(_run_design_task, tasks, chunksize=1) for row in result]
+
+    return pd.DataFrame(rows, columns=['design', 'num_sats', 'science', 'region', 'specular_points', 'p90', 'p99'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Revisit percentiles over a grid of receiver designs')
+    parser.add_argument('grid', help='JSON file with the grid or list of designs')
+    parser.add_argument('trans_file', help='transmitter ephemeris (with its catalog, see preprocess.py)')
+    parser.add_argument('--workers', type=int, default=1, help='designs run in parallel')
+    parser.add_argument('--lut-error', type=float, default=None, help='use lookup tables with this error (rad)')
+    parser.add_argument('--lut-dir', default=None, help='directory of the lookup tables')
+    parser.add_argument('--cache-dir', default=None, help='specular cache shared by the designs')
+    parser.add_argument('--out', default=None, help='write the summary to this CSV file')
+    args = parser.parse_args()
+
+    with open(args.grid, 'r') as f:
+        grid = json.load(f)
+
+    summary = sweep(grid, args.trans_file, args.workers, args.lut_error, args.lut_dir, args.cache_dir)
+    print(summary.to_string(index=False))
+    if args.out is not None:
+        summary.to_csv(args.out, index=False)
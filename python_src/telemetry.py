@@ -0,0 +1,203 @@
+import cProfile
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from os import environ, getpid, makedirs
+from os.path import join
+
+## Lightweight instrumentation of the pipeline stages.
+## Nothing is recorded unless the environment asks for it, so production runs can be
+## instrumented without editing the code:
+##
+##   MOIST_TELEMETRY=run.jsonl          one JSON record per stage is appended to run.jsonl
+##   MOIST_PROFILE=profiles/            cProfile of every stage, one .prof file each
+##   MOIST_PROFILE_STAGES=a,b           only profile these stages
+##
+## Records hold the stage name, start time, wall time, peak RSS of the process during the
+## stage and its growth over the RSS at the start of the stage, the pid, and whatever the stage adds (samples in/out, culled
+## and NaN counts, tx_offset of the constellation, ...). Worker processes append to the same file.
+##
+##   python telemetry.py run.jsonl      summary per stage (and per transmitter constellation)
+
+TELEMETRY_ENV = 'MOIST_TELEMETRY'
+PROFILE_ENV = 'MOIST_PROFILE'
+PROFILE_STAGES_ENV = 'MOIST_PROFILE_STAGES'
+
+# Only one profiler can run at a time, so stages nested in a profiled stage are part of its profile
+_profiling = False
+_profile_count = 0
+
+class StageRecord:
+    '''
+        Fields of one stage. set() replaces fields, add() adds to counts.
+    '''
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = dict(fields)
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.fields[key] = self.fields.get(key, 0) + int(value)
+
+class _NullRecord:
+    # Stands in for StageRecord when telemetry is off
+    def set(self, **fields):
+        pass
+
+    def add(self, **counts):
+        pass
+
+_NULL_RECORD = _NullRecord()
+
+def enabled():
+    '''
+        True if stages are being recorded
+    '''
+    return bool(environ.get(TELEMETRY_ENV))
+
+# Peaks of the open stages, innermost last. A nested stage resets the peak of the process,
+# so the peak of the enclosing stages up to then is kept here
+_open_peaks = []
+
+def _status_mb(field):
+    # Field of /proc/self/status in MB (VmRSS: current RSS, VmHWM: peak RSS), None without /proc
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+def reset_peak_rss():
+    '''
+        Sets the peak RSS of the process (VmHWM) back to its current RSS. Returns False
+        where /proc is not available.
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def rss_mb():
+    '''
+        Current and peak RSS (MB) of the process. The peak is the one since the last
+        reset_peak_rss(). Without /proc the current RSS is None and the peak is ru_maxrss,
+        the peak over the lifetime of the process.
+    '''
+    peak = _status_mb('VmHWM')
+    if peak is None:
+        # ru_maxrss is in kB on Linux and in bytes on macOS
+        scale = 1024.0**2 if sys.platform == 'darwin' else 1024.0
+        return None, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    return _status_mb('VmRSS'), peak
+
+def _enter_peak():
+    # Keeps the peak of the enclosing stage, then restarts the peak for this one
+    current, peak = rss_mb()
+    if _open_peaks:
+        _open_peaks[-1] = max(_open_peaks[-1], peak)
+    _open_peaks.append(0.0)
+    reset_peak_rss()
+    return peak if current is None else current
+
+def _exit_peak():
+    # Peak of the stage, including nested stages, which counts for the enclosing stage too
+    peak = max(_open_peaks.pop(), rss_mb()[1])
+    if _open_peaks:
+        _open_peaks[-1] = max(_open_peaks[-1], peak)
+    return peak
+
+def _json_default(value):
+    # numpy scalars and anything else json does not know
+    return value.item() if hasattr(value, 'item') else str(value)
+
+def _write(record):
+    with open(environ[TELEMETRY_ENV], 'a') as f:
+        f.write(json.dumps(record, default=_json_default) + '\n')
+
+def _should_profile(name):
+    if _profiling or not environ.get(PROFILE_ENV):
+        return False
+    selected = environ.get(PROFILE_STAGES_ENV)
+    return not selected or name in selected.split(',')
+
+@contextmanager
+def stage(name, **fields):
+    '''
+        Records a stage:
+
+            with telemetry.stage('revisit', samples_in=len(df)) as record:
+                ...
+                record.set(samples_out=len(result))
+    '''
+    global _profiling, _profile_count
+
+    if not enabled():
+        yield _NULL_RECORD
+        return
+
+    record = StageRecord(name, fields)
+    profiler = None
+    if _should_profile(name):
+        profiler = cProfile.Profile()
+        _profiling = True
+        profiler.enable()
+
+    rss_start = _enter_peak()
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        wall = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            _profiling = False
+            _profile_count = _profile_count + 1
+            makedirs(environ[PROFILE_ENV], exist_ok=True)
+            profiler.dump_stats(join(environ[PROFILE_ENV], name + '.' + str(getpid()) + '.' + str(_profile_count) + '.prof'))
+
+        rss = _exit_peak()
+        _write(dict({'stage': name, 'start': started, 'wall_s': wall, 'peak_rss_mb': rss,
+                     'rss_growth_mb': rss - rss_start, 'pid': getpid()}, **record.fields))
+
+def read_records(file_name):
+    '''
+        Records of a telemetry file as a DataFrame
+    '''
+    import pandas as pd
+    with open(file_name, 'r') as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+def summarize(file_name, by=('stage',)):
+    '''
+        Totals per stage (or any other fields): calls, wall time, samples, counts and peak RSS
+    '''
+    records = read_records(file_name)
+    by = [key for key in by if key in records]
+    sums = [key for key in ['wall_s', 'samples_in', 'samples_out', 'culled', 'nan', 'theta1_cut', 'invalid'] if key in records]
+
+    summary = records.groupby(by, dropna=False).agg(calls=('stage', 'size'), peak_rss_mb=('peak_rss_mb', 'max'),
+                                                    **{key: (key, 'sum') for key in sums})
+    if 'samples_in' in summary:
+        summary['samples_per_s'] = summary['samples_in'] / summary['wall_s']
+    return summary.sort_values('wall_s', ascending=False)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        exit('Usage: python telemetry.py run.jsonl')
+    print(summarize(sys.argv[1]).to_string())
+    records = read_records(sys.argv[1])
+    # Constellations are told apart by the TxID of their first transmitter
+    if 'tx_offset' in records:
+        print()
+        print(summarize(sys.argv[1], by=('stage', 'tx_offset')).to_string())
@@ -0,0 +1,5 @@
+import sys
+from os.path import join, dirname, abspath
+
+# The modules of python_src import each other by name
+sys.path.insert(0, abspath(join(dirname(__file__), '..')))
@@ -0,0 +1,27 @@
+import numpy as np
+
+from Alhazen_Plotemy import branchdeducing_twofinite, branchdeducing_twofinite_vec
+
+# LEO receiver and GPS / LEO transmitters (R_earth / R_sat)
+SHELLS = [(6371.0 / 26560.0, 6371.0 / 6721.0), (6371.0 / 7154.0, 6371.0 / 6921.0)]
+
+def _scalar(obs, c, b):
+    return np.array([branchdeducing_twofinite(o, c, b) for o in obs], dtype=np.float64)
+
+def test_vec_matches_scalar():
+    rng = np.random.default_rng(0)
+    obs = np.concatenate((np.linspace(-np.pi/2, np.pi/2, 1001), rng.uniform(-1.5*np.pi, 2.5*np.pi, 1000)))
+    for c, b in SHELLS:
+        vec = branchdeducing_twofinite_vec(obs, c, b, block=256)
+        scalar = _scalar(obs, c, b)
+        assert np.array_equal(np.isnan(vec), np.isnan(scalar))
+        np.testing.assert_allclose(vec, scalar, rtol=0, atol=1e-10)
+
+def test_vec_broadcasts_per_sample_shells():
+    obs = np.linspace(-np.pi/2, np.pi/2, 64)
+    c = np.where(np.arange(64) % 2 == 0, SHELLS[0][0], SHELLS[1][0])
+    b = np.where(np.arange(64) % 2 == 0, SHELLS[0][1], SHELLS[1][1])
+    vec = branchdeducing_twofinite_vec(obs.reshape(8, 8), c.reshape(8, 8), b.reshape(8, 8))
+    assert vec.shape == (8, 8)
+    expected = np.array([branchdeducing_twofinite(o, cc, bb) for o, cc, bb in zip(obs, c, b)], dtype=np.float64)
+    np.testing.assert_allclose(vec.ravel(), expected, rtol=0, atol=1e-10)
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+import benchmark
+import telemetry
+
+def _allocating_stage(megabytes):
+    def stage(workdir):
+        def run():
+            np.ones(megabytes * 1024 * 1024 // 8).sum()
+        return run, megabytes
+    return stage
+
+@pytest.mark.skipif(telemetry.rss_mb()[0] is None, reason='needs /proc/self/status')
+def test_stage_rss_growth_follows_stage_size(monkeypatch, tmp_path):
+    monkeypatch.setitem(benchmark.STAGES, 'small_alloc', _allocating_stage(8))
+    monkeypatch.setitem(benchmark.STAGES, 'large_alloc', _allocating_stage(256))
+
+    # The large stage runs first, so a lifetime peak would show up in the small one too
+    large = benchmark._run_stage('large_alloc', str(tmp_path), 1)
+    small = benchmark._run_stage('small_alloc', str(tmp_path), 1)
+
+    assert large['rss_growth_mb'] > 200
+    assert small['rss_growth_mb'] < 50
+    assert large['peak_rss_mb'] - small['peak_rss_mb'] > 150
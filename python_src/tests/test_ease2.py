@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from ease2 import (INVALID_CELL, RESOLUTIONS, SEMI_MAJOR, ECCENTRICITY, X0, Y0, Ease2Grid, project, unproject,
+                   valid_positions)
+
+# Latitude of the top and bottom edges of the EASE-2 Global grid (Brodzik et al. 2012)
+EDGE_LAT = 85.0445664
+
+def test_projection_round_trip():
+    rng = np.random.default_rng(12)
+    lat = rng.uniform(-89.9, 89.9, 10000)
+    lon = rng.uniform(-180.0, 180.0, 10000)
+    x, y = project(lat, lon)
+    lat2, lon2 = unproject(x, y)
+    np.testing.assert_allclose(lat2, lat, rtol=0, atol=1e-7)
+    np.testing.assert_allclose(lon2, lon, rtol=0, atol=1e-9)
+
+def test_epsg_6933_reference_coordinates():
+    # Cylindrical equal-area with true scale at 30 deg: x = a * k0 * lon
+    k0 = np.cos(np.radians(30.0)) / np.sqrt(1 - ECCENTRICITY**2 * np.sin(np.radians(30.0))**2)
+    x, y = project(np.array([0.0, 30.0, EDGE_LAT, -EDGE_LAT]), np.array([0.0, 90.0, -180.0, 179.999999]))
+    np.testing.assert_allclose(x[:2], [0.0, SEMI_MAJOR * k0 * np.pi / 2], rtol=0, atol=1e-6)
+    np.testing.assert_allclose(y[0], 0.0, atol=1e-9)
+    # The grid corners of NSIDC's EASE-2 Global definition
+    np.testing.assert_allclose([x[2], y[2]], [X0, Y0], rtol=0, atol=5.0)
+    np.testing.assert_allclose(y[3], -Y0, rtol=0, atol=5.0)
+    np.testing.assert_allclose(unproject(-X0, -Y0), (-EDGE_LAT, 180.0), atol=1e-6)
+
+@pytest.mark.parametrize('resolution', list(RESOLUTIONS))
+def test_grid_tiles_the_map(resolution):
+    cell_size, num_cols, num_rows = RESOLUTIONS[resolution]
+    np.testing.assert_allclose(num_cols * cell_size, -2 * X0, rtol=1e-9)
+    np.testing.assert_allclose(num_rows * cell_size, 2 * Y0, rtol=1e-9)
+
+def test_cell_centres_map_back_to_their_cells():
+    grid = Ease2Grid('M36')
+    cells = np.arange(grid.num_cells)
+    lat, lon = grid.centre(cells)
+    np.testing.assert_array_equal(grid.cell_id(lat, lon), cells)
+    np.testing.assert_allclose(grid.row_lats(), lat[::grid.num_cols])
+    np.testing.assert_allclose(grid.col_lons(), lon[:grid.num_cols])
+    # Rows run north to south and are symmetric about the equator
+    assert np.all(np.diff(grid.row_lats()) < 0)
+    np.testing.assert_allclose(grid.row_lats(), -grid.row_lats()[::-1], atol=1e-9)
+
+def test_poles_are_clipped_into_the_edge_rows():
+    grid = Ease2Grid('M09')
+    lat = np.array([EDGE_LAT - 0.01, EDGE_LAT + 0.01, 89.0, 90.0, -EDGE_LAT - 0.01, -90.0])
+    row, col = grid.index(lat, np.full(lat.shape[0], 1.0))
+    np.testing.assert_array_equal(row, [0, 0, 0, 0, grid.num_rows - 1, grid.num_rows - 1])
+    assert (col == grid.index(0.0, 1.0)[1]).all()
+
+def test_antimeridian_and_wrapped_longitudes():
+    grid = Ease2Grid('M09')
+    cells = grid.cell_id(np.zeros(4), np.array([-180.0, 180.0, 540.0, 179.9999]))
+    assert cells[0] == cells[1] == cells[2]
+    assert cells[3] == cells[0] + grid.num_cols - 1
+
+def test_invalid_positions():
+    lat = np.array([0.0, 90.0, 90.5, -91.0, np.nan, 0.0])
+    lon = np.array([0.0, 0.0, 0.0, 0.0, 0.0, np.inf])
+    np.testing.assert_array_equal(valid_positions(lat, lon), [True, True, False, False, False, False])
+    cells = Ease2Grid('M36').cell_id(lat, lon)
+    assert (cells[2:] == INVALID_CELL).all() and (cells[:2] >= 0).all()
+
+def test_unknown_resolution():
+    with pytest.raises(ValueError):
+        Ease2Grid('M03')
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from ephemeris_catalog import (CATALOG_VERSION, build_catalog, load_catalog, receiver_satellites, save_catalog,
+                               select_transmitters, with_receivers)
+
+REC_SMA, REC_SATNUM = [6721.0, 6921.0], [2, 3]
+TRANS_SMA, TRANS_SATNUM, TRANS_FREQ = [26560.0, 7154.0], [4, 2], ['l', 'vhf']
+
+def _report():
+    # One row laid out like preprocess.py writes it, every value naming its column:
+    # receiver satellite r: 1000 + 10*r + (0 lat, 1 lon), transmitter t: 2000 + 10*t + (0 lat, 1 lon)
+    row = [0.0]
+    for r in range(sum(REC_SATNUM)):
+        row = row + [1000 + 10*r, 1000 + 10*r + 1]
+    t = 0
+    for n in TRANS_SATNUM:
+        row = row + [2000 + 10*(t + k) for k in range(n)] + [2000 + 10*(t + k) + 1 for k in range(n)]
+        t = t + n
+    return np.array(row)
+
+def test_columns_follow_the_report_layout():
+    catalog = build_catalog(REC_SMA, REC_SATNUM, TRANS_SMA, TRANS_SATNUM, TRANS_FREQ)
+    row = _report()
+    assert catalog['num_columns'] == row.shape[0]
+
+    satellites = receiver_satellites(catalog)
+    assert [sat['id'] for _, sat in satellites] == list(range(sum(REC_SATNUM)))
+    for shell, sat in satellites:
+        assert (row[sat['lat']], row[sat['lon']]) == (1000 + 10*sat['id'], 1000 + 10*sat['id'] + 1)
+        assert shell['sma'] == REC_SMA[shell['shell']]
+
+    for entry in catalog['transmitters']:
+        # All lats, then all lons of the constellation
+        block = row[entry['columns'][0]:entry['columns'][1]]
+        ids = entry['first_id'] + np.arange(entry['num_sats'])
+        np.testing.assert_array_equal(block, np.concatenate((2000 + 10*ids, 2000 + 10*ids + 1)))
+        for sat in entry['satellites']:
+            assert (row[sat['lat']], row[sat['lon']]) == (2000 + 10*sat['id'], 2000 + 10*sat['id'] + 1)
+
+def test_select_transmitters():
+    catalog = build_catalog(REC_SMA, REC_SATNUM, TRANS_SMA, TRANS_SATNUM, TRANS_FREQ)
+    assert [entry['constellation'] for entry in select_transmitters(catalog, ['vhf'])] == [1]
+    assert select_transmitters(catalog, ['p']) == []
+
+def test_catalog_round_trip(tmp_path):
+    file_name = str(tmp_path / 'ephemeris.txt')
+    catalog = build_catalog(REC_SMA, REC_SATNUM, TRANS_SMA, TRANS_SATNUM, TRANS_FREQ, ['GPS', 'ORBCOMM'])
+    save_catalog(catalog, file_name)
+    assert load_catalog(file_name) == catalog
+
+    with pytest.raises(FileNotFoundError):
+        load_catalog(str(tmp_path / 'other.txt'))
+    save_catalog(dict(catalog, version=CATALOG_VERSION + 1), file_name)
+    with pytest.raises(ValueError):
+        load_catalog(file_name)
+
+def test_with_receivers():
+    catalog = build_catalog(REC_SMA, REC_SATNUM, TRANS_SMA, TRANS_SATNUM, TRANS_FREQ)
+    design = with_receivers(catalog, [{'file': 'design.txt', 'sma': 6800.0, 'num_sats': 2, 'first_sat': 1}])
+    assert design['transmitters'] == catalog['transmitters']
+    (shell, first), (_, second) = receiver_satellites(design)
+    assert shell['file'] == 'design.txt'
+    assert (first['id'], first['lat'], first['lon']) == (0, 3, 4)
+    assert (second['id'], second['lat'], second['lon']) == (1, 5, 6)
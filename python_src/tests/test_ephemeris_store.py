@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+from ephemeris_store import convert_report, is_current, load_columns, open_store, save_store, store_name
+
+def _write_report(file_name, data):
+    np.savetxt(file_name, data)
+
+def _data(rows=500, cols=9, seed=15):
+    data = np.random.default_rng(seed).normal(size=(rows, cols))
+    data[:, 0] = np.arange(rows) * 15.0
+    return data
+
+def test_store_round_trip(tmp_path):
+    file_name = str(tmp_path / 'ephemeris.txt')
+    data = _data()
+    _write_report(file_name, data)
+    convert_report(file_name, chunk_rows=64)
+
+    store = open_store(file_name)
+    assert store.flags['F_CONTIGUOUS']
+    np.testing.assert_array_equal(store, np.loadtxt(file_name))
+    np.testing.assert_array_equal(load_columns(file_name), np.loadtxt(file_name))
+
+def test_load_columns_like_loadtxt(tmp_path):
+    file_name = str(tmp_path / 'ephemeris.txt')
+    _write_report(file_name, _data())
+    text = np.loadtxt(file_name)
+    for columns in [0, [0], [2, 3, 4], [1, 5, 8], (7, 2)]:
+        np.testing.assert_array_equal(load_columns(file_name, columns), np.loadtxt(file_name, usecols=columns))
+    np.testing.assert_array_equal(load_columns(file_name, [1, 2], rows=(10, 20)), text[10:20, 1:3])
+
+def test_store_is_rebuilt_when_the_text_is_newer(tmp_path):
+    file_name = str(tmp_path / 'ephemeris.txt')
+    _write_report(file_name, _data(seed=1))
+    open_store(file_name)
+    assert is_current(file_name)
+
+    # A new report over an existing store, written later
+    _write_report(file_name, _data(seed=2))
+    stamp = os.stat(file_name).st_mtime
+    os.utime(store_name(file_name), (stamp - 10, stamp - 10))
+    assert not is_current(file_name)
+    np.testing.assert_array_equal(load_columns(file_name, [1, 2]), _data(seed=2)[:, 1:3])
+    assert is_current(file_name)
+
+def test_store_without_text(tmp_path):
+    file_name = str(tmp_path / 'ephemeris.txt')
+    data = _data()
+    save_store(data, file_name)
+    assert is_current(file_name)
+    np.testing.assert_array_equal(load_columns(file_name, 3), data[:, 3])
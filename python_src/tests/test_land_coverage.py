@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from ease2 import Ease2Grid, RESOLUTIONS
+from window_coverage import cell_bits, land_coverage, load_land_cells, popcount, save_land_cells
+
+GRID = Ease2Grid('M36')
+
+def _samples(n=20000, seed=7):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0.0, 20.0, n), rng.uniform(-30.0, 30.0, n), rng.uniform(-40.0, 40.0, n)
+
+def _land_cells(seed=8):
+    # Land is a random part of a box a bit larger than the area of the samples
+    rng = np.random.default_rng(seed)
+    row, col = GRID.index(*np.meshgrid(np.linspace(-35.0, 35.0, 80), np.linspace(-45.0, 45.0, 80)))
+    cells = np.unique(row * GRID.num_cols + col)
+    return cells[rng.random(cells.shape[0]) < 0.4]
+
+def test_cell_bits_and_popcount():
+    cells = _land_cells()
+    bits = cell_bits(np.concatenate((cells, cells[:10])), GRID.num_cells)
+    assert popcount(bits) == cells.shape[0]
+    unpacked = np.unpackbits(bits, count=GRID.num_cells, bitorder='little')
+    np.testing.assert_array_equal(np.flatnonzero(unpacked), cells)
+
+def test_land_coverage_matches_sets():
+    time, lat, lon = _samples()
+    land = _land_cells()
+    coverage = land_coverage(time, lat, lon, cell_bits(land, GRID.num_cells), 'M36', horizons=(1, 3, 7, 15))
+
+    cell = GRID.cell_id(lat, lon)
+    land_set = set(land.tolist())
+    for horizon, fraction in coverage.items():
+        visited = set(cell[time < time.min() + horizon].tolist())
+        assert fraction == len(visited & land_set) / len(land_set)
+    assert list(coverage) == [1, 3, 7, 15]
+    assert np.all(np.diff(list(coverage.values())) >= 0)
+
+def test_land_coverage_checks_the_grid():
+    time, lat, lon = _samples(10)
+    with pytest.raises(ValueError):
+        land_coverage(time, lat, lon, cell_bits(_land_cells(), GRID.num_cells), 'M09')
+
+def test_land_cells_round_trip(tmp_path):
+    bits = cell_bits(_land_cells(), GRID.num_cells)
+    file_name = str(tmp_path / 'land_cells_M36.npz')
+    save_land_cells(bits, 'M36', file_name)
+    loaded, resolution = load_land_cells(file_name)
+    np.testing.assert_array_equal(loaded, bits)
+    assert resolution == 'M36'
+
+def test_land_cell_bits_from_mask():
+    gen_landmask = pytest.importorskip('gen_landmask')
+    _, num_cols, num_rows = RESOLUTIONS['M36']
+    # A 2 x 2 block per M36 cell: 0, 1 (below half), 2 (half) or 4 land cells
+    land_count = np.random.default_rng(9).choice([0, 1, 2, 4], size=(num_rows, num_cols))
+    mask = np.zeros((num_rows * 2, num_cols * 2), dtype=np.uint8)
+    for k, (dr, dc) in enumerate([(0, 0), (1, 1), (0, 1), (1, 0)]):
+        mask[dr::2, dc::2] = land_count > k
+
+    bits = gen_landmask.land_cell_bits(mask, 'M36', min_fraction=0.5)
+    np.testing.assert_array_equal(np.unpackbits(bits, count=GRID.num_cells, bitorder='little'),
+                                  (land_count >= 2).reshape(-1))
@@ -0,0 +1,34 @@
+import numpy as np
+
+from Alhazen_Plotemy import numerical_batch, _ie_residual
+
+# LEO receiver and GPS / LEO transmitters (R_earth / R_sat)
+SHELLS = [(6371.0 / 26560.0, 6371.0 / 6721.0), (6371.0 / 7154.0, 6371.0 / 6921.0)]
+
+def _bisection(obs, c, b, src=np.pi*0.5, rt=2575.0, iterations=200):
+    # Plain bisection of the incidence - emission residual between the sub-observer and
+    # sub-source points, in the units of numerical_batch
+    c, b = rt / c, rt / b
+    lo = src + np.angle(np.exp(1j * (obs - src)))
+    hi = np.full(lo.shape, src)
+    f_lo, _ = _ie_residual(obs, c, b, src, rt, lo)
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        f_mid, _ = _ie_residual(obs, c, b, src, rt, mid)
+        move = np.sign(f_mid) == np.sign(f_lo)
+        lo, f_lo = np.where(move, mid, lo), np.where(move, f_mid, f_lo)
+        hi = np.where(move, hi, mid)
+    return 0.5 * (lo + hi)
+
+def test_newton_matches_bisection():
+    obs = np.pi/2 + np.linspace(-1.2, 1.2, 41)
+    for c, b in [(0.85, 0.95)] + SHELLS:
+        spec, n_iter, converged = numerical_batch(obs, c, b)
+        assert converged.all()
+        assert n_iter.max() < 50
+        np.testing.assert_allclose(spec, _bisection(obs, c, b), rtol=0, atol=1e-9)
+
+def test_newton_reports_unconverged():
+    spec, n_iter, converged = numerical_batch(np.pi/2 + np.linspace(-1.0, 1.0, 5), 0.85, 0.95, max_iter=1)
+    assert not converged.all()
+    assert n_iter.max() <= 1
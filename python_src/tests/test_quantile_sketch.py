@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantile_sketch import LogHistogram, RegionSketches
+
+QS = [0.0, 0.1, 0.5, 0.9, 0.99, 1.0]
+
+def _revisits(n=50000, seed=13):
+    # Revisit-like values (days), with a few NaNs of cells seen once
+    values = np.random.default_rng(seed).lognormal(0.0, 1.0, n)
+    values[::97] = np.nan
+    return values
+
+@pytest.mark.parametrize('relative_error', [0.01, 0.001])
+def test_quantiles_within_relative_error(relative_error):
+    values = _revisits()
+    sketch = LogHistogram(relative_error)
+    sketch.add(values)
+    expected = pd.Series(values).quantile(QS).to_numpy()
+    np.testing.assert_allclose(sketch.quantile(QS), expected, rtol=relative_error, atol=0)
+    assert sketch.count == np.count_nonzero(~np.isnan(values))
+
+def test_merged_sketch_matches_single_sketch():
+    values = _revisits()
+    single = LogHistogram()
+    single.add(values)
+    merged = LogHistogram()
+    for part in np.array_split(values, 5):
+        sketch = LogHistogram()
+        sketch.add(part)
+        merged.merge(sketch)
+    np.testing.assert_array_equal(merged.counts, single.counts)
+
+def test_merge_needs_the_same_bins():
+    with pytest.raises(ValueError):
+        LogHistogram(0.001).merge(LogHistogram(0.01))
+
+def test_empty_sketch_is_nan():
+    assert np.isnan(LogHistogram().quantile(0.9))
+
+def test_region_sketches_match_series_per_band():
+    rng = np.random.default_rng(14)
+    lat = rng.uniform(-90.0, 90.0, 40000)
+    values = _revisits(40000)
+    regions = {'Global': (-90.0, 50.0), 'Boreal': (50.0, 70.0)}
+
+    sketches = RegionSketches(regions)
+    for part in np.array_split(np.arange(lat.shape[0]), 3):
+        other = RegionSketches(regions)
+        other.add(lat[part], values[part])
+        sketches.merge(other)
+
+    quantiles = sketches.quantiles((0.90, 0.99))
+    for name, (min_lat, max_lat) in regions.items():
+        in_band = (lat >= min_lat) & (lat <= max_lat)
+        expected = pd.Series(values[in_band]).quantile([0.90, 0.99]).to_numpy()
+        np.testing.assert_allclose(quantiles[name], expected, rtol=0.001, atol=0)
+
+def test_region_sketches_need_the_same_regions():
+    with pytest.raises(ValueError):
+        RegionSketches({'Global': (-90.0, 50.0)}).merge(RegionSketches({'Boreal': (50.0, 70.0)}))
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from revisit import MIN_REVISIT, LatLonGrid, revisit_cells, revisit_frame
+
+GRID = LatLonGrid(10)
+
+def _samples(n=30000, seed=11):
+    rng = np.random.default_rng(seed)
+    # Plus a burst in a cell of its own, whose revisit is below MIN_REVISIT
+    time = np.append(rng.uniform(0.0, 10.0, n), [1.0, 1.01, 1.02])
+    return time, np.append(rng.uniform(-2.0, 2.0, n), [10.0]*3), np.append(rng.uniform(100.0, 103.0, n), [50.0]*3)
+
+def _brute_force(time, lat, lon):
+    # Rounded positions and the largest gap between sorted times, like the original
+    # DataFrame revisit calculation
+    df = pd.DataFrame({'approx_LatSp': np.round(lat, 1), 'approx_LonSp': np.round(lon, 1), 'Time': time})
+    df = df.sort_values('Time')
+    df['gap'] = df.groupby(['approx_LatSp', 'approx_LonSp'])['Time'].diff()
+    return df.groupby(['approx_LatSp', 'approx_LonSp']).agg(revisit=('gap', 'max'), samples=('Time', 'size')).reset_index()
+
+def test_frame_matches_groupby():
+    time, lat, lon = _samples()
+    frame = revisit_frame(time, lat, lon, grid=GRID)
+    expected = _brute_force(time, lat, lon)
+    expected = expected[expected['samples'] > 1].reset_index(drop=True)
+
+    np.testing.assert_allclose(frame['approx_LatSp'], expected['approx_LatSp'], atol=1e-9)
+    np.testing.assert_allclose(frame['approx_LonSp'], expected['approx_LonSp'], atol=1e-9)
+    np.testing.assert_array_equal(frame['samples'], expected['samples'])
+    revisit = expected['revisit'].where(expected['revisit'] >= MIN_REVISIT)
+    np.testing.assert_allclose(frame['revisit'], revisit, rtol=0, atol=1e-12)
+    assert frame['revisit'].isna().any()
+    assert frame.attrs['invalid_samples'] == 0
+
+def test_cells_seen_once():
+    cells = revisit_cells(np.array([1.0, 2.0, 5.0]), np.array([0.0, 0.0, 10.0]), np.array([0.0, 0.0, 0.0]), grid=GRID)
+    np.testing.assert_array_equal(cells['samples'], [2, 1])
+    np.testing.assert_array_equal(cells['max_revisit'], [1.0, -np.inf])
+
+def test_longitudes_wrap():
+    lat = np.zeros(3)
+    cells = GRID.cell_id(lat, np.array([-170.0, 190.0, 550.0]))
+    assert cells[0] == cells[1] == cells[2]
+    np.testing.assert_allclose(GRID.centre(cells[:1])[1], -170.0)
+
+def test_invalid_positions_are_dropped_and_counted():
+    time, lat, lon = _samples(1000)
+    frame = revisit_frame(np.append(time, [1.0, 2.0]), np.append(lat, [91.0, np.nan]), np.append(lon, [0.0, 0.0]), grid=GRID)
+    pd.testing.assert_frame_equal(frame, revisit_frame(time, lat, lon, grid=GRID), check_like=True)
+    assert frame.attrs['invalid_samples'] == 2
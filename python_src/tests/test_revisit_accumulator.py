@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from revisit import LatLonGrid, RevisitAccumulator, merge_accumulators, revisit_frame
+
+GRID = LatLonGrid(1)
+
+def _samples(n=20000, seed=10):
+    rng = np.random.default_rng(seed)
+    time = np.sort(rng.uniform(0.0, 10.0, n))
+    return time, rng.uniform(-5.0, 5.0, n), rng.uniform(-5.0, 5.0, n)
+
+def _chunks(time, lat, lon, edges):
+    # Accumulators over the time ranges between edges
+    parts = []
+    for start, stop in zip(edges[:-1], edges[1:]):
+        keep = (time >= start) & (time < stop)
+        accumulator = RevisitAccumulator(GRID)
+        accumulator.update(time[keep], lat[keep], lon[keep])
+        parts = parts + [accumulator]
+    return parts
+
+def test_update_in_chunks_matches_single_pass():
+    time, lat, lon = _samples()
+    single = RevisitAccumulator(GRID)
+    single.update(time, lat, lon)
+    chunked = RevisitAccumulator(GRID)
+    for part in np.array_split(np.arange(time.shape[0]), 7):
+        chunked.update(time[part], lat[part], lon[part])
+
+    pd.testing.assert_frame_equal(chunked.to_frame(), single.to_frame())
+    expected = revisit_frame(time, lat, lon, grid=GRID)
+    pd.testing.assert_frame_equal(single.to_frame()[expected.columns], expected)
+
+def test_merge_in_any_order_matches_single_pass():
+    time, lat, lon = _samples()
+    single = RevisitAccumulator(GRID)
+    single.update(time, lat, lon)
+
+    parts = _chunks(time, lat, lon, [0.0, 1.5, 2.0, 4.0, 7.5, 10.0])
+    # As parallel workers finish, not in time order
+    order = [3, 0, 4, 2, 1]
+    merged = merge_accumulators([parts[k] for k in order])
+    pd.testing.assert_frame_equal(merged.to_frame(), single.to_frame())
+    assert (merged.t_min, merged.t_max) == (single.t_min, single.t_max)
+
+def test_merge_rejects_a_range_inside_the_merged_ones():
+    time, lat, lon = _samples(2000)
+    first, second, third = _chunks(time, lat, lon, [0.0, 3.0, 6.0, 10.0])
+    first.merge(third)
+    with pytest.raises(ValueError):
+        first.merge(second)
+
+def test_update_rejects_older_samples():
+    time, lat, lon = _samples(100)
+    accumulator = RevisitAccumulator(GRID)
+    accumulator.update(time[50:], lat[50:], lon[50:])
+    with pytest.raises(ValueError):
+        accumulator.update(time[:50], lat[:50], lon[:50])
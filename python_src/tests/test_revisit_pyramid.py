@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from revisit import PYRAMID_RESOLUTIONS, RevisitPyramid
+
+def _samples(n=20000, seed=4):
+    # Samples away from the 0.1 deg cell edges, so binning is not down to rounding
+    rng = np.random.default_rng(seed)
+    # Few cells, so most are revisited
+    row = rng.integers(1200, 1240, n)
+    col = rng.integers(1700, 1760, n)
+    lat = -90.0 + (row + 0.5 + rng.uniform(-0.4, 0.4, n)) * 0.1
+    lon = -180.0 + (col + 0.5 + rng.uniform(-0.4, 0.4, n)) * 0.1
+    return np.sort(rng.uniform(0.0, 30.0, n)), lat, lon
+
+def _brute_force(time, lat, lon, resolution):
+    # Gaps within the 0.1 deg cells, aggregated over the cells of the level
+    df = pd.DataFrame({'time': time, 'row': np.floor((lat + 90.0) / 0.1).astype(int),
+                       'col': np.floor((lon + 180.0) / 0.1).astype(int)}).sort_values('time')
+    df['gap'] = df.groupby(['row', 'col'])['time'].diff()
+    fine = df.groupby(['row', 'col']).agg(samples=('time', 'size'), max_revisit=('gap', 'max'),
+                                          gap_sum=('gap', 'sum')).reset_index()
+    ratio = int(round(resolution / 0.1))
+    fine['row'], fine['col'] = fine['row'] // ratio, fine['col'] // ratio
+    return fine.groupby(['row', 'col']).agg(samples=('samples', 'sum'), max_revisit=('max_revisit', 'max'),
+                                            gap_sum=('gap_sum', 'sum')).reset_index()
+
+@pytest.mark.parametrize('resolution', PYRAMID_RESOLUTIONS)
+def test_levels_match_brute_force(resolution):
+    time, lat, lon = _samples()
+    pyramid = RevisitPyramid(time, lat, lon)
+    level = pyramid.levels[resolution]
+    expected = _brute_force(time, lat, lon, resolution)
+
+    num_cols = int(round(360.0 / resolution))
+    np.testing.assert_array_equal(level['cell'], expected['row'] * num_cols + expected['col'])
+    np.testing.assert_array_equal(level['samples'], expected['samples'])
+    np.testing.assert_allclose(level['gap_sum'], expected['gap_sum'], rtol=1e-12, atol=1e-9)
+    seen_twice = level['samples'] > 1
+    np.testing.assert_allclose(level['max_revisit'][seen_twice], expected['max_revisit'][seen_twice], rtol=0, atol=1e-12)
+
+    frame = pyramid.frame(resolution, min_revisit=0.0)
+    assert len(frame) == seen_twice.sum()
+    np.testing.assert_allclose(frame['approx_LatSp'], -90.0 + (expected['row'][seen_twice] + 0.5) * resolution)
+    np.testing.assert_allclose(frame['approx_LonSp'], -180.0 + (expected['col'][seen_twice] + 0.5) * resolution)
+
+def test_invalid_positions_are_dropped():
+    time, lat, lon = _samples(2000)
+    bad_lat = np.concatenate((lat, [95.0, -91.0, np.nan]))
+    bad_lon = np.concatenate((lon, [0.0, 0.0, 0.0]))
+    pyramid = RevisitPyramid(np.concatenate((time, [1.0, 2.0, 3.0])), bad_lat, bad_lon)
+    clean = RevisitPyramid(time, lat, lon)
+    assert pyramid.invalid_samples == 3
+    for resolution in PYRAMID_RESOLUTIONS:
+        np.testing.assert_array_equal(pyramid.levels[resolution]['cell'], clean.levels[resolution]['cell'])
+
+def test_resolutions_have_to_nest():
+    with pytest.raises(ValueError):
+        RevisitPyramid(np.zeros(1), np.zeros(1), np.zeros(1), resolutions=(0.1, 0.25))
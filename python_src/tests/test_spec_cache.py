@@ -0,0 +1,100 @@
+import importlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import spec_cache
+from benchmark import synthetic_ephemeris
+from ephemeris_store import save_store
+
+second_order = importlib.import_module('2nd_order')
+
+@pytest.fixture
+def ephemeris(tmp_path):
+    data, catalog = synthetic_ephemeris(days=0.05, dt=60.0, rec_satNum=[2, 2], trans_satNum=[6, 4, 2])
+    file_name = str(tmp_path / 'ephemeris.txt')
+    save_store(data, file_name)
+    return file_name, catalog
+
+def _run(ephemeris, bands, **kwargs):
+    file_name, catalog = ephemeris
+    return second_order.get_specular_points(file_name, None, None, None, None, None, bands, catalog=catalog, **kwargs)
+
+def test_cache_key_follows_the_inputs(ephemeris):
+    file_name, catalog = ephemeris
+    key = spec_cache.cache_key(file_name, catalog, ['l'])
+    assert spec_cache.cache_key(file_name, catalog, ['l']) == key
+    assert spec_cache.cache_key(file_name, catalog, ['l', 'p']) != key
+    assert spec_cache.cache_key(file_name, catalog, ['l'], lut_error=1e-6) != key
+    moved = dict(catalog, transmitters=[dict(catalog['transmitters'][0], sma=26000.0)] + catalog['transmitters'][1:])
+    assert spec_cache.cache_key(file_name, moved, ['l']) != key
+    # Constellations in bands that are not selected do not matter
+    assert catalog['transmitters'][2]['band'] == 'p'
+    other_band = dict(catalog, transmitters=catalog['transmitters'][:2] + [dict(catalog['transmitters'][2], sma=40000.0)])
+    assert spec_cache.cache_key(file_name, other_band, ['l']) == key
+
+def test_cache_key_follows_the_ephemeris_content(ephemeris):
+    file_name, catalog = ephemeris
+    key = spec_cache.cache_key(file_name, catalog, ['l'])
+    data = np.load(file_name + '.npy')
+    data[0, 1] = data[0, 1] + 1.0
+    save_store(data, file_name)
+    # The digest side file goes by size and mtime, so make sure the mtime moves on
+    stamp = os.stat(file_name + '.npy').st_mtime
+    os.utime(file_name + '.npy', (stamp + 10, stamp + 10))
+    assert spec_cache.cache_key(file_name, catalog, ['l']) != key
+
+def test_cached_result_is_in_ordered_order(ephemeris, tmp_path):
+    expected = _run(ephemeris, ['l', 'p'])
+    cache_dir = str(tmp_path / 'cache')
+    unordered = _run(ephemeris, ['l', 'p'], workers=2, ordered=False, cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(unordered.sort_values(['RxID', 'TxID', 'Time']).reset_index(drop=True),
+                                  expected.sort_values(['RxID', 'TxID', 'Time']).reset_index(drop=True))
+
+    # Served to a caller that wants the rows in order
+    cached = _run(ephemeris, ['l', 'p'], ordered=True, cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(cached, expected)
+
+def test_partitions_do_not_depend_on_the_row_order(ephemeris):
+    _, catalog = ephemeris
+    expected = _run(ephemeris, ['l', 'p'])
+    columns = {name: expected[name].to_numpy() for name in expected.columns}
+    shuffle = np.random.default_rng(16).permutation(len(expected))
+    partitions = spec_cache.partition_result({name: values[shuffle] for name, values in columns.items()}, catalog, ['l', 'p'])
+    for name, values in columns.items():
+        np.testing.assert_array_equal(np.concatenate([part[name] for part in partitions]), values)
+
+def test_pairs_are_reused(ephemeris, tmp_path, capsys):
+    cache_dir = str(tmp_path / 'cache')
+    _run(ephemeris, ['l'], cache_dir=cache_dir)
+    capsys.readouterr()
+
+    # Adding a band only computes the pairs of its constellation
+    result = _run(ephemeris, ['l', 'p'], cache_dir=cache_dir)
+    out = capsys.readouterr().out
+    _, catalog = ephemeris
+    receivers = sum(shell['num_sats'] for shell in catalog['receivers'])
+    l_sats = sum(entry['num_sats'] for entry in catalog['transmitters'] if entry['band'] == 'l')
+    p_sats = sum(entry['num_sats'] for entry in catalog['transmitters'] if entry['band'] == 'p')
+    assert ('Reused ' + str(receivers * l_sats) + ' stored receiver/transmitter pairs, computed ' +
+            str(receivers * p_sats)) in out
+    pd.testing.assert_frame_equal(result, _run(ephemeris, ['l', 'p']))
+
+def test_prune_removes_stale_entries(ephemeris, tmp_path):
+    file_name, _ = ephemeris
+    cache_dir = str(tmp_path / 'cache')
+    _run(ephemeris, ['l'], cache_dir=cache_dir)
+    (entry,) = [name for name in os.listdir(cache_dir) if name != 'pairs']
+    manifest = os.path.join(cache_dir, entry, spec_cache.MANIFEST)
+    with open(manifest) as f:
+        content = json.load(f)
+    with open(manifest, 'w') as f:
+        json.dump(dict(content, result=spec_cache.RESULT_VERSION - 1), f)
+    os.makedirs(os.path.join(cache_dir, 'interrupted'))
+
+    spec_cache.prune(cache_dir, file_name)
+    assert sorted(os.listdir(cache_dir)) == ['pairs']
+    assert spec_cache.load_pair(cache_dir, '0' * 40) is None
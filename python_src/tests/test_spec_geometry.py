@@ -0,0 +1,51 @@
+import numpy as np
+
+from spec_geometry import solve_quartic, specular_unit
+
+def _positions(rng, n, radius):
+    # n random positions at radius (units of the sphere radius)
+    xyz = rng.normal(size=(n, 3))
+    return radius * xyz / np.linalg.norm(xyz, axis=1)[:, np.newaxis]
+
+def test_solve_quartic_matches_np_roots():
+    coeffs = np.random.default_rng(2).normal(size=(200, 5))
+    coeffs[0, 0] = 0.0
+    roots = solve_quartic(coeffs)
+    assert np.isnan(roots[0]).all()
+    for row, expected in zip(roots[1:], coeffs[1:]):
+        np.testing.assert_allclose(np.sort_complex(row), np.sort_complex(np.roots(expected)), atol=1e-8)
+
+def _line_of_sight(rec, trans):
+    # True where the segment between the satellites stays outside the unit sphere
+    d = trans - rec
+    t = np.clip(-np.einsum('ij,ij->i', rec, d) / np.einsum('ij,ij->i', d, d), 0.0, 1.0)
+    return np.linalg.norm(rec + t[:, np.newaxis]*d, axis=1) > 1.0
+
+def test_reflection_law():
+    rng = np.random.default_rng(3)
+    rec = _positions(rng, 2000, 6921.0 / 6371.0)
+    trans = _positions(rng, 2000, 26560.0 / 6371.0)
+
+    spec = specular_unit(rec, trans)
+    found = ~np.isnan(spec).any(axis=1)
+    visible = _line_of_sight(rec, trans)
+    assert 0.2 < visible.mean() < 0.8
+
+    # Pairs occluded by the sphere have no specular point, the others do
+    assert not found[~visible].any()
+    assert found[visible].all()
+    spec, rec, trans = spec[found], rec[found], trans[found]
+
+    # On the sphere, with the receiver and transmitter above its tangent plane
+    np.testing.assert_allclose(np.linalg.norm(spec, axis=1), 1.0, atol=1e-9)
+    to_rec = rec - spec
+    to_trans = trans - spec
+    to_rec = to_rec / np.linalg.norm(to_rec, axis=1)[:, np.newaxis]
+    to_trans = to_trans / np.linalg.norm(to_trans, axis=1)[:, np.newaxis]
+    cos_rec = np.einsum('ij,ij->i', to_rec, spec)
+    cos_trans = np.einsum('ij,ij->i', to_trans, spec)
+    assert (cos_rec > 0).all() and (cos_trans > 0).all()
+
+    # Angle of incidence equals angle of reflection, in the plane of the normal
+    np.testing.assert_allclose(cos_rec, cos_trans, atol=1e-7)
+    np.testing.assert_allclose(np.einsum('ij,ij->i', spec, np.cross(to_rec, to_trans)), 0.0, atol=1e-7)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from spec_neighbours import EARTH_RADIUS, neighbour_pairs
+
+def _samples(n=1500, seed=5):
+    # Clustered points, including some across the antimeridian
+    rng = np.random.default_rng(seed)
+    centre = rng.integers(0, 4, n)
+    lat = np.array([10.0, -45.0, 70.0, 0.0])[centre] + rng.normal(0, 0.02, n)
+    lon = np.array([20.0, 179.99, -60.0, -179.99])[centre] + rng.normal(0, 0.02, n)
+    return rng.uniform(0.0, 5.0, n), lat, lon
+
+def _haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = [np.radians(v) for v in (lat1, lon1, lat2, lon2)]
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+def _brute_force(time, lat, lon, radius, max_dt=None):
+    # Every pair against every other
+    i, j = np.triu_indices(lat.shape[0], k=1)
+    distance = _haversine(lat[i], lon[i], lat[j], lon[j])
+    keep = distance < radius
+    if max_dt is not None:
+        keep &= np.abs(time[i] - time[j]) <= max_dt
+    return i[keep], j[keep], distance[keep]
+
+def _sorted(i, j, distance):
+    order = np.lexsort((j, i))
+    return i[order], j[order], distance[order]
+
+@pytest.mark.parametrize('radius', [0.1, 1.0])
+@pytest.mark.parametrize('max_dt', [None, 0.5])
+def test_pairs_match_brute_force(radius, max_dt):
+    time, lat, lon = _samples()
+    i, j, distance = _sorted(*neighbour_pairs(lat, lon, radius, time=time, max_dt=max_dt))
+    expected = _sorted(*_brute_force(time, lat, lon, radius, max_dt))
+
+    assert len(expected[0]) > 0
+    assert (i < j).all()
+    np.testing.assert_array_equal(i, expected[0])
+    np.testing.assert_array_equal(j, expected[1])
+    np.testing.assert_allclose(distance, expected[2], rtol=1e-6, atol=1e-9)
+
+def test_time_window_needs_times():
+    time, lat, lon = _samples(10)
+    with pytest.raises(ValueError):
+        neighbour_pairs(lat, lon, 1.0, max_dt=0.5)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import specular_lut
+from Alhazen_Plotemy import branchdeducing_twofinite_vec
+from specular_lut import OBS_MIN, OBS_MAX, SpecularTable, get_table, lookup_twofinite
+
+SHELLS = [(6371.0 / 26560.0, 6371.0 / 6721.0), (6371.0 / 7154.0, 6371.0 / 6921.0)]
+
+@pytest.mark.parametrize('c, b', SHELLS)
+@pytest.mark.parametrize('max_error', [1e-4, 1e-6])
+def test_lookup_within_error_bound(c, b, max_error):
+    table = SpecularTable.build(c, b, max_error)
+    obs = np.random.default_rng(1).uniform(OBS_MIN, OBS_MAX, 200000)
+    looked_up = table(obs)
+    exact = branchdeducing_twofinite_vec(obs, c, b)
+
+    assert np.array_equal(np.isnan(looked_up), np.isnan(exact))
+    valid = ~np.isnan(exact)
+    assert np.max(np.abs(looked_up[valid] - exact[valid])) <= max_error
+
+def test_outside_the_table_is_solved_exactly():
+    c, b = SHELLS[0]
+    obs = np.array([OBS_MIN - 0.5, OBS_MAX + 0.5, np.nan])
+    looked_up = lookup_twofinite(obs, c, b, max_error=1e-4)
+    exact = branchdeducing_twofinite_vec(obs, c, b)
+    np.testing.assert_array_equal(looked_up, exact)
+
+def test_tables_are_cached_on_disk(tmp_path, monkeypatch):
+    c, b = SHELLS[1]
+    monkeypatch.setattr(specular_lut, '_tables', specular_lut.OrderedDict())
+    table = get_table(c, b, 1e-4, cache_dir=str(tmp_path))
+    assert get_table(c, b, 1e-4, cache_dir=str(tmp_path)) is table
+
+    # A fresh process finds the saved table instead of building it again
+    monkeypatch.setattr(specular_lut, '_tables', specular_lut.OrderedDict())
+    monkeypatch.setattr(SpecularTable, 'build', None)
+    loaded = get_table(c, b, 1e-4, cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(loaded.knots, table.knots)
+    np.testing.assert_array_equal(loaded.exact, table.exact)
@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import pytest
+
+import telemetry
+
+def _allocate(megabytes):
+    return np.ones(megabytes * 1024 * 1024 // 8).sum()
+
+def _records(file_name):
+    with open(file_name) as f:
+        return {record['stage']: record for record in map(json.loads, f)}
+
+@pytest.fixture
+def telemetry_file(tmp_path, monkeypatch):
+    file_name = str(tmp_path / 'run.jsonl')
+    monkeypatch.setenv(telemetry.TELEMETRY_ENV, file_name)
+    return file_name
+
+@pytest.mark.skipif(telemetry.rss_mb()[0] is None, reason='needs /proc/self/status')
+def test_small_stage_after_large_one_reports_its_own_peak(telemetry_file):
+    with telemetry.stage('large'):
+        _allocate(256)
+    with telemetry.stage('small'):
+        _allocate(8)
+
+    records = _records(telemetry_file)
+    assert records['large']['rss_growth_mb'] > 200
+    assert records['small']['rss_growth_mb'] < 50
+    assert records['large']['peak_rss_mb'] - records['small']['peak_rss_mb'] > 150
+
+@pytest.mark.skipif(telemetry.rss_mb()[0] is None, reason='needs /proc/self/status')
+def test_enclosing_stage_keeps_the_peak_of_nested_ones(telemetry_file):
+    with telemetry.stage('outer'):
+        with telemetry.stage('inner'):
+            _allocate(256)
+        with telemetry.stage('after'):
+            _allocate(8)
+
+    records = _records(telemetry_file)
+    assert records['outer']['peak_rss_mb'] >= records['inner']['peak_rss_mb']
+    assert records['inner']['peak_rss_mb'] - records['after']['peak_rss_mb'] > 150
+
+def test_fields_and_counts(telemetry_file):
+    with telemetry.stage('specular_pair', tx_offset=3) as record:
+        record.add(culled=2)
+        record.add(culled=3)
+        record.set(samples_out=7)
+
+    record = _records(telemetry_file)['specular_pair']
+    assert (record['tx_offset'], record['culled'], record['samples_out']) == (3, 5, 7)
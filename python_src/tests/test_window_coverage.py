@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from revisit import LatLonGrid
+from window_coverage import CoverageBits
+
+GRID = LatLonGrid(1)
+
+def _samples(n=5000, seed=6):
+    rng = np.random.default_rng(seed)
+    time = rng.uniform(0.0, 12.0, n)
+    lat = rng.uniform(-5.0, 5.0, n)
+    lon = rng.uniform(-8.0, 8.0, n)
+    return time, lat, lon
+
+def _seen(time, lat, lon, cells, window=1.0):
+    # Windows x cells matrix of where samples fall, from a groupby
+    df = pd.DataFrame({'window': np.floor((time - time.min()) / window).astype(int),
+                       'cell': GRID.cell_id(lat, lon)})
+    hits = df.groupby(['window', 'cell']).size().unstack(fill_value=0) > 0
+    return hits.reindex(index=range(hits.index.max() + 1), columns=cells, fill_value=False).to_numpy()
+
+def _longest_run(seen):
+    # Longest run of False per column, one column at a time
+    longest = []
+    for column in seen.T:
+        run = best = 0
+        for value in column:
+            run = 0 if value else run + 1
+            best = max(best, run)
+        longest = longest + [best]
+    return np.array(longest)
+
+@pytest.mark.parametrize('window', [0.5, 1.0, 3.0])
+def test_bits_match_brute_force(window):
+    time, lat, lon = _samples()
+    bits = CoverageBits(time, lat, lon, window, grid=GRID)
+    cells = np.unique(GRID.cell_id(lat, lon))
+    seen = _seen(time, lat, lon, cells, window)
+
+    np.testing.assert_array_equal(bits.cells, cells)
+    np.testing.assert_array_equal(bits.seen(), seen)
+    np.testing.assert_allclose(bits.coverage(), seen.mean(axis=1))
+    for n in (1, 2, bits.num_windows):
+        rolling = np.array([seen[k:k + n].any(axis=0) for k in range(bits.num_windows - n + 1)])
+        np.testing.assert_allclose(bits.rolling_coverage(n), rolling.mean(axis=1))
+    np.testing.assert_array_equal(bits.longest_unseen(), _longest_run(seen))
+
+def test_unseen_cells_are_strictly_more_than():
+    time, lat, lon = _samples(800)
+    bits = CoverageBits(time, lat, lon, 1.0, grid=GRID)
+    longest = _longest_run(bits.seen())
+    for days in (1, 2, 3):
+        np.testing.assert_array_equal(bits.unseen_cells(days), bits.cells[longest > days])
+
+def test_cell_universe_includes_never_seen_cells():
+    time, lat, lon = _samples()
+    seen_cells = np.unique(GRID.cell_id(lat, lon))
+    never_seen = GRID.cell_id(np.array([40.0, 41.0]), np.array([100.0, 100.0]))
+    # Half of the seen cells plus two that never get a sample
+    universe = np.concatenate((seen_cells[::2], never_seen))
+    bits = CoverageBits(time, lat, lon, 1.0, grid=GRID, cells=universe)
+
+    np.testing.assert_array_equal(bits.cells, np.sort(universe))
+    seen = _seen(time, lat, lon, np.sort(universe))
+    np.testing.assert_array_equal(bits.seen(), seen)
+    np.testing.assert_allclose(bits.coverage(), seen.mean(axis=1))
+    assert (bits.longest_unseen()[np.isin(bits.cells, never_seen)] == bits.num_windows).all()
+    assert set(never_seen) <= set(bits.unseen_cells(bits.num_windows - 1))
+
+def test_invalid_positions_are_dropped():
+    time, lat, lon = _samples(1000)
+    bits = CoverageBits(np.append(time, 0.5), np.append(lat, 120.0), np.append(lon, 0.0), grid=GRID)
+    clean = CoverageBits(time, lat, lon, grid=GRID)
+    assert bits.invalid_samples == 1
+    np.testing.assert_array_equal(bits.bits, clean.bits)
@@ -0,0 +1,232 @@
+import numpy as np
+
+from ease2 import Ease2Grid, INVALID_CELL
+from revisit import default_grid, _sorted_unique
+
+## Coverage per time window.
+## Samples are binned by window (floor of time / window) and grid cell, and the (window,
+## cell) pairs that occur are stored as a bitset: one row of bits per window, one bit per
+## cell. The cells are those seen at least once in the run, or a given set of cells (e.g.
+## land cells), in which case cells that are never seen are part of the bitset too.
+## Coverage fractions, rolling N-window coverage and runs of unseen windows are answered
+## from the bits, without the samples.
+
+class CoverageBits:
+    '''
+        Window x cell bitset of where specular points fall.
+
+        Inputs:
+            time (ndarray): sample times (days)
+            lat, lon (ndarray): sample positions (deg)
+            window (float): window length (days)
+            grid: cell grid (revisit.default_grid() if None)
+            t0 (float): start of the first window, the first sample if None
+            num_windows (int): number of windows, up to the last sample if None
+            cells (ndarray): grid cell IDs to keep bits for. Samples in other cells are left
+                             out, cells that are never seen stay unseen in every window. The
+                             cells seen at least once if None.
+    '''
+    def __init__(self, time, lat, lon, window=1.0, grid=None, t0=None, num_windows=None, cells=None):
+        self.grid = default_grid() if grid is None else grid
+        self.window = float(window)
+        time = np.asarray(time, dtype=np.float64)
+
+        # Samples with invalid positions are dropped and counted
+        cell = self.grid.cell_id(lat, lon)
+        valid = cell != INVALID_CELL
+        self.invalid_samples = int(valid.shape[0] - valid.sum())
+        if t0 is None:
+            t0 = time[valid].min() if valid.any() else 0.0
+        self.t0 = float(t0)
+
+        index = np.floor((time - self.t0) / self.window).astype(np.int64)
+        if num_windows is None:
+            num_windows = int(index[valid].max()) + 1 if valid.any() else 0
+        self.num_windows = int(num_windows)
+        keep = valid & (index >= 0) & (index < self.num_windows)
+        if cells is not None:
+            self.cells = _sorted_unique(np.asarray(cells, dtype=np.int64))
+            _, found = self._columns(cell[keep])
+            keep[keep] = found
+
+        # One sort of the (window, cell) keys of the samples. Columns are in cell ID order,
+        # so the keys are also in (window, column) order
+        key = _sorted_unique(index[keep] * self.grid.num_cells + cell[keep])
+        window_index, cell = np.divmod(key, self.grid.num_cells)
+        if cells is None:
+            self.cells = _sorted_unique(cell)
+        column = np.searchsorted(self.cells, cell)
+        self.row_bytes = (self.cells.shape[0] + 7) // 8
+
+        # Bytes of the bitset are set with one reduceat over the keys
+        byte = window_index * self.row_bytes + (column >> 3)
+        bit = np.left_shift(1, column & 7).astype(np.uint8)
+
+        self.bits = np.zeros((self.num_windows, self.row_bytes), dtype=np.uint8)
+        if key.shape[0] > 0:
+            starts = np.flatnonzero(np.concatenate(([True], byte[1:] != byte[:-1])))
+            self.bits.reshape(-1)[byte[starts]] = np.bitwise_or.reduceat(bit, starts)
+
+    @property
+    def num_cells(self):
+        return self.cells.shape[0]
+
+    def window_start(self):
+        '''
+            Start time (days) of every window
+        '''
+        return self.t0 + self.window * np.arange(self.num_windows)
+
+    def seen(self, bits=None):
+        '''
+            Windows x cells boolean matrix (unpacked bits)
+        '''
+        bits = self.bits if bits is None else bits
+        return np.unpackbits(bits, axis=1, count=self.num_cells, bitorder='little').astype(bool)
+
+    def _columns(self, cells):
+        # Columns of grid cell IDs, and whether each of them is in the bitset
+        cells = np.asarray(cells, dtype=np.int64)
+        if self.num_cells == 0:
+            return np.zeros(cells.shape, dtype=np.int64), np.zeros(cells.shape, dtype=bool)
+        column = np.minimum(np.searchsorted(self.cells, cells), self.num_cells - 1)
+        return column, self.cells[column] == cells
+
+    def counts(self, cells=None):
+        '''
+            Number of cells seen in every window, over all cells or the given grid cell IDs
+        '''
+        if cells is None:
+            return np.unpackbits(self.bits, axis=1, bitorder='little').sum(axis=1)
+        column, found = self._columns(cells)
+        return self.seen()[:, column[found]].sum(axis=1)
+
+    def coverage(self, cells=None):
+        '''
+            Fraction of cells seen in every window. Over the cells of the bitset, or over the
+            given grid cell IDs (e.g. land cells), which count as unseen if they have no bits.
+        '''
+        total = self.num_cells if cells is None else len(cells)
+        return self.counts(cells) / total if total > 0 else np.full(self.num_windows, np.nan)
+
+    def rolling(self, n):
+        '''
+            Bits of rolling windows of n windows: row k is seen in any of windows k ... k+n-1.
+            Returns num_windows - n + 1 rows.
+        '''
+        if n < 1 or n > self.num_windows:
+            raise ValueError('Rolling length has to be between 1 and ' + str(self.num_windows) + ' windows')
+        rows = self.num_windows - n + 1
+        bits = self.bits[:rows].copy()
+        for shift in range(1, n):
+            bits |= self.bits[shift:shift + rows]
+        return bits
+
+    def rolling_coverage(self, n):
+        '''
+            Fraction of the cells of the bitset seen in every rolling window of n windows
+        '''
+        bits = self.rolling(n)
+        return np.unpackbits(bits, axis=1, bitorder='little').sum(axis=1) / max(self.num_cells, 1)
+
+    def longest_unseen(self):
+        '''
+            Longest run of consecutive windows without samples, per cell (columns of cells)
+        '''
+        run = np.zeros(self.num_cells, dtype=np.int64)
+        longest = np.zeros(self.num_cells, dtype=np.int64)
+        for k in range(self.num_windows):
+            seen = np.unpackbits(self.bits[k], count=self.num_cells, bitorder='little').astype(bool)
+            run = np.where(seen, 0, run + 1)
+            np.maximum(longest, run, out=longest)
+        return longest
+
+    def unseen_cells(self, days):
+        '''
+            Grid cell IDs of the cells with a run of empty windows spanning more than days
+            (strictly), e.g. unseen_cells(3) with 1 day windows: cells with 4 or more empty
+            days in a row. Cells never seen are only among them if they are part of the
+            bitset (see cells in the constructor).
+        '''
+        return self.cells[self.longest_unseen() * self.window > days]
+
+## Land coverage.
+## The land cells of an EASE-2 grid are kept as a bitset over all cells of the grid
+## (bit = cell ID, see gen_landmask.build_land_cells). Cells visited by specular points are
+## ORed into a bitset of the same layout, and the covered fraction is a popcount of the
+## intersection over a popcount of the land bits.
+
+# Time horizons (days) land coverage is reported at
+LAND_HORIZONS = (1, 3, 7, 15)
+
+# Number of set bits of every byte value
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+def popcount(bits):
+    '''
+        Number of set bits of a packed bitset
+    '''
+    return int(POPCOUNT[bits].sum(dtype=np.int64))
+
+def cell_bits(cells, num_cells):
+    '''
+        Packed bitset (little bit order) over num_cells cells with the given cell IDs set
+    '''
+    bits = np.zeros((num_cells + 7) // 8, dtype=np.uint8)
+    cells = _sorted_unique(np.asarray(cells, dtype=np.int64))
+    if cells.shape[0] > 0:
+        byte = cells >> 3
+        starts = np.flatnonzero(np.concatenate(([True], byte[1:] != byte[:-1])))
+        bits[byte[starts]] = np.bitwise_or.reduceat(np.left_shift(1, cells & 7).astype(np.uint8), starts)
+    return bits
+
+def save_land_cells(bits, resolution, file_name):
+    '''
+        Writes a land cell bitset of the EASE-2 grid at resolution ('M01', 'M09', 'M36')
+    '''
+    np.savez_compressed(file_name, bits=bits, resolution=resolution)
+
+def load_land_cells(file_name):
+    '''
+        Land cell bitset and its EASE-2 resolution
+    '''
+    with np.load(file_name) as data:
+        return data['bits'], str(data['resolution'])
+
+def land_coverage(time, lat, lon, land_bits, resolution, horizons=LAND_HORIZONS, t0=None):
+    '''
+        Fraction of the land cells with at least one sample within each horizon.
+
+        Inputs:
+            time (ndarray): sample times (days)
+            lat, lon (ndarray): sample positions (deg)
+            land_bits (ndarray): land cell bitset of the EASE-2 grid at resolution (see load_land_cells)
+            horizons (tuple): days after t0
+            t0 (float): start of the horizons, the first sample if None
+
+        Returns {horizon: covered fraction of the land cells}
+    '''
+    grid = Ease2Grid(resolution)
+    if land_bits.shape[0] != (grid.num_cells + 7) // 8:
+        raise ValueError('Land cell bitset does not match the EASE-2 ' + resolution + ' grid')
+    land = popcount(land_bits)
+
+    time = np.asarray(time, dtype=np.float64)
+    order = np.argsort(time, kind='stable')
+    time = time[order]
+    cell = grid.cell_id(np.asarray(lat)[order], np.asarray(lon)[order])
+    # Samples with invalid positions never cover a cell
+    time, cell = time[cell != INVALID_CELL], cell[cell != INVALID_CELL]
+    if t0 is None:
+        t0 = time[0] if time.shape[0] > 0 else 0.0
+
+    # Visited cells of each horizon are those of the shorter ones plus the samples in between
+    visited = np.zeros_like(land_bits)
+    start = int(np.searchsorted(time, t0, side='left'))
+    coverage = {}
+    for horizon in sorted(horizons):
+        end = int(np.searchsorted(time, t0 + horizon, side='left'))
+        visited |= cell_bits(cell[start:end], grid.num_cells)
+        start = max(start, end)
+        coverage[horizon] = popcount(visited & land_bits) / land if land > 0 else np.nan
+    return coverage